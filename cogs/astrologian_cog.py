@@ -82,9 +82,8 @@ class AstrologianCog(commands.Cog):
         return {}
 
     def _save_data(self):
-        os.makedirs(DATA_DIR, exist_ok=True)
-        with open(DRAW_DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(self.user_data, f, ensure_ascii=False, indent=4)
+        # 交给后台线程合并写入，零点一大波抽卡只落盘一次
+        self.bot.persistence.save(DRAW_DATA_FILE, self.user_data)
 
     @commands.command(name='draw', aliases=['tarot', '占星', '抽卡', '运势'])
     async def daily_draw(self, ctx):
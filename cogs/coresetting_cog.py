@@ -35,9 +35,8 @@ class CoreSettings(commands.Cog):
         # 如果文件不存在，初始化已经在上面完成了
 
     def save_config(self):
-        """将当前频道配置写入本地 JSON 文件"""
-        with open(self.config_file, 'w', encoding='utf-8') as f:
-            json.dump(self.bot.broadcast_channels, f, ensure_ascii=False, indent=4)
+        """将当前频道配置交给后台线程写入本地 JSON 文件"""
+        self.bot.persistence.save(self.config_file, self.bot.broadcast_channels)
 
     # 更新了 help 提示文本，移除了 news
     @commands.command(name='setchannel',
@@ -34,13 +34,7 @@ class FashionCog(commands.Cog):
         }
 
     def _save_data(self):
-        temp_file = f"{FASHION_FILE}.tmp"
-        try:
-            with open(temp_file, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, ensure_ascii=False, indent=4)
-            os.replace(temp_file, FASHION_FILE)
-        except Exception as e:
-            print(f"保存时尚品鉴数据失败: {e}")
+        self.bot.persistence.save(FASHION_FILE, self.config)
 
     def _get_fashion_report_status(self):
         now = datetime.datetime.now(datetime.timezone.utc)
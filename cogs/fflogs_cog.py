@@ -4,6 +4,7 @@ import aiohttp
 import urllib.parse
 import json
 import os
+from utils.metrics import http_trace_config
 
 FFLOGS_CLIENT_ID = os.getenv('FFLOGS_CLIENT_ID')
 FFLOGS_CLIENT_SECRET = os.getenv('FFLOGS_CLIENT_SECRET')
@@ -31,7 +32,7 @@ class FFLogsCog(commands.Cog):
         auth = aiohttp.BasicAuth(FFLOGS_CLIENT_ID, FFLOGS_CLIENT_SECRET)
 
         try:
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=[http_trace_config()]) as session:
                 async with session.post(token_url, data=data, auth=auth) as resp:
                     if resp.status == 200:
                         response_data = await resp.json()
@@ -95,7 +96,7 @@ class FFLogsCog(commands.Cog):
 
         # 3. 发送请求获取数据
         try:
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=[http_trace_config()]) as session:
                 async with session.post("https://cn.fflogs.com/api/v2/client", headers=headers, json=payload) as resp:
                     if resp.status == 401:  # Token 过期，重试
                         await self.get_fflogs_token()
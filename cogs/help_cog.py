@@ -16,8 +16,12 @@ class HelpCog(commands.Cog):
 
         # 1. 采集追踪器
         tracker_desc = (
-            "`!add <材料>` - 添加到追踪列表 | `!list` - 查看列表\n"
-            "`!start` - 启动追踪器面板 | `!stop` - 停止追踪"
+            "`!add <材料>` - 添加到追踪列表（中/英/日名均可）| `!list` - 查看列表\n"
+            "`!start` - 启动追踪器面板 | `!start @成员...` - 合并追踪几个人的列表 | `!stop` - 停止追踪\n"
+            "`!timeline [小时] [all] [园艺/采掘] [版本]` - 查看接下来的刷新时间表\n"
+            "`!route` - 按关注列表规划一个 ET 日内的采集路线\n"
+            "`!find 园艺 等级>=90 patch=7.*` - 按职能/版本/类型/等级/patch/地区/ET 筛选采集点\n"
+            "`!start filter [条件]` - 只追踪符合条件的采集点，例如 `!start filter 采掘 传说`"
         )
         embed.add_field(name="⛏️ 采集追踪器 (Tracker)", value=tracker_desc, inline=False)
 
@@ -48,7 +52,10 @@ class HelpCog(commands.Cog):
             "**[全局频道绑定]**\n"
             "`!setchannel <模块>` - 绑定提醒 (模块: all, house, fs, cal)\n\n"
             "**[系统维护]**\n"
-            "`!reload [模块名]` - 重载代码 (默认重载全部)\n\n"
+            "`!reload [模块名]` - 重载代码 (默认重载全部)\n"
+            "`!nodes reload` - 热更新 nodes.csv，运行中的追踪器不重启\n"
+            "`!stats` - 查看运行指标（追踪器延迟、API 耗时）\n"
+            "`!clock` - 查看时钟自动校准的偏移和样本\n\n"
             "**[内容配置]**\n"
             "`!fs update <文字>` - 更新作业 | `!cal setlink <URL>` - 绑定日历"
         )
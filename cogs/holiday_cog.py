@@ -7,6 +7,7 @@ import recurring_ical_events
 import json
 import os
 from collections import defaultdict
+from utils.metrics import http_trace_config
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(script_dir)
@@ -38,13 +39,7 @@ class HolidayCog(commands.Cog):
         }
 
     def _save_data(self):
-        temp_file = f"{HOLIDAY_CONFIG_FILE}.tmp"
-        try:
-            with open(temp_file, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, ensure_ascii=False, indent=4)
-            os.replace(temp_file, HOLIDAY_CONFIG_FILE)
-        except Exception as e:
-            print(f"保存日历配置失败: {e}")
+        self.bot.persistence.save(HOLIDAY_CONFIG_FILE, self.config)
 
     async def fetch_and_parse_calendar(self):
         url = self.config.get("calendar_url")
@@ -56,59 +51,63 @@ class HolidayCog(commands.Cog):
         headers = {"User-Agent": "Mozilla/5.0"}
 
         try:
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=[http_trace_config()]) as session:
                 async with session.get(url, headers=headers, timeout=10) as resp:
                     if resp.status != 200:
                         return f"ERROR_{resp.status}"
                     ics_data = await resp.read()
+            return self.parse_calendar(ics_data, today)
+        except Exception as e:
+            print(f"解析日历出错: {e}")
+            return "ERROR_PARSE_FAILED"
 
-            cal = Calendar.from_ical(ics_data)
-            future_limit = today + datetime.timedelta(days=90)
-            actual_events = recurring_ical_events.of(cal).between(today, future_limit)
+    @staticmethod
+    def parse_calendar(ics_data, today):
+        """解析 .ics 内容：返回今天正在进行的事件，以及 90 天内按日期排序的前 10 个即将开始的事件。"""
+        cal = Calendar.from_ical(ics_data)
+        future_limit = today + datetime.timedelta(days=90)
+        actual_events = recurring_ical_events.of(cal).between(today, future_limit)
 
-            ongoing = []
-            upcoming = defaultdict(list)
-            seen = set()
+        ongoing = []
+        upcoming = defaultdict(list)
+        seen = set()
 
-            for component in actual_events:
-                start_val = component.get('dtstart').dt
-                end_val = component.get('dtend').dt if component.get('dtend') else start_val
+        for component in actual_events:
+            start_val = component.get('dtstart').dt
+            end_val = component.get('dtend').dt if component.get('dtend') else start_val
 
-                start_date = start_val.date() if isinstance(start_val, datetime.datetime) else start_val
-                end_date = end_val.date() if isinstance(end_val, datetime.datetime) else end_val
+            start_date = start_val.date() if isinstance(start_val, datetime.datetime) else start_val
+            end_date = end_val.date() if isinstance(end_val, datetime.datetime) else end_val
 
-                if not isinstance(end_val, datetime.datetime) and start_date != end_date:
-                    end_date = end_date - datetime.timedelta(days=1)
+            if not isinstance(end_val, datetime.datetime) and start_date != end_date:
+                end_date = end_date - datetime.timedelta(days=1)
 
-                summary = str(component.get('summary', '未知事件'))
-                description = str(component.get('description', '')).strip()
+            summary = str(component.get('summary', '未知事件'))
+            description = str(component.get('description', '')).strip()
 
-                identifier = f"{start_date}_{summary}"
-                if identifier in seen:
-                    continue
-                seen.add(identifier)
+            identifier = f"{start_date}_{summary}"
+            if identifier in seen:
+                continue
+            seen.add(identifier)
 
-                ev = {"start": start_date, "end": end_date, "title": summary, "desc": description}
+            ev = {"start": start_date, "end": end_date, "title": summary, "desc": description}
 
-                if start_date <= today <= end_date:
-                    ongoing.append(ev)
-                elif start_date > today:
-                    upcoming[start_date].append(ev)
+            if start_date <= today <= end_date:
+                ongoing.append(ev)
+            elif start_date > today:
+                upcoming[start_date].append(ev)
 
-            sorted_dates = sorted(upcoming.keys())
-            limited_upcoming = defaultdict(list)
-            count = 0
-            for d in sorted_dates:
-                for ev in upcoming[d]:
-                    if count >= 10: break
-                    limited_upcoming[d].append(ev)
-                    count += 1
+        sorted_dates = sorted(upcoming.keys())
+        limited_upcoming = defaultdict(list)
+        count = 0
+        for d in sorted_dates:
+            for ev in upcoming[d]:
                 if count >= 10: break
+                limited_upcoming[d].append(ev)
+                count += 1
+            if count >= 10: break
 
-            return {"ongoing": ongoing, "upcoming": limited_upcoming}
-        except Exception as e:
-            print(f"解析日历出错: {e}")
-            return "ERROR_PARSE_FAILED"
+        return {"ongoing": ongoing, "upcoming": limited_upcoming}
 
     # ================= 保持原有时区和时间不变 =================
     @tasks.loop(minutes=1)
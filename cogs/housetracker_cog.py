@@ -3,6 +3,7 @@ from discord.ext import commands, tasks
 import aiohttp
 import datetime
 from zoneinfo import ZoneInfo
+from utils.metrics import http_trace_config
 
 # 指定澳大利亚时区
 TZ_AUSTRALIA = ZoneInfo("Australia/Melbourne")
@@ -39,6 +40,35 @@ class HousingTracker(commands.Cog):
     def cog_unload(self):
         self.daily_reminder.cancel()
 
+    @staticmethod
+    def filter_sales(data, f_area=None, f_size=None, f_region=None, f_purchase=None, f_state=None):
+        """按条件筛选房源，按价格从低到高排序；为 None 的条件不筛选。"""
+        # --- 核心修复：强制类型转换并应用筛选 ---
+        filtered_results = []
+        for item in data:
+            # 统一从 API 中提取并转为整数
+            try:
+                i_area = int(item.get('Area', -1))
+                i_size = int(item.get('Size', -1))
+                i_region = int(item.get('RegionType', -1))
+                i_purchase = int(item.get('PurchaseType', -1))
+                i_state = int(item.get('State', -1))
+            except:
+                continue
+
+            # 逐项比对
+            if f_area is not None and i_area != f_area: continue
+            if f_size is not None and i_size != f_size: continue
+            if f_region is not None and i_region != f_region: continue
+            if f_purchase is not None and i_purchase != f_purchase: continue
+            if f_state is not None and i_state != f_state: continue
+
+            filtered_results.append(item)
+
+        # 按价格从低到高排序
+        filtered_results.sort(key=lambda x: x.get('Price', 999999999))
+        return filtered_results
+
     @commands.cooldown(1, 5, commands.BucketType.channel)
     @commands.command(name='house', help='查询空房。用法: !house [服务器] [参数...]')
     async def check_house(self, ctx, *args):
@@ -71,7 +101,7 @@ class HousingTracker(commands.Cog):
                 f_state = self.state_name_to_id[arg]
 
         async with ctx.typing():
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(trace_configs=[http_trace_config()]) as session:
                 try:
                     headers = {'User-Agent': 'FF14HousingBot/1.2'}
                     async with session.get(self.api_url, params={'server': server_id}, headers=headers) as resp:
@@ -84,35 +114,11 @@ class HousingTracker(commands.Cog):
                             await ctx.send(f"🏘️ **{server_name}** 当前没有在售房源。")
                             return
 
-                        # --- 核心修复：强制类型转换并应用筛选 ---
-                        filtered_results = []
-                        for item in data:
-                            # 统一从 API 中提取并转为整数
-                            try:
-                                i_area = int(item.get('Area', -1))
-                                i_size = int(item.get('Size', -1))
-                                i_region = int(item.get('RegionType', -1))
-                                i_purchase = int(item.get('PurchaseType', -1))
-                                i_state = int(item.get('State', -1))
-                            except:
-                                continue
-
-                            # 逐项比对
-                            if f_area is not None and i_area != f_area: continue
-                            if f_size is not None and i_size != f_size: continue
-                            if f_region is not None and i_region != f_region: continue
-                            if f_purchase is not None and i_purchase != f_purchase: continue
-                            if f_state is not None and i_state != f_state: continue
-
-                            filtered_results.append(item)
-
+                        filtered_results = self.filter_sales(data, f_area, f_size, f_region, f_purchase, f_state)
                         if not filtered_results:
                             await ctx.send(f"❌ 在 **{server_name}** 没找到符合要求的房源。")
                             return
 
-                        # 按价格从低到高排序
-                        filtered_results.sort(key=lambda x: x.get('Price', 999999999))
-
                         embed = discord.Embed(title=f"🏡 {server_name} 精选房源", color=discord.Color.gold())
 
                         for item in filtered_results[:15]:  # 只展示前15条，避免消息过长
@@ -148,7 +154,7 @@ class HousingTracker(commands.Cog):
         now = datetime.datetime.now(TZ_AUSTRALIA)
         tomorrow = (now + datetime.timedelta(days=1)).date()
 
-        async with aiohttp.ClientSession() as session:
+        async with aiohttp.ClientSession(trace_configs=[http_trace_config()]) as session:
             for s_name, s_id in self.server_mapping.items():
                 try:
                     async with session.get(self.api_url, params={'server': s_id}) as resp:
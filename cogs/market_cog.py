@@ -4,6 +4,8 @@ import aiohttp
 import datetime
 import urllib.parse
 
+from utils.metrics import http_trace_config
+
 
 class MarketCog(commands.Cog):
     def __init__(self, bot):
@@ -79,7 +81,7 @@ class MarketCog(commands.Cog):
         # 发送正在查询的提示
         loading_msg = await ctx.send(f"🔍 正在查询 **{dc_display_name}** 大区的 `{item_name}` 物价，请稍候...")
 
-        async with aiohttp.ClientSession() as session:
+        async with aiohttp.ClientSession(trace_configs=[http_trace_config()]) as session:
             # 1. 获取物品 ID
             item_id, exact_name, icon_path = await self._get_item_id_and_icon(item_name, session)
 
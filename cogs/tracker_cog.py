@@ -1,45 +1,81 @@
 import discord
 from discord.ext import commands
-import csv
 import time
 import datetime
-from typing import List, Dict, Optional
-from collections import defaultdict
+import hashlib
+from typing import NamedTuple, Optional
+from collections import defaultdict, deque
 from discord.ui import View, Button
 import asyncio
+import heapq
+import itertools
 import json
 import os
 import aiohttp
 
+from utils.eorzea_clock import EorzeaClock, et_hour_index, format_et, ET_HOUR_REAL_SECONDS
+from utils.item_bits import iter_bits
+from utils.item_search import ItemNameIndex
+from utils.metrics import REGISTRY
+from utils.node_catalog import CatalogueDiff, NodeCatalogue, diff_catalogues, load_catalogue, spawn_window
+from utils.node_query import JOB_ALIASES, NodeQuery
+from utils.route_planner import RoutePlanner
+from utils.spawn_timeline import NodeFilter, SpawnTimeline
+from utils.watchlist_store import TrackerSession, WatchlistStore
+
+# 地区名 -> 地图 ID；随节点快照一起在 TrackerManager.load_data 中原地更新，导入时不再读文件
 MAP_ID_MAP = {}
 # 获取项目根目录
 script_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(script_dir)
 map_id_filepath = os.path.join(project_root, 'data/map_id.json')
 
-if os.path.exists(map_id_filepath):
-    try:
-        with open(map_id_filepath, 'r', encoding='utf-8') as f:
-            MAP_ID_MAP = json.load(f)
-        print(f"🗺️ 成功加载地图 ID 映射表，共 {len(MAP_ID_MAP)} 个区域。")
-    except Exception as e:
-        print(f"❌ 读取 map_id.json 失败: {e}")
-else:
-    print(f"⚠️ 找不到 {map_id_filepath} 文件，外部地图精确跳转功能将受限。")
-
 # --- 常量定义 ---
 NORMAL_REFRESH_INTERVAL = 60
 MEDIUM_THRESHOLD_SECONDS = 30
 MEDIUM_REFRESH_INTERVAL = 5
 URGENT_THRESHOLD_SECONDS = 10
 URGENT_REFRESH_INTERVAL = 1
-EORZEA_MULTIPLIER = 3600 / 175
 LOOP_INTERVAL = 1.0
 MAX_EMBED_FIELDS = 25
+MAX_FIELD_VALUE_LENGTH = 1024
+MAX_MESSAGE_LENGTH = 2000
+# 发送队列默认预算：Discord 对同一频道的编辑/发送大约是每 5 秒 5 次，全局约每秒 50 次
+DEFAULT_PANEL_EDITS_PER_5S = 5
+DEFAULT_CHANNEL_SENDS_PER_5S = 5
+DEFAULT_GLOBAL_REQUESTS_PER_SEC = 40
+# !timeline 预报：默认 / 最多查询多少现实小时，最多发几条消息
+DEFAULT_TIMELINE_HOURS = 1
+MAX_TIMELINE_HOURS = 12
+MAX_TIMELINE_MESSAGES = 3
+# !find 最多发几条消息
+MAX_FIND_MESSAGES = 3
+# 重启后逐个恢复频道追踪器的间隔（秒），避免登录时几十个频道同时请求 API
+RESUME_STAGGER_SECONDS = 0.5
+# 默认多久检查一次 nodes.csv / map_id.json 是否被修改（秒），0 表示只能用 !nodes reload 手动更新
+DEFAULT_NODES_WATCH_INTERVAL = 0
 WATCHLIST_FILE = 'data/watchlists.json'
 PING_FILE = 'pings.json'
 
 
+def get_web_map_url(region, coords):
+    x_str, y_str = "", ""
+    try:
+        coords_clean = coords.replace('[', '').replace(']', '').strip()
+        if ',' in coords_clean:
+            x_str, y_str = [s.strip() for s in coords_clean.split(',')]
+    except Exception:
+        pass
+
+    map_id = MAP_ID_MAP.get(region)
+
+    if map_id and x_str and y_str:
+        return f"https://map.wakingsands.com/#f=mark&id={map_id}&x={x_str}&y={y_str}"
+    elif map_id:
+        return f"https://map.wakingsands.com/#f=area&id={map_id}"
+    return "https://map.wakingsands.com/"
+
+
 class GatheringMapView(View):
     def __init__(self, grouped_events):
         super().__init__(timeout=None)
@@ -47,22 +83,7 @@ class GatheringMapView(View):
         for (region, coords), materials in grouped_events.items():
             if count >= 25: break
 
-            x_str, y_str = "", ""
-            try:
-                coords_clean = coords.replace('[', '').replace(']', '').strip()
-                if ',' in coords_clean:
-                    x_str, y_str = [s.strip() for s in coords_clean.split(',')]
-            except Exception:
-                pass
-
-            map_id = MAP_ID_MAP.get(region)
-
-            if map_id and x_str and y_str:
-                web_map_url = f"https://map.wakingsands.com/#f=mark&id={map_id}&x={x_str}&y={y_str}"
-            elif map_id:
-                web_map_url = f"https://map.wakingsands.com/#f=area&id={map_id}"
-            else:
-                web_map_url = "https://map.wakingsands.com/"
+            web_map_url = get_web_map_url(region, coords)
 
             btn = Button(
                 style=discord.ButtonStyle.link,
@@ -73,35 +94,518 @@ class GatheringMapView(View):
             count += 1
 
 
+
+class TokenBucket:
+    def __init__(self, rate, per, time_source=time.monotonic):
+        self.capacity = float(rate)
+        self.tokens = float(rate)
+        self.fill_rate = rate / per
+        self.time_source = time_source
+        self.updated_at = time_source()
+
+    def take(self) -> float:
+        """尝试取一个令牌；成功返回 0，否则返回还需要等待的秒数。"""
+        now = self.time_source()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.fill_rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.fill_rate
+
+
+class ChannelOutbox:
+    def __init__(self, edits_per_5s, sends_per_5s, time_source=time.monotonic):
+        self.pings = deque()
+        self.pending_edit = None
+        self.edit_bucket = TokenBucket(edits_per_5s, 5, time_source)
+        self.send_bucket = TokenBucket(sends_per_5s, 5, time_source)
+        self.worker = None
+
+    def depth(self) -> int:
+        return len(self.pings) + (1 if self.pending_edit else 0)
+
+
+class DiscordOutbox:
+    """追踪器对 Discord 的所有出站请求都经过这里。
+
+    每个频道一个队列：@ 提醒按顺序排队并优先发送；面板编辑只保留最新的一帧，
+    还没发出去的旧帧直接丢弃（计入 dropped_edits）。频道内按路由分别限速，
+    全局再加一层总预算，避免多个追踪器同时进入倒计时把速率限制打满。
+    time_source 是令牌桶用的单调时钟，模拟时换成虚拟时间（见 utils/tracker_sim.py）。
+    """
+
+    def __init__(self, bot, config, time_source=time.monotonic):
+        self.bot = bot
+        self.time_source = time_source
+        self.edits_per_5s = config.get('PANEL_EDITS_PER_5S', DEFAULT_PANEL_EDITS_PER_5S)
+        self.sends_per_5s = config.get('CHANNEL_SENDS_PER_5S', DEFAULT_CHANNEL_SENDS_PER_5S)
+        self.global_bucket = TokenBucket(config.get('GLOBAL_REQUESTS_PER_SEC', DEFAULT_GLOBAL_REQUESTS_PER_SEC), 1,
+                                         time_source)
+        self.channels = {}
+        self.sent_edits = 0
+        self.sent_pings = 0
+        self.dropped_edits = 0
+
+    def _box(self, channel_id) -> ChannelOutbox:
+        box = self.channels.get(channel_id)
+        if box is None:
+            box = self.channels[channel_id] = ChannelOutbox(self.edits_per_5s, self.sends_per_5s, self.time_source)
+        return box
+
+    def submit_ping(self, channel_id, job):
+        box = self._box(channel_id)
+        box.pings.append(job)
+        self._ensure_worker(box)
+
+    def submit_edit(self, channel_id, job):
+        box = self._box(channel_id)
+        if box.pending_edit is not None:
+            self.dropped_edits += 1
+        box.pending_edit = job
+        self._ensure_worker(box)
+
+    def discard(self, channel_id):
+        box = self.channels.pop(channel_id, None)
+        if box is None:
+            return
+        if box.pending_edit is not None:
+            self.dropped_edits += 1
+        box.pings.clear()
+        box.pending_edit = None
+
+    def close(self):
+        """取消所有发送任务，返回还没发出的 @ 提醒 {频道ID: [job]}，热重载后交给新的发送队列接着发。"""
+        leftover = {}
+        for channel_id, box in self.channels.items():
+            if box.worker is not None and not box.worker.done():
+                box.worker.cancel()
+            if box.pings:
+                leftover[channel_id] = list(box.pings)
+        self.channels.clear()
+        return leftover
+
+    def queue_depth(self) -> int:
+        return sum(box.depth() for box in self.channels.values())
+
+    def stats(self):
+        return {
+            'queue_depth': self.queue_depth(),
+            'sent_edits': self.sent_edits,
+            'sent_pings': self.sent_pings,
+            'dropped_edits': self.dropped_edits,
+        }
+
+    def _ensure_worker(self, box):
+        if box.worker is None or box.worker.done():
+            box.worker = self.bot.loop.create_task(self._drain(box))
+
+    async def _acquire(self, bucket):
+        started = self.time_source()
+        for b in (bucket, self.global_bucket):
+            while True:
+                delay = b.take()
+                if delay <= 0: break
+                await asyncio.sleep(delay)
+        REGISTRY.observe('outbox_wait_seconds', self.time_source() - started)
+
+    async def _drain(self, box):
+        while box.pings or box.pending_edit:
+            if box.pings:
+                await self._acquire(box.send_bucket)
+                if not box.pings: continue
+                job = box.pings.popleft()
+                self.sent_pings += 1
+            else:
+                await self._acquire(box.edit_bucket)
+                # 等令牌期间可能又来了更新的一帧，取此刻最新的那一帧
+                job, box.pending_edit = box.pending_edit, None
+                if job is None: continue
+                self.sent_edits += 1
+            try:
+                await job()
+            except Exception as e:
+                print(f"Discord 请求发送失败: {e}")
+
+
+def chunk_message_lines(header, lines, limit=MAX_MESSAGE_LENGTH):
+    """把多行内容拼成若干条不超过 Discord 字数上限的消息，每条都带上 header。"""
+    chunks, current = [], header
+    for line in lines:
+        if len(current) + 1 + len(line) > limit and current != header:
+            chunks.append(current)
+            current = header
+        current = f"{current}\n{line}"
+    if current != header:
+        chunks.append(current)
+    return chunks
+
+
+class PingIndex:
+    """每个用户关注列表的材料位集，以及 材料位 -> [(用户ID, 提前秒数)] 的倒排提醒索引。
+
+    关注列表或提醒设置变化时只标记失效，下一次查询时整体重建；
+    追踪器拿着刷新组的材料位集来查：只看组里每个材料的订阅者，开销和这组材料的订阅人数成正比，
+    和总用户数无关；候选人关注的具体是哪几样再用他的位集做一次 AND。
+    """
+
+    def __init__(self, user_watchlists, user_pings, item_bits):
+        self.user_watchlists = user_watchlists
+        self.user_pings = user_pings
+        self.item_bits = item_bits
+        self.version = 0
+        self._user_masks = {}
+        self._by_bit = {}
+        self._any_by_lead = {}
+        self._dirty = True
+
+    def rebind(self, user_watchlists, user_pings, item_bits=None):
+        self.user_watchlists, self.user_pings = user_watchlists, user_pings
+        if item_bits is not None:
+            self.item_bits = item_bits
+        self.invalidate()
+
+    def invalidate(self):
+        # 版本号在失效时就递增，追踪器据此丢弃自己按版本缓存的结果
+        self._dirty = True
+        self.version += 1
+
+    def _ensure_built(self):
+        if not self._dirty:
+            return
+        self._user_masks = {user_id_str: self.item_bits.mask_of(items)
+                            for user_id_str, items in self.user_watchlists.items()}
+        by_bit = defaultdict(list)
+        any_by_lead = defaultdict(int)
+        for user_id_str, ping_time in self.user_pings.items():
+            lead = int(ping_time)
+            mask = self._user_masks.get(user_id_str, 0)
+            if lead <= 0 or not mask:
+                continue
+            for bit in iter_bits(mask):
+                by_bit[bit].append((user_id_str, lead))
+            any_by_lead[lead] |= mask
+        self._by_bit = dict(by_bit)
+        self._any_by_lead = dict(any_by_lead)
+        self._dirty = False
+
+    def watch_mask(self, user_ids) -> int:
+        """几个用户关注列表的并集位集。"""
+        self._ensure_built()
+        mask = 0
+        for user_id in user_ids:
+            mask |= self._user_masks.get(str(user_id), 0)
+        return mask
+
+    def leads_for(self, group_mask):
+        self._ensure_built()
+        return {lead for lead, mask in self._any_by_lead.items() if mask & group_mask}
+
+    def subscribers(self, group_mask, lead):
+        """这个提前量下和刷新组有关的用户：[(用户ID, 其中他关注的材料位集)]。"""
+        self._ensure_built()
+        if not self._any_by_lead.get(lead, 0) & group_mask:
+            return []
+        candidates = set()
+        for bit in iter_bits(group_mask):
+            for user_id_str, user_lead in self._by_bit.get(bit, ()):
+                if user_lead == lead:
+                    candidates.add(user_id_str)
+        return [(int(user_id_str), self._user_masks[user_id_str] & group_mask) for user_id_str in candidates]
+
+
+class SpawnClock:
+    """进程内唯一的 ET 时钟。
+
+    每个 ET 整点的更迭只在这里计算一次，然后推送给所有订阅的 TrackerInstance；
+    追踪器自己不再跑循环，只负责按关注列表过滤并渲染面板。
+
+    调度基于定时器堆：每个追踪器处理完一次后返回它下一次需要醒来的时间
+    （下一次重绘 / 下一次 @ 提醒 / 下一次刷新更迭中最早的一个），
+    时钟只睡到堆顶的截止时间，空闲的追踪器几乎没有开销。
+    """
+
+    def __init__(self, bot, clock: EorzeaClock):
+        self.bot = bot
+        self.clock = clock
+        self.subscribers = []
+        self.background_task = None
+        # 接下来 24 个 ET 整点 [(unix_ts, et_hour)]，按时间排序
+        self.upcoming_hours = []
+        # 每跨过一个 ET 整点加一，追踪器据此判断是否需要重新挑选刷新组
+        self.generation = 0
+        # 定时器堆 [(deadline, seq, instance)]；过期条目在弹出时按 instance.wakeup_deadline 惰性丢弃
+        self._timers = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._sleeping_until = None
+
+    def now(self) -> float:
+        return self.clock.now()
+
+    def subscribe(self, instance):
+        if instance not in self.subscribers:
+            self.subscribers.append(instance)
+        self.schedule(instance, self.now())
+        if self.background_task is None or self.background_task.done():
+            self.background_task = self.bot.loop.create_task(self._run())
+
+    def schedule(self, instance, deadline):
+        instance.wakeup_deadline = deadline
+        heapq.heappush(self._timers, (deadline, next(self._seq), instance))
+        # 新的截止时间比当前睡眠目标更早，提前唤醒时钟重新计算
+        if self._sleeping_until is not None and deadline < self._sleeping_until:
+            self._wakeup.set()
+
+    def unsubscribe(self, instance):
+        if instance in self.subscribers:
+            self.subscribers.remove(instance)
+        if not self.subscribers and self.background_task:
+            self.background_task.cancel()
+            self.background_task = None
+
+    def shutdown(self):
+        self.subscribers.clear()
+        self._timers.clear()
+        if self.background_task:
+            self.background_task.cancel()
+            self.background_task = None
+
+    def _roll_hours(self, base_unix_time):
+        # ET 整点是 175 秒的整数倍，整数换算保证每一代算出的同一个刷新时间完全相同
+        first = et_hour_index(base_unix_time) + 1
+        self.upcoming_hours = [(k * ET_HOUR_REAL_SECONDS, k % 24) for k in range(first, first + 24)]
+        self.generation += 1
+
+    def needs_roll(self, now) -> bool:
+        # 整点时间是精确整数，到点即更迭，不需要再提前 1 秒防 00:00 死锁
+        return not self.upcoming_hours or now >= self.upcoming_hours[0][0]
+
+    def roll_if_due(self, now, due_deadlines=()) -> bool:
+        """due_deadlines 是这一轮到期的定时器截止时间；只有某个定时器就定在这个整点上时才记录更迭延迟，
+        否则 now 离整点多远只说明这段时间没人需要醒来，不是调度延迟。"""
+        if not self.needs_roll(now):
+            return False
+        if self.upcoming_hours and self.upcoming_hours[0][0] in due_deadlines:
+            REGISTRY.observe('et_rollover_delay_seconds', now - self.upcoming_hours[0][0])
+        # _roll_hours 只取 now 所在整点之后的整点，刚到点的这一组不会被再次选中
+        self._roll_hours(now)
+        return True
+
+    def next_spawn_for(self, spawn_index):
+        """返回 spawn_index 中最近一个有节点刷新的 (et_hour, unix_ts)。"""
+        if not self.upcoming_hours:
+            self._roll_hours(self.now())
+        for ts, et_hour in self.upcoming_hours:
+            if et_hour in spawn_index:
+                return et_hour, ts
+        return None, None
+
+    async def _sleep_until(self, deadline):
+        loop = asyncio.get_running_loop()
+        self._sleeping_until = deadline
+        self._wakeup.clear()
+        handle = loop.call_at(loop.time() + max(0.0, deadline - self.now()), self._wakeup.set)
+        try:
+            await self._wakeup.wait()
+        finally:
+            handle.cancel()
+            self._sleeping_until = None
+
+    async def _run(self):
+        await self.bot.wait_until_ready()
+        while self.subscribers and not self.bot.is_closed():
+            if not self._timers:
+                await self._sleep_until(self.now() + NORMAL_REFRESH_INTERVAL)
+                continue
+            deadline = self._timers[0][0]
+            if deadline > self.now():
+                await self._sleep_until(deadline)
+                continue
+
+            now = self.now()
+            due, due_deadlines = [], set()
+            while self._timers and self._timers[0][0] <= now:
+                deadline, _, inst = heapq.heappop(self._timers)
+                if inst in self.subscribers and inst.wakeup_deadline == deadline and inst not in due:
+                    due.append(inst)
+                    due_deadlines.add(deadline)
+                    # 唤醒延迟：时钟本该在 deadline 叫醒它，实际晚了多少
+                    inst.last_lag = now - deadline
+                    inst.max_lag = max(inst.max_lag, inst.last_lag)
+                    REGISTRY.observe('tracker_wakeup_lag_seconds', inst.last_lag)
+            self.roll_if_due(now, due_deadlines)
+
+            with REGISTRY.timer('tracker_tick_seconds'):
+                results = await asyncio.gather(*(inst.on_clock_tick(now) for inst in due), return_exceptions=True)
+            for inst, result in zip(due, results):
+                if isinstance(result, Exception):
+                    print(f"频道 {inst.channel.id} 的追踪器刷新失败: {result}")
+                    result = None
+                if inst in self.subscribers:
+                    self.schedule(inst, result if result is not None else now + LOOP_INTERVAL)
+
+
+class SessionOwner(NamedTuple):
+    """恢复会话时代替 ctx.author：面板只需要启动者的 ID 和显示名。"""
+    id: int
+    display_name: str
+
+
 class TrackerInstance:
-    def __init__(self, bot, author, channel, all_nodes_data, manual_offset, user_watchlist, track_all, user_pings,
-                 all_watchlists):
-        self.bot, self.author, self.channel, self.all_nodes_data, self.manual_offset, self.user_watchlist, self.track_all, self.user_pings, self.all_watchlists = bot, author, channel, all_nodes_data, manual_offset, user_watchlist, track_all, user_pings, all_watchlists
-        self.background_task = self.tracker_message = None
-        self.monitored_nodes = []
-        self.pinged_users_this_spawn = set()
+    def __init__(self, bot, author, channel, catalogue, spawn_clock, watch_mask, track_all, ping_index,
+                 outbox, on_message_changed=None, query: Optional[NodeQuery] = None, members=()):
+        # watch_mask 是关注材料的位集（几个成员时是并集），None 表示没有列表、追踪全部
+        self.bot, self.author, self.channel, self.catalogue, self.spawn_clock, self.watch_mask, self.track_all = bot, author, channel, catalogue, spawn_clock, watch_mask, track_all
+        self.ping_index, self.outbox = ping_index, outbox
+        # !start @a @b 合并追踪的成员（SessionOwner），单人追踪时为空
+        self.members = tuple(members)
+        # !start filter 启动时已经求值好的过滤条件，追踪期间不再重新过滤
+        self.query = query
+        # 面板消息换了一条（首次发送、被删后重发）时回调，用来更新会话检查点
+        self.on_message_changed = on_message_changed
+        self.stopped = False
+        self.tracker_message = None
+        self.last_update_time = 0
+        self.wakeup_deadline = None
+        # 时钟唤醒延迟（秒），导出为 tracker_lag_seconds / tracker_max_lag_seconds
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        # 只保存节点 ID，具体字段通过 catalogue.get() 取回
+        self.monitored_node_ids = []
+        self._monitored_id_set = frozenset()
+        # ET 整点 -> 该整点刷新的节点 ID 列表。一天只有 24 个不同的开始ET，按小时分桶后每秒无需再扫全表
+        self.spawn_index = defaultdict(list)
+        # ET 整点 -> 该整点刷新的材料位集，和 spawn_index 一起在启动时算好
+        self.spawn_masks = [0] * 24
+        self.next_spawn_hour = None
+        self.next_spawn_ts = None
+        self.clock_generation = None
+        # 本次刷新已经发过提醒的提前秒数；同一提前量的所有人合并在一条消息里
+        self.pinged_leads_this_spawn = set()
+        self._group_mask = 0
+        self._group_ping_leads = ()
+        self._group_ping_key = None
 
         self.current_upcoming_events = []
         self.current_time_remaining = 0
 
+        # 渲染缓存：地点字段和地图按钮只在刷新组变化时重建；指纹相同的面板不再调用 edit
+        self._render_group_key = None
+        self._grouped_events = {}
+        self._location_fields = []
+        self._map_view = None
+        self._active_field_key = None
+        self._active_field = None
+        self._pushed_view_key = None
+        self._last_fingerprint = None
+
     async def start(self):
         self._prepare_monitored_nodes()
-        if not self.monitored_nodes:
+        if not self.monitored_node_ids:
             msg = f"**{self.author.display_name}**，你的关注列表为空，或列表中没有任何项目在追踪时间内。"
             if self.track_all: msg = "未能从CSV文件中加载任何有效的采集点数据。"
+            if self.query is not None: msg = f"没有符合 **{self.query.text}** 的限时采集点。"
             await self.channel.send(msg)
             return False
         try:
             embed, view = self._build_first_embed()
-            self.tracker_message = await self.channel.send(embed=embed, view=view)
-            self.background_task = self.bot.loop.create_task(self.tracker_loop())
+            self._set_message(await self.channel.send(embed=embed, view=view))
+            self.last_update_time = self.spawn_clock.now()
+            self.spawn_clock.subscribe(self)
             return True
         except Exception as e:
             await self.channel.send(f"启动追踪器时发生错误: {e}")
             return False
 
+    def resume(self, message, handoff=None) -> bool:
+        """重启后接管原来的面板消息：不重新发送，订阅时钟后第一次刷新直接编辑这条消息（消息已被删则重发）。
+
+        热重载时 handoff 带着旧实例的运行状态：刷新组没变就不会被当成新的一组，
+        已发过的提醒不会重发，面板内容没变也不会多编辑一次。
+        """
+        self._prepare_monitored_nodes()
+        if not self.monitored_node_ids:
+            return False
+        self.tracker_message = message
+        if handoff:
+            self.next_spawn_ts = handoff['next_spawn_ts']
+            self.pinged_leads_this_spawn = set(handoff['pinged_leads'])
+            self.last_update_time = handoff['last_update_time']
+            self._pushed_view_key = handoff['pushed_view_key']
+            self._last_fingerprint = handoff['last_fingerprint']
+        self.spawn_clock.subscribe(self)
+        return True
+
+    def handoff_state(self):
+        """热重载时交给新模块的运行状态，只包含内置类型和 discord 对象，不依赖本模块的类。"""
+        return {
+            'channel': self.channel,
+            'author': self.author,
+            'track_all': self.track_all,
+            'query': self.query,
+            'members': [tuple(member) for member in self.members],
+            'tracker_message': self.tracker_message,
+            'next_spawn_ts': self.next_spawn_ts,
+            'pinged_leads': set(self.pinged_leads_this_spawn),
+            'last_update_time': self.last_update_time,
+            'pushed_view_key': self._pushed_view_key,
+            'last_fingerprint': self._last_fingerprint,
+        }
+
+    def apply_catalogue(self, catalogue: NodeCatalogue, diff: CatalogueDiff) -> bool:
+        """nodes.csv 热更新：换成新版本目录，返回这个追踪器是否受影响。
+
+        只有差异里的节点落在本追踪器的范围内时才重建分桶并刷新面板；不重发消息，不重新订阅时钟。
+        材料 ID 在版本之间保持不变，关注位集原样可用；筛选条件按新目录重新求值一次。
+        """
+        previous_ids = self._monitored_id_set
+        if self.query is not None:
+            self.query = catalogue.query_index.compile(self.query.text.split())[0]
+        self.catalogue = catalogue
+        if not self._affected_by(diff, previous_ids):
+            return False
+        # 下一组刷新没变的话不算新的一组，已发过的提醒不会重发
+        next_spawn_ts = self.next_spawn_ts
+        self._prepare_monitored_nodes()
+        self.next_spawn_ts = next_spawn_ts
+        # 坐标可能变了，地图按钮也要跟着下一次编辑重新带上
+        self._render_group_key = self._group_ping_key = self._active_field_key = self._pushed_view_key = None
+        self.last_update_time = 0
+        if not self.stopped and self in self.spawn_clock.subscribers:
+            self.spawn_clock.schedule(self, self.spawn_clock.now())
+        return True
+
+    def _affected_by(self, diff: CatalogueDiff, previous_ids) -> bool:
+        if previous_ids.intersection(diff.removed) or previous_ids.intersection(diff.changed):
+            return True
+        query_ids = set(self.query.node_ids) if self.query is not None else None
+        if query_ids is not None and query_ids != previous_ids:
+            return True
+        node_masks = self.catalogue.item_bits.node_masks
+        for node_id in diff.added + diff.changed:
+            node = self.catalogue.get(node_id)
+            if node.start_et is None:
+                continue
+            if query_ids is not None:
+                wanted = node_id in query_ids
+            elif self.track_all or self.watch_mask is None:
+                wanted = True
+            else:
+                wanted = bool(node_masks.get(node_id, 0) & self.watch_mask)
+            if wanted:
+                return True
+        return False
+
+    def _set_message(self, message):
+        self.tracker_message = message
+        if self.on_message_changed:
+            self.on_message_changed(self)
+
     async def stop(self):
-        if self.background_task: self.background_task.cancel()
+        self.stopped = True
+        self.spawn_clock.unsubscribe(self)
+        self.outbox.discard(self.channel.id)
         if self.tracker_message:
             try:
                 await self.tracker_message.delete()
@@ -109,172 +613,292 @@ class TrackerInstance:
                 pass
 
     def _prepare_monitored_nodes(self):
-        initial_time = time.time() + self.manual_offset
-        full_node_list = []
-        for node_data in self.all_nodes_data:
-            start_et_str = node_data.get('开始ET')
-            if start_et_str and start_et_str.strip().isdigit():
-                et_hour = int(start_et_str.strip())
-                next_ts = self._get_next_occurrence_timestamp(et_hour, initial_time)
-                if next_ts: full_node_list.append({'data': node_data, 'next_ts': next_ts, 'et_hour': et_hour})
-        if self.track_all or not self.user_watchlist:
-            self.monitored_nodes = full_node_list
+        item_bits = self.catalogue.item_bits
+        self.spawn_index = defaultdict(list)
+        self.monitored_node_ids = []
+        self.next_spawn_hour = self.next_spawn_ts = self.clock_generation = None
+        if self.query is None and (self.track_all or self.watch_mask is None):
+            # 追踪全部时直接复用目录里按开始ET 建好的分桶和材料位集，不再逐个节点过滤
+            for et_hour, node_ids in enumerate(self.catalogue.window_index.starting_at):
+                if node_ids:
+                    self.spawn_index[et_hour] = list(node_ids)
+                    self.monitored_node_ids.extend(node_ids)
+            self.spawn_masks = list(item_bits.spawn_masks)
+            self._monitored_id_set = frozenset(self.monitored_node_ids)
+            return
+        if self.query is not None:
+            candidates = filter(None, map(self.catalogue.get, self.query.node_ids))
         else:
-            self.monitored_nodes = [n for n in full_node_list if n['data'].get('材料名CN') in self.user_watchlist]
+            candidates = (node for node in self.catalogue if item_bits.node_masks.get(node.node_id, 0) & self.watch_mask)
+        self.spawn_masks = [0] * 24
+        for node in candidates:
+            if node.start_et is None:
+                continue
+            self.monitored_node_ids.append(node.node_id)
+            self.spawn_index[node.start_et].append(node.node_id)
+            self.spawn_masks[node.start_et] |= item_bits.node_masks.get(node.node_id, 0)
+        self._monitored_id_set = frozenset(self.monitored_node_ids)
+
+    def _advance_spawn_group(self) -> bool:
+        """只在 ET 整点更迭时调用：沿共享时钟的整点表找到第一个非空分桶，返回刷新组是否变化。"""
+        et_hour, ts = self.spawn_clock.next_spawn_for(self.spawn_index)
+        self.clock_generation = self.spawn_clock.generation
+        changed = ts != self.next_spawn_ts
+        self.next_spawn_hour, self.next_spawn_ts = et_hour, ts
+        return changed
+
+    def _group_by_location(self, upcoming_events):
+        grouped_events = defaultdict(list)
+        for node_id in upcoming_events:
+            node = self.catalogue.get(node_id)
+            key = (node.region_cn or 'N/A', node.coords or 'N/A')
+            grouped_events[key].append(node.name_cn or 'N/A')
+        return grouped_events
+
+    def _refresh_render_cache(self):
+        group_key = (self.next_spawn_hour, self.next_spawn_ts)
+        if group_key == self._render_group_key:
+            return
+        self._grouped_events = self._group_by_location(self.spawn_index[self.next_spawn_hour])
+        self._location_fields = self._build_location_fields(self._grouped_events)
+        self._map_view = GatheringMapView(self._grouped_events)
+        self._render_group_key = group_key
+
+    def _active_now_field(self, et_hour):
+        """“当前开放”字段：由区间索引查出此刻开放的节点，每个 ET 小时只重建一次。"""
+        if self._active_field_key == et_hour:
+            return self._active_field
+        by_end_hour = defaultdict(list)
+        for node_id in self.catalogue.window_index.active(et_hour):
+            if node_id not in self._monitored_id_set:
+                continue
+            node = self.catalogue.get(node_id)
+            by_end_hour[spawn_window(node)[1]].append(node.name_cn)
+
+        field = None
+        if by_end_hour:
+            lines = []
+            for end_hour in sorted(by_end_hour, key=lambda h: (h - et_hour) % 24 or 24):
+                names = ', '.join(dict.fromkeys(by_end_hour[end_hour]))
+                lines.append(f"至 ET {end_hour:02d}:00 — {names}")
+            value = "\n".join(lines)
+            if len(value) > MAX_FIELD_VALUE_LENGTH:
+                value = value[:MAX_FIELD_VALUE_LENGTH - 1] + "…"
+            field = (f"🟢 当前开放 (ET {et_hour:02d}:00)", value)
+        self._active_field_key, self._active_field = et_hour, field
+        return field
+
+    def _render(self, time_remaining):
+        """返回 (embed, 内容指纹)。地点字段和 view 来自渲染缓存。"""
+        self._refresh_render_cache()
+        upcoming_events = self.spawn_index[self.next_spawn_hour]
+        current_et_hour = et_hour_index(self.spawn_clock.now()) % 24
+        embed = self._build_embed(upcoming_events, self._grouped_events, time_remaining, self._location_fields,
+                                  self._active_now_field(current_et_hour))
+        payload = json.dumps(embed.to_dict(), ensure_ascii=False, sort_keys=True)
+        fingerprint = hashlib.blake2b(f"{self._render_group_key}|{payload}".encode('utf-8'), digest_size=16).digest()
+        return embed, fingerprint
 
     def _build_first_embed(self):
-        initial_time = time.time() + self.manual_offset
-        soonest_ts = min(node['next_ts'] for node in self.monitored_nodes)
-        time_remaining = soonest_ts - initial_time
+        initial_time = self.spawn_clock.now()
+        self.spawn_clock.roll_if_due(initial_time)
+        self._advance_spawn_group()
+        time_remaining = self.next_spawn_ts - initial_time
+
+        embed, fingerprint = self._render(time_remaining)
+        self._pushed_view_key = self._render_group_key
+        self._last_fingerprint = fingerprint
+
+        return embed, self._map_view
+
+    async def on_clock_tick(self, now):
+        """由 SpawnClock 在截止时间到达时调用，返回下一次需要被唤醒的时间。"""
+        if not self.monitored_node_ids:
+            # nodes.csv 热更新后范围内一个节点都不剩：面板换成空状态，内容不变时指纹相同不会重复编辑
+            await self._push_panel(None)
+            return now + NORMAL_REFRESH_INTERVAL
+
+        # 👇 核心修复 1：强制跨越节点（只在共享时钟跨过 ET 整点时重新挑选分桶）
+        updated_any = False
+        if self.clock_generation != self.spawn_clock.generation:
+            updated_any = self._advance_spawn_group()
+
+        time_remaining = self.next_spawn_ts - now
+        upcoming_events = self.spawn_index[self.next_spawn_hour]
+
+        self.current_upcoming_events = upcoming_events
+        self.current_time_remaining = time_remaining
+
+        should_update_display = False
+        # 👇 核心修复 2：一旦有物品更迭了时间，强制清空已提醒名单，并刷新面板
+        if updated_any:
+            self.pinged_leads_this_spawn.clear()
+            should_update_display = True
+        elif time_remaining <= URGENT_THRESHOLD_SECONDS:
+            should_update_display = True
+        elif time_remaining <= MEDIUM_THRESHOLD_SECONDS:
+            if (now - self.last_update_time) >= MEDIUM_REFRESH_INTERVAL: should_update_display = True
+        elif (now - self.last_update_time) >= NORMAL_REFRESH_INTERVAL:
+            should_update_display = True
+
+        if should_update_display:
+            self.last_update_time = now
+            await self._push_panel(time_remaining)
+
+        # 👇 核心修复 4：必须在每一次刷新的最后，主动调用 ping 检查！
+        await self._check_and_send_pings(upcoming_events, time_remaining)
+
+        return self._next_wakeup(now)
+
+    async def _push_panel(self, time_remaining):
+        with REGISTRY.timer('tracker_render_seconds'):
+            embed, fingerprint = self._render(time_remaining)
+        if self.tracker_message and fingerprint == self._last_fingerprint:
+            return
+        # 排队时就记下指纹，后续相同的帧连队列都不进
+        self._last_fingerprint = fingerprint
+        view_key, view = self._render_group_key, self._map_view
+
+        async def job():
+            if self.stopped:
+                return
+            op = 'panel_send' if not self.tracker_message else 'panel_edit'
+            started = time.perf_counter()
+            try:
+                if not self.tracker_message:
+                    sent_at = time.time()
+                    self._set_message(await self.channel.send(embed=embed, view=view))
+                    # 新消息的雪花时间一定落在发出和收到响应之间，是很紧的时钟校准样本
+                    clock_sync = getattr(self.bot, 'clock_sync', None)
+                    if clock_sync is not None:
+                        clock_sync.add_sent_message(self.tracker_message.id, sent_at, time.time())
+                elif self._pushed_view_key != view_key:
+                    # 刷新组变了（哪怕中间的帧被合并丢弃），才把新的地图按钮带上
+                    await self.tracker_message.edit(embed=embed, view=view)
+                else:
+                    await self.tracker_message.edit(embed=embed)
+            except (discord.errors.NotFound, discord.errors.HTTPException) as e:
+                REGISTRY.inc('discord_request_errors_total', op=op, status=e.status)
+                op, started = 'panel_send', time.perf_counter()
+                self._set_message(await self.channel.send(embed=embed, view=view))
+            REGISTRY.observe('discord_request_seconds', time.perf_counter() - started, op=op)
+            self._pushed_view_key = view_key
+
+        self.outbox.submit_edit(self.channel.id, job)
+
+    def _next_wakeup(self, now):
+        spawn_ts = self.next_spawn_ts
+        time_remaining = spawn_ts - now
+        # 到点即更迭到下一组，与 SpawnClock.needs_roll 保持一致
+        deadlines = [spawn_ts]
+
+        if time_remaining <= URGENT_THRESHOLD_SECONDS:
+            deadlines.append(self.last_update_time + URGENT_REFRESH_INTERVAL)
+        elif time_remaining <= MEDIUM_THRESHOLD_SECONDS:
+            deadlines.append(self.last_update_time + MEDIUM_REFRESH_INTERVAL)
+            deadlines.append(spawn_ts - URGENT_THRESHOLD_SECONDS)
+        else:
+            deadlines.append(self.last_update_time + NORMAL_REFRESH_INTERVAL)
+            deadlines.append(spawn_ts - MEDIUM_THRESHOLD_SECONDS)
 
-        # 容差改为 2.0，确保同时间的采集点都在一起
-        upcoming_events = [n for n in self.monitored_nodes if abs(n['next_ts'] - soonest_ts) < 2.0]
-        grouped_events = defaultdict(list)
-        for event in upcoming_events:
-            data = event['data']
-            key = (data.get('地区CN', 'N/A'), data.get('具体坐标', 'N/A'))
-            grouped_events[key].append(data.get('材料名CN', 'N/A'))
+        for target_ping_sec in self._ping_leads_for_group():
+            deadlines.append(spawn_ts - target_ping_sec)
 
-        embed = self._build_embed(upcoming_events, grouped_events, time_remaining)
-        view = GatheringMapView(grouped_events)
+        future = [d for d in deadlines if d > now]
+        return min(future) if future else now + URGENT_REFRESH_INTERVAL
 
-        return embed, view
+    def _ping_leads_for_group(self):
+        """当前刷新组里有人设置了提醒的提前秒数，按 (刷新组, 索引版本) 缓存。"""
+        key = (self.next_spawn_hour, self.next_spawn_ts, self.ping_index.version)
+        if key != self._group_ping_key:
+            self._group_mask = self.spawn_masks[self.next_spawn_hour] if self.next_spawn_hour is not None else 0
+            self._group_ping_leads = sorted(self.ping_index.leads_for(self._group_mask), reverse=True)
+            self._group_ping_key = key
+        return self._group_ping_leads
 
-    async def tracker_loop(self):
-        await self.bot.wait_until_ready()
-        last_update_time = time.time()
-        while not self.bot.is_closed():
-            loop_start_time = time.time()
-            now = loop_start_time + self.manual_offset
-            if not self.monitored_nodes:
-                await asyncio.sleep(LOOP_INTERVAL)
+    async def _check_and_send_pings(self, upcoming_events, time_remaining):
+        for target_ping_sec in self._ping_leads_for_group():
+            if target_ping_sec in self.pinged_leads_this_spawn:
+                continue
+            # 使用一个宽容区间，防止系统卡顿导致错过那刚好的一秒
+            if not (target_ping_sec >= time_remaining > (target_ping_sec - LOOP_INTERVAL - 1.0)):
                 continue
 
-            # 👇 核心修复 1：强制跨越节点
-            updated_any = False
-            for node in self.monitored_nodes:
-                # 提前 1 秒判定到达时间，避免 00:00 死锁
-                if now >= node['next_ts'] - 1.0:
-                    # now + 2 确保计算下一个时间时，基准点已经在这个节点之后了
-                    node['next_ts'] = self._get_next_occurrence_timestamp(node['et_hour'], now + 2)
-                    updated_any = True
-
-            soonest_ts_after_update = min(n['next_ts'] for n in self.monitored_nodes)
-            time_remaining = soonest_ts_after_update - now
-            upcoming_events = [n for n in self.monitored_nodes if abs(n['next_ts'] - soonest_ts_after_update) < 2.0]
-
-            self.current_upcoming_events = upcoming_events
-            self.current_time_remaining = time_remaining
-
-            should_update_display = False
-            # 👇 核心修复 2：一旦有物品更迭了时间，强制清空已提醒名单，并刷新面板
-            if updated_any:
-                self.pinged_users_this_spawn.clear()
-                should_update_display = True
-            elif time_remaining <= URGENT_THRESHOLD_SECONDS:
-                should_update_display = True
-            elif time_remaining <= MEDIUM_THRESHOLD_SECONDS:
-                if (now - last_update_time) >= MEDIUM_REFRESH_INTERVAL: should_update_display = True
-            elif (now - last_update_time) >= NORMAL_REFRESH_INTERVAL:
-                should_update_display = True
-
-            if should_update_display:
-                last_update_time = now
-                grouped_events = defaultdict(list)
-                for event in upcoming_events:
-                    data = event['data']
-                    key = (data.get('地区CN', 'N/A'), data.get('具体坐标', 'N/A'))
-                    grouped_events[key].append(data.get('材料名CN', 'N/A'))
-
-                embed = self._build_embed(upcoming_events, grouped_events, time_remaining)
-                view = GatheringMapView(grouped_events)
-
-                try:
-                    if self.tracker_message:
-                        await self.tracker_message.edit(embed=embed, view=view)
-                    else:
-                        self.tracker_message = await self.channel.send(embed=embed, view=view)
-                except (discord.errors.NotFound, discord.errors.HTTPException):
-                    self.tracker_message = await self.channel.send(embed=embed, view=view)
-
-            # 👇 核心修复 4：必须在每一次循环的最后，主动调用 ping 检查！
-            await self._check_and_send_pings(upcoming_events, time_remaining)
-
-            processing_time = time.time() - loop_start_time
-            sleep_duration = LOOP_INTERVAL - processing_time
-            if sleep_duration > 0: await asyncio.sleep(sleep_duration)
+            item_bits = self.catalogue.item_bits
+            items_by_user = {user_id: item_bits.names_of(mask)
+                             for user_id, mask in self.ping_index.subscribers(self._group_mask, target_ping_sec)}
+            # 记录已提醒，防止在这几秒内疯狂连环 @
+            self.pinged_leads_this_spawn.add(target_ping_sec)
+            if not items_by_user:
+                continue
 
-    async def _check_and_send_pings(self, upcoming_events, time_remaining):
-        for user_id_str, ping_time in self.user_pings.items():
-            user_id = int(user_id_str)
-            # 获取用户设置的 ping 时间
-            target_ping_sec = int(ping_time)
+            header = f"⏰ 以下关注的材料即将在 **{target_ping_sec}** 秒后刷新！"
+            lines = [f"<@{user_id}> **{', '.join(items)}**" for user_id, items in items_by_user.items()]
+            for message in chunk_message_lines(header, lines):
+                # 发送提醒，并在倒计时结束后自动删除这条提醒消息保持频道整洁
+                self._queue_ping(message, delete_after=target_ping_sec + 10)
 
-            # 判断逻辑：时间有效 && 没被 @ 过 && 当前剩余时间正好踩中了这个区间
-            is_valid_ping = target_ping_sec > 0
-            not_pinged_yet = user_id not in self.pinged_users_this_spawn
+    def _queue_ping(self, message, delete_after):
+        async def job():
+            started = time.perf_counter()
+            try:
+                await self.channel.send(message, delete_after=delete_after)
+                REGISTRY.observe('discord_request_seconds', time.perf_counter() - started, op='ping_send')
+            except Exception as e:
+                REGISTRY.inc('discord_request_errors_total', op='ping_send', status=getattr(e, 'status', type(e).__name__))
+                print(f"发送提醒失败: {e}")
 
-            # 使用一个宽容区间，防止系统卡顿导致错过那刚好的一秒
-            is_time_to_ping = target_ping_sec >= time_remaining > (target_ping_sec - LOOP_INTERVAL - 1.0)
-
-            if is_valid_ping and not_pinged_yet and is_time_to_ping:
-                user_watchlist = self.all_watchlists.get(user_id_str, [])
-                if not user_watchlist:
-                    continue
-
-                items_to_ping_for = [event['data']['材料名CN'] for event in upcoming_events if
-                                     event['data']['材料名CN'] in user_watchlist]
-
-                if items_to_ping_for:
-                    try:
-                        message = f"⏰ <@{user_id}>，你关注的 **{', '.join(items_to_ping_for)}** 即将在 **{target_ping_sec}** 秒后刷新！"
-                        # 发送提醒，并在倒计时结束后自动删除这条提醒消息保持频道整洁
-                        await self.channel.send(message, delete_after=target_ping_sec + 10)
-                        # 记录已提醒，防止在这几秒内疯狂连环 @
-                        self.pinged_users_this_spawn.add(user_id)
-                    except Exception as e:
-                        print(f"发送提醒失败: {e}")
-
-    def _get_next_occurrence_timestamp(self, et_hour: int, current_unix_time: float) -> Optional[float]:
-        if not (0 <= et_hour < 24): return None
-        target_et_total_minutes = et_hour * 60
-        eorzea_total_seconds = current_unix_time * EORZEA_MULTIPLIER
-        current_et_total_minutes = (eorzea_total_seconds // 60) % (24 * 60)
-
-        # 👇 核心修复 3：使用取模解决死循环问题
-        minute_diff = (target_et_total_minutes - current_et_total_minutes) % 1440
-        if minute_diff < 1:  # 如果算出来的时间就是现在，强制把它推到明天的这个点！
-            minute_diff += 1440
-
-        seconds_to_wait = minute_diff * (175 / 60)
-        return current_unix_time + seconds_to_wait
-
-    def _build_embed(self, upcoming_events, grouped_events, time_remaining):
+        self.outbox.submit_ping(self.channel.id, job)
+
+    def _build_location_fields(self, grouped_events):
+        grouped_items = list(grouped_events.items())
+        fields = []
+        # 预留“下一个刷新”和“当前开放”两个字段
+        available = MAX_EMBED_FIELDS - 2
+        if len(grouped_items) > available:
+            display_items = grouped_items[:available - 1]
+            omitted_count = len(grouped_items) - len(display_items)
+            for (region, coords), materials in display_items:
+                fields.append((f"📍 {region} ({coords})", f"**材料**: {', '.join(materials)}"))
+            fields.append(("...", f"⚠️ **以及另外 {omitted_count} 个地点未显示**"))
+        else:
+            for (region, coords), materials in grouped_items:
+                fields.append((f"📍 {region} ({coords})", f"**材料**: {', '.join(materials)}"))
+        return fields
+
+    def _build_embed(self, upcoming_events, grouped_events, time_remaining, location_fields=None, active_field=None):
         title_suffix = f"(由 {self.author.display_name} 启动)"
-        if self.track_all:
+        if self.query is not None:
+            title_suffix = f"(筛选: {self.query.text})"
+        elif self.track_all:
             title_suffix = "(追踪全部)"
-        elif self.user_watchlist:
+        elif len(self.members) > 1 and self.watch_mask is None:
+            # 几个成员的列表都是空的，追踪器退回追踪全部
+            title_suffix = f"(追踪全部：{'、'.join(m.display_name for m in self.members)} 的列表都是空的)"
+        elif len(self.members) > 1:
+            title_suffix = f"(追踪 {'、'.join(m.display_name for m in self.members)} 的列表合集)"
+        elif self.watch_mask is not None:
             title_suffix = f"(追踪 {self.author.display_name} 的列表)"
         embed = discord.Embed(title=f"FF14 采集点追踪器 {title_suffix}",
-                              description=f"现实时间(LT): **{datetime.datetime.now().strftime('%H:%M:%S')}**\n艾欧泽亚(ET): **{self._get_current_eorzea_time()}**",
+                              description=f"现实时间(LT): **{datetime.datetime.now().strftime('%H:%M')}**\n艾欧泽亚(ET): **{self._get_current_eorzea_time()}**",
                               color=discord.Color.green())
+        if not self.monitored_node_ids:
+            embed.description += "\n\n当前没有符合条件的采集点（nodes.csv 更新后可能已被移除）。"
+            embed.color = discord.Color.greyple()
+            return embed
         if not upcoming_events:
             embed.description += "\n\n当前没有你关注的项目即将刷新。"
             embed.color = discord.Color.greyple()
             return embed
-        event_time_info = upcoming_events[0]['data']
-        embed.add_field(name=f"下一个刷新: ET {event_time_info.get('开始ET', '?')}:00",
+        event_time_info = self.catalogue.get(upcoming_events[0])
+        embed.add_field(name=f"下一个刷新: ET {event_time_info.start_et}:00",
                         value=f"**现实时间剩余: {self._format_time_delta(time_remaining)}**", inline=False)
-        grouped_items = list(grouped_events.items())
-        if len(grouped_items) > MAX_EMBED_FIELDS - 1:
-            display_items = grouped_items[:MAX_EMBED_FIELDS - 2]
-            omitted_count = len(grouped_items) - len(display_items)
-            for (region, coords), materials in display_items:
-                embed.add_field(name=f"📍 {region} ({coords})", value=f"**材料**: {', '.join(materials)}", inline=False)
-            embed.add_field(name="...", value=f"⚠️ **以及另外 {omitted_count} 个地点未显示**", inline=False)
-        else:
-            for (region, coords), materials in grouped_items:
-                embed.add_field(name=f"📍 {region} ({coords})", value=f"**材料**: {', '.join(materials)}", inline=False)
+        if active_field:
+            embed.add_field(name=active_field[0], value=active_field[1], inline=False)
+        if location_fields is None:
+            location_fields = self._build_location_fields(grouped_events)
+        for name, value in location_fields:
+            embed.add_field(name=name, value=value, inline=False)
         embed.set_footer(text=f"使用 !stop 停止")
         if time_remaining <= MEDIUM_THRESHOLD_SECONDS: embed.color = discord.Color.orange()
         if time_remaining <= URGENT_THRESHOLD_SECONDS: embed.color = discord.Color.red()
@@ -282,13 +906,7 @@ class TrackerInstance:
         return embed
 
     def _get_current_eorzea_time(self) -> str:
-        unix_now = time.time() + self.manual_offset
-        eorzea_total_seconds = int(unix_now * EORZEA_MULTIPLIER)
-        total_e_minutes = eorzea_total_seconds // 60
-        minute_of_day = total_e_minutes % (24 * 60)
-        hour = minute_of_day // 60
-        minute = minute_of_day % 60
-        return f"{hour:02d}:{minute:02d}"
+        return format_et(self.spawn_clock.now())
 
     def _format_time_delta(self, seconds: float) -> str:
         seconds = max(0, seconds)
@@ -303,54 +921,75 @@ class TrackerManager:
         self.csv_filename = config['CSV_FILENAME']
         self.watchlist_file = config['WATCHLIST_FILE']
         self.ping_file = config['PING_FILE']
+        # 关注列表和提醒设置存在 SQLite 里；旧的两个 JSON 只在第一次启动时导入
+        self.db_file = config.get('TRACKER_DB_FILE',
+                                  os.path.join(os.path.dirname(self.watchlist_file), 'tracker.db'))
+        self.store = WatchlistStore(self.db_file)
+        self.map_id_file = config.get('MAP_ID_FILE', map_id_filepath)
         self.manual_offset = config['MANUAL_TIME_OFFSET_SECONDS']
+        self.clock = EorzeaClock(self.manual_offset)
+        # 时钟偏移由 bot 上的估算器根据服务器时间自动校准（重载模块后新时钟重新挂上去）；没有估算器时只用手动偏移
+        self.clock_sync = getattr(bot, 'clock_sync', None)
+        if self.clock_sync is not None:
+            self.clock_sync.attach(self.clock)
         self.user_watchlists = {}
         self.user_pings = {}
-        self.all_nodes_data = []
+        self.catalogue = NodeCatalogue([])
+        self.timeline = SpawnTimeline(self.catalogue)
         self.active_trackers = {}
-        self.all_item_names = []
+        self._sessions_resumed = False
+        # 启动后逐个错开恢复的会话：还没轮到的留在队列里，!reload 时交给新模块接着恢复
+        self._pending_sessions = deque()
+        self._resume_task = None
+        self.all_item_names = frozenset()
+        self.item_index = ItemNameIndex(())
+        self.ping_index = PingIndex(self.user_watchlists, self.user_pings, self.catalogue.item_bits)
+        # 所有频道的追踪器共用同一个 ET 时钟和同一个发送队列
+        self.spawn_clock = SpawnClock(bot, self.clock)
+        self.outbox = DiscordOutbox(bot, config)
+        # nodes.csv 热更新：同一时间只允许一次重新加载；watch_interval 为 0 时不自动检查文件
+        self.nodes_watch_interval = config.get('NODES_WATCH_INTERVAL', DEFAULT_NODES_WATCH_INTERVAL)
+        self._nodes_lock = asyncio.Lock()
+        self._nodes_stamp = None
+        # 上一次解析失败的文件版本；文件没再改动前自动检查不会反复重试
+        self._nodes_failed_stamp = None
+        self._nodes_watch_task = None
+        self._register_gauges()
+
+    def _register_gauges(self):
+        # 重载模块后新的 manager 重新注册，替换掉指向旧对象的回调
+        REGISTRY.register_gauge('trackers_active', lambda: {(): len(self.active_trackers)})
+        REGISTRY.register_gauge('outbox_queue_depth', lambda: {(): self.outbox.queue_depth()})
+        REGISTRY.register_gauge('clock_offset_seconds', lambda: {(): self.clock.offset_seconds})
+        REGISTRY.register_gauge('tracker_lag_seconds', lambda: {
+            (('channel', str(channel_id)),): inst.last_lag for channel_id, inst in self.active_trackers.items()})
+        REGISTRY.register_gauge('tracker_max_lag_seconds', lambda: {
+            (('channel', str(channel_id)),): inst.max_lag for channel_id, inst in self.active_trackers.items()})
 
     def load_data(self):
-        if os.path.exists(self.watchlist_file):
-            try:
-                with open(self.watchlist_file, 'r', encoding='utf-8') as f:
-                    self.user_watchlists = json.load(f)
-            except (json.JSONDecodeError, FileNotFoundError):
-                self.user_watchlists = {}
-        else:
-            self.user_watchlists = {}
+        self.store.migrate_from_json(self.watchlist_file, self.ping_file)
+        self.user_watchlists = self.store.load_watchlists()
         print("用户关注列表已加载。")
-        if os.path.exists(self.ping_file):
-            try:
-                with open(self.ping_file, 'r', encoding='utf-8') as f:
-                    self.user_pings = json.load(f)
-            except (json.JSONDecodeError, FileNotFoundError):
-                self.user_pings = {}
-        else:
-            self.user_pings = {}
+        self.user_pings = self.store.load_pings()
         print("用户提醒设置已加载。")
-        self.all_nodes_data = self._load_nodes_from_csv()
-        if self.all_nodes_data:
-            print(f"成功从 {self.csv_filename} 加载 {len(self.all_nodes_data)} 条数据。")
-            item_names = set()
-            for node in self.all_nodes_data:
-                if '材料名CN' in node and node['材料名CN']:
-                    item_names.add(node['材料名CN'])
-            self.all_item_names = list(item_names)
-            print(f"已加载 {len(self.all_item_names)} 个独一无二的材料名用于校验。")
+        self._nodes_stamp = self._nodes_file_stamp()
+        self.catalogue = self._load_nodes_from_csv()
+        self.timeline = SpawnTimeline(self.catalogue)
+        self.ping_index.rebind(self.user_watchlists, self.user_pings, self.catalogue.item_bits)
+        if self.catalogue:
+            print(f"成功从 {self.csv_filename} 加载 {len(self.catalogue)} 条数据。")
+            self.all_item_names = self.catalogue.item_names
+            self.item_index = ItemNameIndex.from_catalogue(self.catalogue)
+            print(f"已加载 {len(self.all_item_names)} 个独一无二的材料名用于校验（中/英/日共 {len(self.item_index)} 种写法）。")
+            MAP_ID_MAP.clear()
+            MAP_ID_MAP.update(self.catalogue.map_ids)
+            if MAP_ID_MAP:
+                print(f"🗺️ 成功加载地图 ID 映射表，共 {len(MAP_ID_MAP)} 个区域。")
+            else:
+                print(f"⚠️ 找不到 {self.map_id_file} 文件，外部地图精确跳转功能将受限。")
         else:
             print(f"!!! 严重错误: 未能从 {self.csv_filename} 加载任何数据。!!!")
 
-    def _safe_save_json(self, data, filename):
-        temp_file = f"{filename}.tmp"
-        try:
-            with open(temp_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=4)
-            os.replace(temp_file, filename)
-        except Exception as e:
-            print(f"!!!严重错误: 保存 {filename} 失败: {e}")
-            if os.path.exists(temp_file): os.remove(temp_file)
-
     def add_to_watchlist(self, user_id, items_str):
         user_id_str = str(user_id)
         if user_id_str not in self.user_watchlists:
@@ -368,35 +1007,106 @@ class TrackerManager:
             clean_item = item.strip().strip('"').strip("'").strip()
             if not clean_item: continue
 
-            if clean_item in user_current_list:
-                already_exist.append(clean_item)
+            # 中/英/日任意写法都换成规范的中文名再保存
+            canonical = self.item_index.resolve(clean_item)
+            if canonical is None:
+                not_found_in_csv.append(clean_item)
                 continue
 
-            if clean_item in self.all_item_names:
-                user_current_list.append(clean_item)
-                added.append(clean_item)
-            else:
-                not_found_in_csv.append(clean_item)
+            if canonical in user_current_list:
+                already_exist.append(canonical)
+                continue
+
+            user_current_list.append(canonical)
+            added.append(canonical)
 
         if added:
-            self._safe_save_json(self.user_watchlists, self.watchlist_file)
+            self.ping_index.invalidate()
+            self.store.add_items(user_id_str, added)
 
         response_parts = []
         if added:
             response_parts.append(f"✅ 已添加: **{', '.join(added)}**")
         if already_exist:
-            response_parts.append(f"ℹ️ 已存在: **{', '.join(already_exist)}**")
-        if not_found_in_csv:
-            response_parts.append(f"❌ 物品不存在: **{', '.join(not_found_in_csv)}**")
+            response_parts.append(f"ℹ️ 已存在: **{', '.join(dict.fromkeys(already_exist))}**")
+        for missing in not_found_in_csv:
+            suggestions = self.item_index.suggest(missing)
+            hint = f"，你是不是要找: {', '.join(suggestions)}" if suggestions else ""
+            response_parts.append(f"❌ 物品不存在: **{missing}**{hint}")
 
         return "\n".join(response_parts) if response_parts else "请输入有效的材料名。"
 
-    def _load_nodes_from_csv(self) -> List[Dict]:
+    def _load_nodes_from_csv(self) -> NodeCatalogue:
         try:
-            with open(self.csv_filename, mode='r', encoding='utf-8') as infile:
-                return list(csv.DictReader(infile))
+            return load_catalogue(self.csv_filename, self.map_id_file)
         except FileNotFoundError:
-            return []
+            return NodeCatalogue([])
+
+    # --- nodes.csv 热更新 ---
+    def _nodes_file_stamp(self):
+        stamp = []
+        for filename in (self.csv_filename, self.map_id_file):
+            try:
+                st = os.stat(filename)
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except (OSError, TypeError):
+                stamp.append(None)
+        return tuple(stamp)
+
+    def _build_catalogue_version(self, previous: NodeCatalogue):
+        """在线程里解析新的 nodes.csv 并建好所有索引，返回 (新目录, 材料名索引)。"""
+        catalogue = load_catalogue(self.csv_filename, self.map_id_file)
+        catalogue.inherit_item_ids(previous)
+        catalogue.warm_up()
+        return catalogue, ItemNameIndex.from_catalogue(catalogue)
+
+    async def reload_nodes(self) -> str:
+        """重新读取 nodes.csv，把差异一次性应用到目录、材料名索引和所有运行中的追踪器。"""
+        async with self._nodes_lock:
+            stamp = self._nodes_file_stamp()
+            previous = self.catalogue
+            try:
+                catalogue, item_index = await asyncio.to_thread(self._build_catalogue_version, previous)
+            except Exception as e:
+                self._nodes_failed_stamp = stamp
+                return f"❌ 重新加载 nodes.csv 失败，继续使用当前数据: {e}"
+            self._nodes_stamp = stamp
+            self._nodes_failed_stamp = None
+            if not catalogue:
+                return "❌ 新的 nodes.csv 里没有任何数据，继续使用当前数据。"
+            diff = diff_catalogues(previous, catalogue)
+            if diff.empty and catalogue.map_ids == previous.map_ids:
+                return "ℹ️ nodes.csv 没有变化。"
+            # 以下到结束没有 await：对事件循环上的其它任务来说，新旧版本的切换是一步完成的
+            self.catalogue = catalogue
+            self.item_index = item_index
+            self.all_item_names = catalogue.item_names
+            self.timeline = SpawnTimeline(catalogue)
+            MAP_ID_MAP.clear()
+            MAP_ID_MAP.update(catalogue.map_ids)
+            self.ping_index.rebind(self.user_watchlists, self.user_pings, catalogue.item_bits)
+            affected = sum(instance.apply_catalogue(catalogue, diff) for instance in self.active_trackers.values())
+        summary = (f"✅ nodes.csv 已更新: 共 **{len(catalogue)}** 条，新增 **{len(diff.added)}**、"
+                   f"移除 **{len(diff.removed)}**、变更 **{len(diff.changed)}** 个采集点；"
+                   f"更新了 **{affected}/{len(self.active_trackers)}** 个运行中的追踪器。")
+        print(summary)
+        return summary
+
+    def start_nodes_watcher(self):
+        if self.nodes_watch_interval > 0 and (self._nodes_watch_task is None or self._nodes_watch_task.done()):
+            self._nodes_watch_task = self.bot.loop.create_task(self._watch_nodes_file())
+
+    async def _watch_nodes_file(self):
+        while True:
+            await asyncio.sleep(self.nodes_watch_interval)
+            stamp = self._nodes_file_stamp()
+            if stamp in (self._nodes_stamp, self._nodes_failed_stamp) or self._nodes_lock.locked():
+                continue
+            print("检测到 nodes.csv / map_id.json 有修改，正在重新加载...")
+            result = await self.reload_nodes()
+            if not result.startswith("✅"):
+                # 成功时 reload_nodes 自己会打印摘要；失败或没有变化的原因在这里打印
+                print(result)
 
     def remove_from_watchlist(self, user_id, items_str):
         user_id_str = str(user_id)
@@ -406,6 +1116,7 @@ class TrackerManager:
         for item in item_list:
             clean_item = item.strip().strip('"').strip("'").strip()
             if not clean_item: continue
+            clean_item = self.item_index.resolve(clean_item) or clean_item
             if clean_item in self.user_watchlists[user_id_str]:
                 self.user_watchlists[user_id_str].remove(clean_item)
                 removed.append(clean_item)
@@ -413,7 +1124,8 @@ class TrackerManager:
                 not_found.append(clean_item)
         if removed:
             if not self.user_watchlists[user_id_str]: del self.user_watchlists[user_id_str]
-            self._safe_save_json(self.user_watchlists, self.watchlist_file)
+            self.ping_index.invalidate()
+            self.store.remove_items(user_id_str, removed)
         response = ""
         if removed: response += f"✅ 已移除: **{', '.join(removed)}**。\n"
         if not_found: response += f"❌ 找不到: **{', '.join(not_found)}**。"
@@ -422,11 +1134,18 @@ class TrackerManager:
     def get_watchlist(self, user_id):
         return self.user_watchlists.get(str(user_id), [])
 
+    def watch_mask_for(self, members) -> Optional[int]:
+        """几个成员关注列表的并集位集；所有人的列表都是空的时返回 None，追踪器退回追踪全部。"""
+        if not any(self.get_watchlist(member.id) for member in members):
+            return None
+        return self.ping_index.watch_mask(member.id for member in members)
+
     def clear_watchlist(self, user_id):
         uid_str = str(user_id)
         if uid_str in self.user_watchlists:
             del self.user_watchlists[uid_str]
-            self._safe_save_json(self.user_watchlists, self.watchlist_file)
+            self.ping_index.invalidate()
+            self.store.clear_items(uid_str)
 
     def copy_watchlist(self, source_user_id, dest_user_id):
         source_id_str, dest_id_str = str(source_user_id), str(dest_user_id)
@@ -439,7 +1158,8 @@ class TrackerManager:
         self.user_watchlists[dest_id_str] = sorted(list(merged_set))
         items_added_count = len(self.user_watchlists[dest_id_str]) - original_count
         if items_added_count > 0:
-            self._safe_save_json(self.user_watchlists, self.watchlist_file)
+            self.ping_index.invalidate()
+            self.store.replace_items(dest_id_str, self.user_watchlists[dest_id_str])
             return f"✅ 成功复制了 **{items_added_count}** 个新项目到你的关注列表。"
         else:
             return "ℹ️ 目标用户的关注项已全部在你的列表中，无需复制。"
@@ -449,30 +1169,165 @@ class TrackerManager:
         if seconds == -1 or str(seconds).lower() == 'off':
             if user_id_str in self.user_pings:
                 del self.user_pings[user_id_str]
-                self._safe_save_json(self.user_pings, self.ping_file)
+                self.ping_index.invalidate()
+                self.store.delete_ping(user_id_str)
                 return "✅ 你的个人提醒功能已关闭。"
             return "ℹ️ 你尚未开启提醒功能。"
         self.user_pings[user_id_str] = seconds
-        self._safe_save_json(self.user_pings, self.ping_file)
+        self.ping_index.invalidate()
+        self.store.set_ping(user_id_str, seconds)
         return f"✅ 提醒设置成功！将在刷新前 **{seconds}** 秒 @ 你。"
 
     def get_ping_for_user(self, user_id):
         return self.user_pings.get(str(user_id), -1)
 
-    async def start_tracker_for_channel(self, ctx, track_all=False):
+    def _parse_timeline_args(self, user_id, args):
+        """!timeline 的参数：[小时数] [all] [职能...] [版本...]，不指定 all 时默认只看自己的关注列表。"""
+        hours, track_all, jobs, expansions, unknown = DEFAULT_TIMELINE_HOURS, False, set(), set(), []
+        known_expansions = {r.expansion for r in self.catalogue if r.expansion}
+        for arg in args:
+            token = arg.strip()
+            try:
+                hours = float(token)
+                continue
+            except ValueError:
+                pass
+            if token.lower() == 'all':
+                track_all = True
+            elif token.lower() in JOB_ALIASES:
+                jobs.add(JOB_ALIASES[token.lower()])
+            elif token in known_expansions:
+                expansions.add(token)
+            else:
+                unknown.append(token)
+        watchlist = self.get_watchlist(user_id)
+        items = frozenset(watchlist) if watchlist and not track_all else None
+        node_filter = NodeFilter(items, frozenset(jobs) or None, frozenset(expansions) or None)
+        return max(0.0, min(hours, MAX_TIMELINE_HOURS)), node_filter, unknown
+
+    def build_timeline_messages(self, user_id, args):
+        if not self.catalogue:
+            return ["❌ 机器人未能加载 `nodes.csv` 数据。"]
+        hours, node_filter, unknown = self._parse_timeline_args(user_id, args)
+        if unknown:
+            return [f"❌ 无法识别的参数: **{', '.join(unknown)}**。用法: `!timeline [小时数] [all] [园艺/采掘] [版本]`"]
+
+        groups = self.timeline.forecast(self.clock.now(), hours * 3600, node_filter)
+        scope = "关注列表" if node_filter.items is not None else "全部采集点"
+        if node_filter.jobs: scope += f" | {'/'.join(sorted(node_filter.jobs))}"
+        if node_filter.expansions: scope += f" | {'/'.join(sorted(node_filter.expansions))}"
+        header = f"🗓️ 接下来 **{hours:g}** 小时的刷新时间表（{scope}）"
+        if not groups:
+            return [f"{header}\n这段时间内没有符合条件的刷新。"]
+
+        lines = []
+        for ts, node_ids in groups:
+            names = list(dict.fromkeys(self.catalogue.get(i).name_cn for i in node_ids))
+            lines.append(f"<t:{ts}:t> (<t:{ts}:R>) **ET {self.timeline.et_hour_of(ts):02d}:00** — {', '.join(names)}")
+        # 留出末尾“后面还有更多”提示的位置
+        messages = chunk_message_lines(header, lines, MAX_MESSAGE_LENGTH - 50)
+        if len(messages) > MAX_TIMELINE_MESSAGES:
+            messages = messages[:MAX_TIMELINE_MESSAGES]
+            messages[-1] += "\n……后面还有更多，请缩短小时数或加上过滤条件。"
+        return messages
+
+    def _build_route_messages(self, watchlist, now):
+        plan = RoutePlanner(self.catalogue, MAP_ID_MAP).plan(watchlist, now)
+        header = (f"🧭 接下来一个 ET 日（约 70 分钟）的采集路线：可采到 **{len(plan.collected)}/{len(watchlist)}** 个关注材料，"
+                  f"预计耗时约 **{int(plan.total_seconds // 60)}** 分钟")
+        lines = []
+        for stop in plan.stops:
+            node = self.catalogue.get(stop.node_id)
+            arrive_ts = int(stop.arrive_ts)
+            hint = f" 🔮{node.aetheryte}" if node.aetheryte else ""
+            move = "✈️" if stop.teleport else "➡️"
+            lines.append(f"<t:{arrive_ts}:t> **ET {format_et(stop.arrive_ts)}** {move} "
+                         f"[{node.region_cn} ({node.coords.strip('[]')})](<{get_web_map_url(node.region_cn, node.coords)}>){hint} — {node.name_cn}")
+        if plan.missed:
+            lines.append(f"⚠️ 本轮排不进路线: {', '.join(plan.missed)}")
+        if plan.untimed:
+            lines.append(f"ℹ️ 没有限时采集点: {', '.join(plan.untimed)}")
+        return chunk_message_lines(header, lines)
+
+    async def build_route_messages(self, user_id):
+        if not self.catalogue:
+            return ["❌ 机器人未能加载 `nodes.csv` 数据。"]
+        watchlist = self.get_watchlist(user_id)
+        if not watchlist:
+            return ["你的关注列表是空的。先用 `!add` 添加材料再规划路线。"]
+        # 关注列表很长时规划要上百毫秒，放到线程里算，不阻塞其它追踪器的刷新
+        return await asyncio.to_thread(self._build_route_messages, list(watchlist), self.clock.now())
+
+    def build_find_messages(self, args):
+        if not self.catalogue:
+            return ["❌ 机器人未能加载 `nodes.csv` 数据。"]
+        if not args:
+            return ["请输入筛选条件！例如: `!find 园艺 等级>=90 patch=7.*`"]
+        query_index = self.catalogue.query_index
+        mask, unknown = query_index.evaluate(args)
+        if unknown:
+            return [f"❌ 无法识别的条件: **{', '.join(unknown)}**。"
+                    f"可用: 园艺/采掘、版本、地区、类型、`等级>=90`、`patch=7.*`、`ET=0-6`"]
+        records = [self.catalogue.get(i) for i in query_index.node_ids(mask)]
+        if not records:
+            return ["没有符合条件的采集点。"]
+        records.sort(key=lambda r: (r.start_et is None, r.start_et or 0, r.name_cn))
+        header = f"🔎 共 **{len(records)}** 个采集点符合条件（`!start filter {' '.join(args)}` 可在本频道追踪）"
+        lines = []
+        for r in records:
+            window = spawn_window(r)
+            et_text = f"ET {window[0]:02d}-{window[1]:02d}" if window else "ET --"
+            lines.append(f"`{et_text}` **{r.name_cn}** | {r.region_cn} ({r.coords.strip('[]')}) | "
+                         f"{r.node_type_cn} Lv{r.level} | {r.job} | {r.expansion} {r.patch}")
+        messages = chunk_message_lines(header, lines, MAX_MESSAGE_LENGTH - 50)
+        if len(messages) > MAX_FIND_MESSAGES:
+            messages = messages[:MAX_FIND_MESSAGES]
+            messages[-1] += "\n……后面还有更多，请加上更多筛选条件。"
+        return messages
+
+    async def start_tracker_for_channel(self, ctx, track_all=False, filters=None, members=None):
         channel_id = ctx.channel.id
         if channel_id in self.active_trackers:
             await ctx.send("错误：这个频道已经有一个追踪器在运行了！");
             return
-        if not self.all_nodes_data:
+        if not self.catalogue:
             await ctx.send("❌ 启动失败：机器人未能加载 `nodes.csv` 数据。");
             return
-        user_watchlist = self.get_watchlist(ctx.author.id)
-        instance = TrackerInstance(self.bot, ctx.author, ctx.channel, self.all_nodes_data, self.manual_offset,
-                                   user_watchlist, track_all, self.user_pings, self.user_watchlists)
+        query = None
+        if filters is not None:
+            if not filters:
+                await ctx.send("请输入筛选条件！例如: `!start filter 采掘 传说`");
+                return
+            # 条件只在启动时求值一次，之后追踪器只看这一组节点
+            query, unknown = self.catalogue.query_index.compile(filters)
+            if unknown:
+                await ctx.send(f"❌ 无法识别的条件: **{', '.join(unknown)}**。用 `!find` 可以先试试筛选结果。");
+                return
+        if members:
+            # 启动者自己的列表也算在内，同一个人 @ 多次只算一次
+            members = list({m.id: SessionOwner(m.id, m.display_name) for m in (ctx.author, *members)}.values())
+        else:
+            members = []
+        instance = TrackerInstance(self.bot, ctx.author, ctx.channel, self.catalogue, self.spawn_clock,
+                                   self.watch_mask_for(members or [ctx.author]), track_all, self.ping_index,
+                                   self.outbox, on_message_changed=self._checkpoint_message, query=query,
+                                   members=members)
         if await instance.start():
             self.active_trackers[channel_id] = instance
-            mode_text = "（追踪全部）" if track_all else f"（根据 **{ctx.author.display_name}** 的列表）"
+            self.store.save_session(TrackerSession(channel_id, ctx.author.id, ctx.author.display_name, bool(track_all),
+                                                   instance.tracker_message.id, time.time(),
+                                                   query.text if query else None,
+                                                   tuple(tuple(m) for m in members)))
+            if query is not None:
+                mode_text = f"（筛选 **{query.text}**，共 {len(instance.monitored_node_ids)} 个采集点）"
+            elif len(members) > 1 and instance.watch_mask is None:
+                mode_text = f"（**{'、'.join(m.display_name for m in members)}** 的列表都是空的，改为追踪全部）"
+            elif len(members) > 1:
+                mode_text = f"（合并 **{'、'.join(m.display_name for m in members)}** 的列表）"
+            elif track_all:
+                mode_text = "（追踪全部）"
+            else:
+                mode_text = f"（根据 **{ctx.author.display_name}** 的列表）"
             await ctx.send(f"✅ 追踪器已启动！{mode_text}", delete_after=10)
 
     async def stop_tracker_for_channel(self, ctx):
@@ -481,30 +1336,195 @@ class TrackerManager:
             instance = self.active_trackers[channel_id]
             await instance.stop()
             del self.active_trackers[channel_id]
+            self.store.delete_session(channel_id)
             await ctx.send("🛑 采集点追踪器已在此频道停止。")
         else:
             await ctx.send("错误：这个频道没有正在运行的追踪器。")
 
+    # --- 热重载交接 ---
+    def export_state(self):
+        """!reload 卸载旧模块时调用：已加载的目录、关注列表和运行中的追踪器原样交给新模块。"""
+        return {
+            'catalogue': self.catalogue,
+            'item_index': self.item_index,
+            'timeline': self.timeline,
+            'user_watchlists': self.user_watchlists,
+            'user_pings': self.user_pings,
+            'sessions': [inst.handoff_state() for inst in self.active_trackers.values() if not inst.stopped],
+            'pending_pings': {},
+            'sessions_resumed': self._sessions_resumed,
+            'pending_sessions': list(self._pending_sessions),
+            'nodes_stamp': self._nodes_stamp,
+        }
+
+    def shutdown(self):
+        """停掉旧模块的时钟和发送任务；追踪器只标记停止，不删除面板消息。"""
+        for instance in self.active_trackers.values():
+            instance.stopped = True
+        self.active_trackers.clear()
+        # 正在错开恢复的任务也要停下，否则它会继续往旧时钟上挂追踪器
+        if self._resume_task:
+            self._resume_task.cancel()
+        if self._nodes_watch_task:
+            self._nodes_watch_task.cancel()
+        self.spawn_clock.shutdown()
+        self.store.close()
+        return self.outbox.close()
+
+    def adopt_state(self, state):
+        """新模块加载时接手旧模块的状态，不重新读取数据，也不重新发送面板。"""
+        self.catalogue = state['catalogue']
+        self.item_index = state['item_index']
+        self.timeline = state['timeline']
+        self.all_item_names = self.catalogue.item_names
+        MAP_ID_MAP.clear()
+        MAP_ID_MAP.update(self.catalogue.map_ids)
+        self.user_watchlists = state['user_watchlists']
+        self.user_pings = state['user_pings']
+        self.ping_index.rebind(self.user_watchlists, self.user_pings, self.catalogue.item_bits)
+        self._sessions_resumed = state['sessions_resumed']
+        self._pending_sessions.extend(state.get('pending_sessions', ()))
+        self._nodes_stamp = state.get('nodes_stamp')
+        for session in state['sessions']:
+            channel, author = session['channel'], session['author']
+            members = [SessionOwner(*member) for member in session.get('members', ())]
+            instance = TrackerInstance(self.bot, author, channel, self.catalogue, self.spawn_clock,
+                                       self.watch_mask_for(members or [author]), session['track_all'],
+                                       self.ping_index, self.outbox, on_message_changed=self._checkpoint_message,
+                                       query=session.get('query'), members=members)
+            self.active_trackers[channel.id] = instance
+            if not instance.resume(session['tracker_message'], handoff=session):
+                del self.active_trackers[channel.id]
+        for channel_id, jobs in state['pending_pings'].items():
+            for job in jobs:
+                self.outbox.submit_ping(channel_id, job)
+        print(f"🔄 追踪器模块已热重载，接手了 {len(self.active_trackers)} 个频道的追踪器。")
+
+    def _checkpoint_message(self, instance):
+        if instance.channel.id in self.active_trackers and instance.tracker_message is not None:
+            self.store.update_session_message(instance.channel.id, instance.tracker_message.id)
+
+    def start_resume(self):
+        if self._resume_task is None or self._resume_task.done():
+            self._resume_task = self.bot.loop.create_task(self.resume_sessions())
+
+    async def resume_sessions(self):
+        """启动后恢复上次运行中的追踪器：接管原来的面板消息，逐个错开恢复。
+
+        只在第一次 on_ready 时从数据库读取会话；热重载时旧模块没恢复完的会话由新模块接着恢复。
+        """
+        if not self.catalogue:
+            return
+        if not self._sessions_resumed:
+            self._sessions_resumed = True
+            self._pending_sessions.extend(self.store.load_sessions())
+        total, resumed = len(self._pending_sessions), 0
+        while self._pending_sessions:
+            session = self._pending_sessions.popleft()
+            if session.channel_id in self.active_trackers:
+                continue
+            channel = self.bot.get_channel(session.channel_id)
+            if channel is None:
+                # 频道已被删除或机器人已不在该服务器
+                self.store.delete_session(session.channel_id)
+                continue
+            owner = SessionOwner(session.owner_id, session.owner_name)
+            # 筛选条件按当前的 nodes.csv 重新求值一次
+            query = self.catalogue.query_index.compile(session.query.split())[0] if session.query else None
+            members = [SessionOwner(*member) for member in session.members]
+            instance = TrackerInstance(self.bot, owner, channel, self.catalogue, self.spawn_clock,
+                                       self.watch_mask_for(members or [owner]), session.track_all,
+                                       self.ping_index, self.outbox, on_message_changed=self._checkpoint_message,
+                                       query=query, members=members)
+            message = channel.get_partial_message(session.message_id) if session.message_id else None
+            self.active_trackers[session.channel_id] = instance
+            if instance.resume(message):
+                resumed += 1
+                await asyncio.sleep(RESUME_STAGGER_SECONDS)
+            else:
+                del self.active_trackers[session.channel_id]
+                self.store.delete_session(session.channel_id)
+        if total:
+            print(f"已恢复 {resumed}/{total} 个频道的追踪器。")
+
     # 👇 补充了刚才你代码里缺失的这个方法的定义，防止 !showcurrent 报错
     async def show_current_tracker_for_channel(self, ctx):
         if ctx.channel.id in self.active_trackers:
-            await ctx.send("✅ 追踪器正在当前频道运行。使用 `!stop` 停止。")
+            stats = self.outbox.stats()
+            await ctx.send(f"✅ 追踪器正在当前频道运行。使用 `!stop` 停止。\n"
+                           f"📮 发送队列: 待发 **{stats['queue_depth']}** 条 | 已合并丢弃 **{stats['dropped_edits']}** 帧")
         else:
             await ctx.send("ℹ️ 当前频道没有运行中的追踪器。")
 
+    def clock_report(self) -> str:
+        """!clock 的诊断信息：当前偏移、样本来源、共识区间和异常样本数。"""
+        if self.clock_sync is None:
+            return f"🕒 未启用自动校准，使用手动偏移 **{self.manual_offset:+.3f}** 秒。"
+        info = self.clock_sync.diagnostics()
+        lines = [f"🕒 当前时钟偏移: **{self.clock.offset_seconds:+.3f}** 秒（手动初始值 {info['manual_offset']:+.3f} 秒）"]
+        if not info['enabled']:
+            lines.append("自动校准已关闭（CLOCK_AUTO_CALIBRATE），只使用手动偏移。")
+            return "\n".join(lines)
+        sources = '、'.join(f"{name} {count}" for name, count in sorted(info['by_source'].items())) or '无'
+        lines.append(f"样本: **{info['samples']}** 个（{sources}）")
+        estimate = info['estimate']
+        if estimate is None:
+            lines.append("样本还不够，暂时沿用手动偏移。")
+        else:
+            lines.append(f"共识区间: {estimate.low:+.3f} ~ {estimate.high:+.3f} 秒（宽 {(estimate.high - estimate.low) * 1000:.0f} ms），"
+                         f"{estimate.support} 个样本支持，{estimate.outliers} 个被判为异常")
+            lines.append(f"最近更新: {time.time() - info['updated_at']:.0f} 秒前")
+        return "\n".join(lines)
+
 
 # --- Cog 主体 ---
 class TrackerCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.tracker_manager = TrackerManager(bot, bot.config)
+        handoff = getattr(bot, 'tracker_handoff', None)
+        if handoff:
+            bot.tracker_handoff = None
+            self.tracker_manager.adopt_state(handoff)
+            self.tracker_manager.start_resume()
+            self.tracker_manager.start_nodes_watcher()
+        elif bot.is_ready():
+            # 没有交接状态但机器人已经在线（例如单独 load 这个模块），on_ready 不会再触发，直接加载
+            self.tracker_manager.load_data()
+            self.tracker_manager.start_resume()
+            self.tracker_manager.start_nodes_watcher()
+
+    def cog_unload(self):
+        # 把运行状态交给重载后的新模块；正常关机时没人接手也无妨，会话检查点已经在数据库里
+        state = self.tracker_manager.export_state()
+        state['pending_pings'] = self.tracker_manager.shutdown()
+        self.bot.tracker_handoff = state
+
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        # 网关推送的每条消息都带服务器生成时间（雪花 ID），顺手拿来校准时钟
+        if self.tracker_manager.clock_sync is not None:
+            self.tracker_manager.clock_sync.add_snowflake(message.id)
 
     @commands.Cog.listener()
     async def on_ready(self):
-        self.tracker_manager.load_data()
+        # 网关 RESUME 失败重连时 on_ready 会再次触发；已经加载过就不能再从头读一遍，
+        # 否则新目录的材料 ID 重新排序，和运行中追踪器手里的位集对不上。nodes.csv 的更新走 reload_nodes
+        if not self.tracker_manager.catalogue:
+            self.tracker_manager.load_data()
+        self.tracker_manager.start_resume()
+        self.tracker_manager.start_nodes_watcher()
 
     @commands.command(name='start', aliases=['start_tracker'])
-    async def start_command(self, ctx, mode: str = None):
+    async def start_command(self, ctx, mode: str = None, *filters):
+        if mode and mode.lower() == 'filter':
+            await self.tracker_manager.start_tracker_for_channel(ctx, filters=filters)
+            return
+        members = [m for m in ctx.message.mentions if not m.bot]
+        if members:
+            # !start @a @b @c：面板追踪这几个人关注列表的并集
+            await self.tracker_manager.start_tracker_for_channel(ctx, members=members)
+            return
         track_all = mode and mode.lower() == 'all'
         await self.tracker_manager.start_tracker_for_channel(ctx, track_all=track_all)
 
@@ -563,6 +1583,35 @@ class TrackerCog(commands.Cog):
         except ValueError:
             await ctx.send("❌ 无效的输入。请输入一个数字（秒数），例如 `!ping 60`。")
 
+    @commands.command(name='timeline')
+    async def timeline_command(self, ctx, *args):
+        for message in self.tracker_manager.build_timeline_messages(ctx.author.id, args):
+            await ctx.send(message)
+
+    @commands.command(name='find')
+    async def find_command(self, ctx, *args):
+        for message in self.tracker_manager.build_find_messages(args):
+            await ctx.send(message)
+
+    @commands.command(name='route')
+    async def route_command(self, ctx):
+        for message in await self.tracker_manager.build_route_messages(ctx.author.id):
+            await ctx.send(message)
+
+    @commands.command(name='nodes')
+    @commands.is_owner()
+    async def nodes_command(self, ctx, action: str = None):
+        if action is None or action.lower() != 'reload':
+            await ctx.send(f"ℹ️ 当前加载了 **{len(self.tracker_manager.catalogue)}** 个采集点。"
+                           f"修改 nodes.csv 后使用 `!nodes reload` 热更新，运行中的追踪器不会重启。")
+            return
+        await ctx.send(await self.tracker_manager.reload_nodes())
+
+    @commands.command(name='clock')
+    @commands.is_owner()
+    async def clock_command(self, ctx):
+        await ctx.send(self.tracker_manager.clock_report())
+
     @commands.command(name='showcurrent')
     async def showcurrent_command(self, ctx):
         await self.tracker_manager.show_current_tracker_for_channel(ctx)
@@ -7,6 +7,10 @@ import os
 from dotenv import load_dotenv
 from pathlib import Path
 
+from utils.clock_sync import OffsetEstimator
+from utils.metrics import REGISTRY, MetricsServer, install_rate_limit_counter
+from utils.persistence import WriteBehindStore
+
 load_dotenv()  # Loads variables from the .env file
 
 BOT_TOKEN = os.getenv('DISCORD_TOKEN')  # Get the token securely
@@ -35,7 +39,22 @@ BOT_CONFIG = {
     "CSV_FILENAME": os.path.join(script_dir, 'data/nodes.csv'),
     "WATCHLIST_FILE": os.path.join(data_dir, 'data/watchlists.json'),
     "PING_FILE": os.path.join(data_dir, 'data/pings.json'),
-    "MANUAL_TIME_OFFSET_SECONDS": 0.0
+    # 关注列表和提醒设置的 SQLite 数据库，首次启动时会从上面两个 JSON 导入
+    "TRACKER_DB_FILE": os.path.join(data_dir, 'tracker.db'),
+    # 时钟偏移的初始值；开启自动校准后会根据 Discord 服务器时间自动修正，一般不需要再手动调整
+    "MANUAL_TIME_OFFSET_SECONDS": 0.0,
+    "CLOCK_AUTO_CALIBRATE": True,
+    # 追踪器发送队列的速率预算（同一频道每 5 秒的编辑/发送次数，以及全局每秒请求数）
+    "PANEL_EDITS_PER_5S": 5,
+    "CHANNEL_SENDS_PER_5S": 5,
+    "GLOBAL_REQUESTS_PER_SEC": 40,
+    # data/*.json 后写式持久化：第一次修改后最多等待多少秒落盘
+    "PERSIST_FLUSH_DELAY": 2.0,
+    # 每隔多少秒检查 nodes.csv 是否被修改并自动热更新，0 表示只用 !nodes reload 手动更新
+    "NODES_WATCH_INTERVAL": 60,
+    # Prometheus 指标只在本机端口导出（GET /metrics），端口设为 0 关闭
+    "METRICS_HOST": "127.0.0.1",
+    "METRICS_PORT": 9108
 }
 
 # 加入了新写的全局设置和房屋追踪模块
@@ -58,8 +77,32 @@ intents.message_content = True
 
 class MyBot(commands.Bot):
     def __init__(self, *args, **kwargs):
+        # 时钟偏移估算器：REST 响应的 Date 头和收到的消息都作为样本；挂在 bot 上，重载模块后样本不丢
+        self.clock_sync = OffsetEstimator(BOT_CONFIG["MANUAL_TIME_OFFSET_SECONDS"],
+                                          enabled=BOT_CONFIG["CLOCK_AUTO_CALIBRATE"])
+        kwargs.setdefault('http_trace', self.clock_sync.trace_config())
         super().__init__(*args, **kwargs)
         self.config = BOT_CONFIG
+        # 所有 Cog 共用的 JSON 写入服务，挂在 bot 上，重载模块也不会丢掉排队中的数据
+        self.persistence = WriteBehindStore(BOT_CONFIG["PERSIST_FLUSH_DELAY"])
+        self.metrics_server = None
+
+    async def setup_hook(self):
+        install_rate_limit_counter()
+        if BOT_CONFIG["METRICS_PORT"]:
+            self.metrics_server = MetricsServer(REGISTRY, BOT_CONFIG["METRICS_HOST"], BOT_CONFIG["METRICS_PORT"])
+            try:
+                await self.metrics_server.start()
+            except OSError as e:
+                print(f"⚠️ 指标端口 {BOT_CONFIG['METRICS_PORT']} 启动失败，跳过导出: {e}")
+                self.metrics_server = None
+
+    async def close(self):
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+        await super().close()
+        # 关闭前把还没落盘的数据写完
+        await asyncio.to_thread(self.persistence.close)
 
     async def on_ready(self):
         print(f'机器人已登录: {self.user.name}\n------')
@@ -72,6 +115,8 @@ bot = MyBot(command_prefix=COMMAND_PREFIX, intents=intents)
 @commands.is_owner()
 async def reload_extension(ctx, extension_name: str = "all"):
     """热重载模块。用法: !reload (重载全部) 或 !reload fashion_cog (重载单个)"""
+    # 新模块会从磁盘重新读取数据，先把排队中的写入落盘
+    await asyncio.to_thread(bot.persistence.flush)
     if extension_name.lower() == "all":
         success_count = 0
         fail_count = 0
@@ -99,6 +144,15 @@ async def reload_extension(ctx, extension_name: str = "all"):
         except Exception as e:
             await ctx.send(f"❌ 重载模块 `{extension_name}` 失败: \n```py\n{e}\n```")
 
+@bot.command(name='stats')
+@commands.is_owner()
+async def stats_command(ctx):
+    """运行指标摘要：追踪器唤醒延迟、渲染耗时、Discord 和外部 API 的请求延迟。"""
+    lines = REGISTRY.summary_lines()
+    embed = discord.Embed(title="📈 运行指标", description="\n".join(lines)[:4096], color=discord.Color.blurple())
+    await ctx.send(embed=embed)
+
+
 async def main():
     async with bot:
         for extension in INITIAL_EXTENSIONS:
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 让测试直接 import utils / cogs，和在项目根目录运行机器人时一样
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,85 @@
+import time
+
+import pytest
+
+from utils.clock_sync import (DISCORD_EPOCH_MS, MIN_SAMPLES, SNAP_THRESHOLD, OffsetEstimator, OffsetSample,
+                              consensus_interval, simulate, snowflake_time)
+from utils.eorzea_clock import EorzeaClock
+
+
+def snowflake_at(unix_seconds):
+    return (int(unix_seconds * 1000) - DISCORD_EPOCH_MS) << 22
+
+
+def test_snowflake_time_round_trip():
+    assert snowflake_time(snowflake_at(1_700_000_000.123)) == pytest.approx(1_700_000_000.123, abs=1e-3)
+
+
+def test_consensus_picks_majority_and_counts_outliers():
+    samples = [OffsetSample(1.0, 2.0, 'date', 0), OffsetSample(1.5, 2.5, 'date', 0),
+               OffsetSample(1.2, 1.8, 'send', 0), OffsetSample(40.0, 40.5, 'snowflake', 0)]
+    estimate = consensus_interval(samples)
+    assert (estimate.low, estimate.high) == (1.5, 1.8)
+    assert estimate.offset == pytest.approx(1.65)
+    assert estimate.support == 3
+    assert estimate.outliers == 1
+
+
+def test_consensus_touching_intervals_overlap():
+    estimate = consensus_interval([OffsetSample(0.0, 1.0, 'date', 0), OffsetSample(1.0, 2.0, 'date', 0)])
+    assert estimate.support == 2 and estimate.offset == 1.0
+    assert consensus_interval([]) is None
+
+
+def test_manual_offset_until_enough_samples():
+    local = [1000.0]
+    estimator = OffsetEstimator(manual_offset=0.7, time_source=lambda: local[0])
+    clock = EorzeaClock(0.0, lambda: local[0])
+    estimator.attach(clock)
+    assert clock.offset_seconds == 0.7
+    for _ in range(MIN_SAMPLES - 1):
+        estimator.add_snowflake(snowflake_at(local[0] + 3.0), local[0])
+    assert clock.offset_seconds == 0.7
+    estimator.add_snowflake(snowflake_at(local[0] + 3.0), local[0])
+    assert clock.offset_seconds == pytest.approx(3.25, abs=1e-3)
+
+
+def test_small_changes_are_smoothed_and_large_ones_snap():
+    local = [1000.0]
+    estimator = OffsetEstimator(time_source=lambda: local[0])
+    for _ in range(MIN_SAMPLES):
+        estimator.add_sent_message(snowflake_at(local[0] + 1.0), local[0] - 0.01, local[0] + 0.01)
+    assert estimator.offset == pytest.approx(1.0, abs=0.02)
+    # 新样本把共识移到 +1.1 附近：只靠拢一部分
+    estimator.samples.clear()
+    for _ in range(MIN_SAMPLES):
+        estimator.add_sent_message(snowflake_at(local[0] + 1.1), local[0] - 0.01, local[0] + 0.01)
+    assert 1.0 < estimator.offset < 1.1
+    # 本机时间被 NTP 跳变：差距超过 SNAP_THRESHOLD 直接跳过去
+    estimator.samples.clear()
+    target = 1.0 + SNAP_THRESHOLD * 2
+    for _ in range(MIN_SAMPLES):
+        estimator.add_sent_message(snowflake_at(local[0] + target), local[0] - 0.01, local[0] + 0.01)
+    assert estimator.offset == pytest.approx(target, abs=0.02)
+
+
+def test_http_date_header():
+    estimator = OffsetEstimator(time_source=time.time)
+    server = 1_700_000_000
+    header = time.strftime('%a, %d %b %Y %H:%M:%S GMT', time.gmtime(server))
+    estimator.add_http_date(header, server - 5.2, server - 5.0)
+    assert estimator.samples[-1].low == pytest.approx(5.0) and estimator.samples[-1].high == pytest.approx(6.2)
+    estimator.add_http_date('not a date', 0, 0)
+    assert len(estimator.samples) == 1
+
+
+def test_disabled_estimator_ignores_samples():
+    estimator = OffsetEstimator(manual_offset=0.3, enabled=False)
+    for _ in range(MIN_SAMPLES):
+        estimator.add_snowflake(snowflake_at(time.time() + 10))
+    assert estimator.offset == 0.3 and not estimator.samples
+
+
+@pytest.mark.parametrize('skew', [-7.5, -2.37, 0.0, 0.8, 120.0])
+def test_simulated_skew_is_recovered(skew):
+    assert simulate(skew) < 0.25
@@ -0,0 +1,43 @@
+from utils.eorzea_clock import (ET_DAY_REAL_MS, ET_DAY_REAL_SECONDS, ET_HOUR_REAL_SECONDS, NO_SPAWN_HOUR,
+                                EorzeaClock, check_full_et_day, et_hour, format_et, next_hour_start,
+                                next_hour_starts)
+from utils.node_catalog import next_spawn_matrix
+
+DAY_START_MS = 1_700_000_000_000 // ET_DAY_REAL_MS * ET_DAY_REAL_MS
+
+
+def test_full_et_day_boundaries():
+    assert check_full_et_day(DAY_START_MS) == ET_DAY_REAL_MS
+
+
+def test_hour_boundary_is_exact():
+    start = DAY_START_MS // 1000 + 13 * ET_HOUR_REAL_SECONDS
+    assert et_hour(start) == 13
+    assert et_hour(start - 0.001) == 12
+    assert format_et(start) == "13:00"
+
+
+def test_next_hour_start_inside_target_hour_is_tomorrow():
+    start = DAY_START_MS // 1000 + 5 * ET_HOUR_REAL_SECONDS
+    assert next_hour_start(5, start) == start + ET_DAY_REAL_SECONDS
+    assert next_hour_start(5, start - 0.001) == start
+    assert next_hour_start(6, start) == start + ET_HOUR_REAL_SECONDS
+    assert next_hour_start(24, start) is None
+
+
+def test_batch_matches_scalar():
+    now = DAY_START_MS / 1000 + 1234.567
+    hours = list(range(24)) + [NO_SPAWN_HOUR]
+    batch = [int(ts) for ts in next_hour_starts(hours, now)]
+    assert batch[:24] == [next_hour_start(h, now) for h in range(24)]
+    assert batch[24] == NO_SPAWN_HOUR
+    matrix = next_spawn_matrix(hours, now, 3)
+    for h in range(24):
+        assert [int(ts) for ts in matrix[h]] == [batch[h] + j * ET_DAY_REAL_SECONDS for j in range(3)]
+    assert all(int(ts) == NO_SPAWN_HOUR for ts in matrix[24])
+
+
+def test_clock_offset_and_time_source():
+    clock = EorzeaClock(2.5, lambda: 100.0)
+    assert clock.now() == 102.5
+    assert clock.now_ms() == 102500
@@ -0,0 +1,280 @@
+"""追踪器、房屋和节日日历热点函数的微基准，可以放进 CI 跑。
+
+每个用例用 timeit 自动选择循环次数，重复 REPEAT 轮取最快的一轮，结果按“每次调用耗时”记录。
+每次运行追加一行到历史文件（JSON Lines），和同一个机器标签、同一个 Python 版本最近 BASELINE_RUNS 次的中位数比较，
+任何用例慢了超过阈值（默认 25%）就以退出码 1 结束，这次结果也不写入历史，免得基线被慢慢拖高；
+确认变慢是预期的（例如换了算法）时加 --accept 写入新的结果。
+
+机器标签默认是主机名；CI 的主机名每次都不一样，要用 --machine 或环境变量 BENCH_MACHINE 固定一个标签，
+再加 --require-baseline：找不到基线时同样以退出码 1 结束，而不是悄悄跳过检查。
+
+用法（在项目根目录）:
+    python -m utils.bench                  # 跑全部用例并和历史比较
+    python -m utils.bench -k embed         # 只跑名字里带 embed 的用例
+    python -m utils.bench --threshold 0.5 --no-save
+    BENCH_MACHINE=ci python -m utils.bench --require-baseline --history .cache/bench.jsonl
+"""
+import argparse
+import asyncio
+import contextlib
+import datetime
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import tempfile
+import timeit
+from collections import defaultdict
+from types import SimpleNamespace
+
+from cogs.housetracker_cog import HousingTracker
+from cogs.tracker_cog import DiscordOutbox, GatheringMapView, PingIndex, SessionOwner, SpawnClock, TrackerInstance, \
+    TrackerManager
+from utils.eorzea_clock import EorzeaClock, next_hour_start
+from utils.node_catalog import NodeCatalogue
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+DEFAULT_CSV = os.path.join(project_root, 'data/nodes.csv')
+# 历史结果（本机生成，不提交；CI 上可以用 --history 指到缓存目录）
+DEFAULT_HISTORY = os.path.join(project_root, 'data/benchmark_history.jsonl')
+DEFAULT_THRESHOLD = 0.25
+BASELINE_RUNS = 5
+REPEAT = 5
+# 合成数据的规模
+WATCHED_ITEMS = 50
+EMBED_LOCATIONS = 30  # 超过 23 个地点时面板会截断成正好 25 个字段
+EXISTING_WATCHLIST = 300
+ADDED_ITEMS = 200
+HOUSING_SALES = 20000
+CALENDAR_EVENTS = 1500
+
+
+class Fixtures:
+    """各用例共用的数据：节点目录、假的 bot 和追踪器，只构建一次。"""
+
+    def __init__(self, csv_filename):
+        self.csv_filename = csv_filename
+        self.catalogue = NodeCatalogue.from_csv(csv_filename)
+        self.catalogue.warm_up()
+        self.names = sorted(self.catalogue.item_names)
+        self.bot = SimpleNamespace(loop=asyncio.get_running_loop())
+        self.spawn_clock = SpawnClock(self.bot, EorzeaClock())
+        self.outbox = DiscordOutbox(self.bot, {})
+        self.ping_index = PingIndex({}, {}, self.catalogue.item_bits)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tracker(self, watch_mask=None, track_all=False) -> TrackerInstance:
+        inst = TrackerInstance(self.bot, SessionOwner(1, 'bench'), SimpleNamespace(id=1), self.catalogue,
+                               self.spawn_clock, watch_mask, track_all, self.ping_index, self.outbox)
+        inst._prepare_monitored_nodes()
+        return inst
+
+    def manager(self) -> TrackerManager:
+        config = {
+            'CSV_FILENAME': self.csv_filename,
+            'WATCHLIST_FILE': os.path.join(self.tmp_dir.name, 'watchlists.json'),
+            'PING_FILE': os.path.join(self.tmp_dir.name, 'pings.json'),
+            'TRACKER_DB_FILE': os.path.join(self.tmp_dir.name, 'tracker.db'),
+            'MANUAL_TIME_OFFSET_SECONDS': 0.0,
+        }
+        manager = TrackerManager(self.bot, config)
+        with contextlib.redirect_stdout(io.StringIO()):
+            manager.load_data()
+        return manager
+
+    def grouped_events(self, locations):
+        """前 locations 个不同地点 {(地区, 坐标): [材料名]}，以及这些地点的节点 ID。"""
+        grouped, node_ids = defaultdict(list), []
+        for record in self.catalogue:
+            key = (record.region_cn or 'N/A', record.coords or 'N/A')
+            if key not in grouped and len(grouped) >= locations:
+                continue
+            grouped[key].append(record.name_cn)
+            node_ids.append(record.node_id)
+        return grouped, node_ids
+
+
+def synthetic_sales(count, seed=1):
+    """和房屋 API 同样结构的房源列表，数字字段混着字符串，和接口实际返回的一样需要 int() 转换。"""
+    rng = random.Random(seed)
+    sales = []
+    for i in range(count):
+        sales.append({
+            'Area': rng.randrange(5), 'Slot': rng.randrange(30), 'ID': rng.randrange(1, 61),
+            'Size': str(rng.randrange(3)), 'RegionType': rng.choice((1, 2)), 'PurchaseType': rng.choice((1, 2)),
+            'State': str(rng.randrange(4)), 'Price': rng.randrange(3_000_000, 50_000_000), 'Participate': rng.randrange(50),
+        })
+    return sales
+
+
+def synthetic_ics(today, count, seed=1) -> bytes:
+    """count 个事件的 .ics：大部分是前后几个月内的全天事件，一部分是每周重复的事件。"""
+    rng = random.Random(seed)
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//bench//EN']
+    for i in range(count):
+        start = today + datetime.timedelta(days=rng.randrange(-120, 180))
+        lines += ['BEGIN:VEVENT', f'UID:bench-{i}@example.com', f'SUMMARY:事件 {i}',
+                  f'DESCRIPTION:第 {i} 个合成事件', f'DTSTART;VALUE=DATE:{start:%Y%m%d}',
+                  f'DTEND;VALUE=DATE:{start + datetime.timedelta(days=rng.randrange(1, 4)):%Y%m%d}']
+        if i % 10 == 0:
+            lines.append('RRULE:FREQ=WEEKLY;COUNT=20')
+        lines.append('END:VEVENT')
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(lines).encode('utf-8')
+
+
+def build_cases(fx: Fixtures):
+    """[(用例名, 无参函数)]；缺少可选依赖的用例不出现在列表里。"""
+    cases = []
+    now = fx.spawn_clock.now()
+
+    watched = fx.tracker(fx.catalogue.item_bits.mask_of(fx.names[:WATCHED_ITEMS]))
+    everything = fx.tracker(track_all=True)
+    cases.append(('eorzea_clock.next_hour_start', lambda: next_hour_start(13, now)))
+    cases.append((f'tracker._prepare_monitored_nodes (关注 {WATCHED_ITEMS} 种)', watched._prepare_monitored_nodes))
+    cases.append(('tracker._prepare_monitored_nodes (追踪全部)', everything._prepare_monitored_nodes))
+
+    grouped, node_ids = fx.grouped_events(EMBED_LOCATIONS)
+    active_field = everything._active_now_field(13)
+    embed = everything._build_embed(node_ids, grouped, 5.0, None, active_field)
+    assert len(embed.fields) == 25, len(embed.fields)
+    cases.append(('tracker._build_embed (25 个字段)',
+                  lambda: everything._build_embed(node_ids, grouped, 5.0, None, active_field)))
+    cases.append((f'GatheringMapView ({EMBED_LOCATIONS} 个地点)', lambda: GatheringMapView(grouped)))
+
+    manager = fx.manager()
+    existing = fx.names[:EXISTING_WATCHLIST]
+    manager.user_watchlists['1'] = list(existing)
+    repeated = ', '.join(existing[:ADDED_ITEMS])
+    user_ids = itertools.count(1000)
+    cases.append((f'add_to_watchlist (已有 {EXISTING_WATCHLIST} 项，再加 {ADDED_ITEMS} 项)',
+                  lambda: manager.add_to_watchlist(1, repeated)))
+    cases.append((f'add_to_watchlist (新用户 {ADDED_ITEMS} 项)',
+                  lambda: manager.add_to_watchlist(next(user_ids), repeated)))
+
+    cases.append(('NodeCatalogue.from_csv (nodes.csv)', lambda: NodeCatalogue.from_csv(fx.csv_filename)))
+
+    sales = synthetic_sales(HOUSING_SALES)
+    cases.append((f'HousingTracker.filter_sales ({HOUSING_SALES} 条，不筛选)', lambda: HousingTracker.filter_sales(sales)))
+    cases.append((f'HousingTracker.filter_sales ({HOUSING_SALES} 条，M 房 可购买)',
+                  lambda: HousingTracker.filter_sales(sales, f_size=1, f_state=1)))
+
+    try:
+        from cogs.holiday_cog import HolidayCog
+    except ImportError as e:  # icalendar / recurring_ical_events 是节日模块的依赖，没装时跳过
+        print(f"跳过日历用例: {e}")
+    else:
+        today = datetime.date.today()
+        ics_data = synthetic_ics(today, CALENDAR_EVENTS)
+        cases.append((f'HolidayCog.parse_calendar ({CALENDAR_EVENTS} 个事件)',
+                      lambda: HolidayCog.parse_calendar(ics_data, today)))
+    return cases
+
+
+def measure(func, repeat=REPEAT) -> float:
+    """每次调用的耗时（秒），取 repeat 轮里最快的一轮。"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number
+
+
+def machine_key(label=None):
+    return {'machine': label or os.environ.get('BENCH_MACHINE') or platform.node(),
+            'python': platform.python_version()}
+
+
+def load_history(filename):
+    if not os.path.exists(filename):
+        return []
+    with open(filename, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def baselines(history, key):
+    """同一个机器标签、同一个 Python 版本最近 BASELINE_RUNS 次结果的中位数 {用例名: 秒}。"""
+    samples = defaultdict(list)
+    for entry in reversed(history):
+        if entry.get('machine', entry.get('host')) != key['machine'] or entry.get('python') != key['python']:
+            continue
+        for name, seconds in entry['results'].items():
+            if len(samples[name]) < BASELINE_RUNS:
+                samples[name].append(seconds)
+    return {name: statistics.median(values) for name, values in samples.items()}
+
+
+def format_seconds(seconds) -> str:
+    if seconds < 1e-6:
+        return f"{seconds * 1e9:8.1f} ns"
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:8.1f} µs"
+    return f"{seconds * 1e3:8.2f} ms"
+
+
+async def run_suite(args):
+    fx = Fixtures(args.csv)
+    results = {}
+    for name, func in build_cases(fx):
+        if args.k and args.k.lower() not in name.lower():
+            continue
+        results[name] = measure(func, args.repeat)
+    fx.tmp_dir.cleanup()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="热点函数微基准，和历史结果比较")
+    parser.add_argument('--csv', default=DEFAULT_CSV)
+    parser.add_argument('--history', default=DEFAULT_HISTORY)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="允许的变慢比例，0.25 表示 25%%")
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('-k', help="只跑名字里包含这个字符串的用例")
+    parser.add_argument('--no-save', action='store_true', help="不把这次结果写入历史")
+    parser.add_argument('--accept', action='store_true', help="有回退也写入历史，作为新的基线")
+    parser.add_argument('--machine', help="基线的机器标签，默认取环境变量 BENCH_MACHINE，再没有就用主机名")
+    parser.add_argument('--require-baseline', action='store_true', help="有用例找不到基线时以退出码 1 结束（CI 用）")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_suite(args))
+    key = machine_key(args.machine)
+    baseline = baselines(load_history(args.history), key)
+    regressions, missing = [], []
+    width = max((len(name) for name in results), default=0)
+    for name, seconds in results.items():
+        line = f"{name:<{width}}  {format_seconds(seconds)}"
+        if name in baseline:
+            ratio = seconds / baseline[name]
+            line += f"   基线 {format_seconds(baseline[name])}  {ratio - 1:+7.1%}"
+            if ratio > 1 + args.threshold:
+                line += "  ❌ 变慢"
+                regressions.append(name)
+        else:
+            line += "   （没有基线）"
+            missing.append(name)
+        print(line)
+
+    if missing:
+        print(f"\n⚠️ 机器标签 {key['machine']!r}（Python {key['python']}）下有 {len(missing)} 个用例没有基线，"
+              f"这些用例没有做回退检查。")
+
+    if regressions and not args.accept:
+        print(f"\n❌ {len(regressions)} 个用例慢了超过 {args.threshold:.0%}，结果不写入历史。确认是预期变化后用 --accept 重新运行。")
+        raise SystemExit(1)
+    if not args.no_save:
+        directory = os.path.dirname(args.history)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        entry = dict(key, time=datetime.datetime.now().isoformat(timespec='seconds'), results=results)
+        with open(args.history, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        print(f"\n结果已写入 {args.history}")
+    if missing and args.require_baseline:
+        print("❌ 使用了 --require-baseline 但基线不完整。检查 --machine / BENCH_MACHINE 和 --history 是否和之前的运行一致。")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Callable, List, NamedTuple, Optional
+
+import aiohttp
+
+from utils.eorzea_clock import EorzeaClock
+
+# Discord 雪花 ID 的纪元（2015-01-01，毫秒）
+DISCORD_EPOCH_MS = 1420070400000
+# 参与估算的最近样本数
+MAX_SAMPLES = 64
+# 至少有这么多样本互相印证后才开始自动校准，之前沿用手动偏移
+MIN_SAMPLES = 3
+# HTTP Date 头只精确到秒
+DATE_RESOLUTION = 1.0
+# 网关推送消息的延迟上限估计：消息在服务器上生成到我们收到，最多隔这么久
+SNOWFLAKE_MAX_DELAY = 0.5
+# 新估计值和当前偏移的差距在这之内时平滑靠拢，超过时（刚启动或本机时间被 NTP 跳变）直接跳过去
+SMOOTHING = 0.25
+SNAP_THRESHOLD = 5.0
+
+
+class OffsetSample(NamedTuple):
+    """一次观测给出的偏移区间：真实偏移（服务器时间 - 本机时间）落在 [low, high] 内。"""
+    low: float
+    high: float
+    source: str  # 'date' / 'snowflake' / 'send'
+    local_time: float
+
+
+class OffsetEstimate(NamedTuple):
+    offset: float
+    low: float  # 多数样本共同认可的区间
+    high: float
+    support: int  # 认可这个区间的样本数
+    outliers: int  # 和这个区间不相交、被当作异常丢掉的样本数
+
+
+def snowflake_time(snowflake) -> float:
+    """雪花 ID 里的创建时间（Discord 服务器时间，unix 秒，毫秒精度）。"""
+    return ((int(snowflake) >> 22) + DISCORD_EPOCH_MS) / 1000
+
+
+def consensus_interval(samples: List[OffsetSample]) -> Optional[OffsetEstimate]:
+    """Marzullo 算法：找被最多样本区间覆盖的那一段，取中点作为偏移；不覆盖这一段的样本视为异常值。"""
+    if not samples:
+        return None
+    edges = []
+    for sample in samples:
+        edges.append((sample.low, 0))  # 同一位置先算“进入”，端点相接的区间也算重叠
+        edges.append((sample.high, 1))
+    edges.sort()
+    best, count, best_low, best_high = 0, 0, 0.0, 0.0
+    for i, (value, kind) in enumerate(edges):
+        if kind == 0:
+            count += 1
+            if count > best:
+                best, best_low = count, value
+                best_high = edges[i + 1][0]
+        else:
+            count -= 1
+    outliers = sum(1 for s in samples if s.high < best_low or s.low > best_high)
+    return OffsetEstimate((best_low + best_high) / 2, best_low, best_high, best, outliers)
+
+
+class OffsetEstimator:
+    """根据机器人本来就会收到的服务器时间，自动估算本机时钟和服务器的偏移，写进共享的 EorzeaClock。
+
+    三种观测，各自给出一个偏移区间（服务器时间 - 本机时间）：
+    - HTTP 响应的 Date 头：服务器在请求发出到收到响应之间的某一刻生成它，而且只精确到秒，
+      区间是 [Date - 收到时间, Date + 1 - 发出时间]；
+    - 网关推送的消息：雪花 ID 是服务器生成消息的时刻，我们收到时已经过去了一点推送延迟，
+      区间是 [雪花 - 收到时间, 雪花 - 收到时间 + SNOWFLAKE_MAX_DELAY]；
+    - 自己发出的消息：雪花时间一定在发出和收到响应之间，区间是 [雪花 - 收到时间, 雪花 - 发出时间]。
+    最近 MAX_SAMPLES 个区间用 Marzullo 算法求共识，网络抖动或个别异常的样本会被多数票排除；
+    结果再做指数平滑，避免偏移来回抖动让倒计时跳秒。
+    """
+
+    def __init__(self, manual_offset: float = 0.0, time_source: Callable[[], float] = time.time,
+                 enabled: bool = True):
+        self.manual_offset = manual_offset
+        self.time_source = time_source
+        self.enabled = enabled
+        self.samples = deque(maxlen=MAX_SAMPLES)
+        self.offset = manual_offset
+        self.estimate: Optional[OffsetEstimate] = None
+        self.updated_at = None
+        self.clock: Optional[EorzeaClock] = None
+
+    def attach(self, clock: EorzeaClock):
+        """把估算结果写进这个时钟（重载模块后新的追踪器时钟重新挂上来）。"""
+        self.clock = clock
+        clock.offset_seconds = self.offset
+
+    # --- 观测 ---
+    def add_http_date(self, date_header, sent_at: float, received_at: float):
+        try:
+            server_time = parsedate_to_datetime(date_header).timestamp()
+        except (TypeError, ValueError, IndexError):
+            return
+        self._add(OffsetSample(server_time - received_at, server_time + DATE_RESOLUTION - sent_at, 'date',
+                               received_at))
+
+    def add_snowflake(self, snowflake, received_at: Optional[float] = None):
+        received_at = self.time_source() if received_at is None else received_at
+        delta = snowflake_time(snowflake) - received_at
+        self._add(OffsetSample(delta, delta + SNOWFLAKE_MAX_DELAY, 'snowflake', received_at))
+
+    def add_sent_message(self, snowflake, sent_at: float, received_at: float):
+        created = snowflake_time(snowflake)
+        self._add(OffsetSample(created - received_at, created - sent_at, 'send', received_at))
+
+    def _add(self, sample: OffsetSample):
+        if not self.enabled:
+            return
+        self.samples.append(sample)
+        self.update()
+
+    def update(self):
+        if len(self.samples) < MIN_SAMPLES:
+            return
+        estimate = consensus_interval(list(self.samples))
+        if estimate is None or estimate.support < MIN_SAMPLES:
+            return
+        self.estimate = estimate
+        if self.updated_at is None or abs(estimate.offset - self.offset) > SNAP_THRESHOLD:
+            self.offset = estimate.offset
+        else:
+            self.offset += SMOOTHING * (estimate.offset - self.offset)
+        self.updated_at = self.time_source()
+        if self.clock is not None:
+            self.clock.offset_seconds = self.offset
+
+    def diagnostics(self) -> dict:
+        by_source = {}
+        for sample in self.samples:
+            by_source[sample.source] = by_source.get(sample.source, 0) + 1
+        return {
+            'enabled': self.enabled,
+            'offset': self.offset,
+            'manual_offset': self.manual_offset,
+            'estimate': self.estimate,
+            'samples': len(self.samples),
+            'by_source': by_source,
+            'updated_at': self.updated_at,
+        }
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """给 discord.py 的 http_trace：每个 REST 响应的 Date 头都作为一个样本。"""
+
+        async def on_request_start(session, context, params):
+            context.sent_at = self.time_source()
+
+        async def on_request_end(session, context, params):
+            date_header = params.response.headers.get('Date')
+            if date_header:
+                self.add_http_date(date_header, context.sent_at, self.time_source())
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_end)
+        return trace_config
+
+
+# --- 离线自检 ---
+# 在项目根目录运行 python -m utils.clock_sync（tests/test_clock_sync.py 也会调用）：用假的本机时间源模拟一个慢了几秒的时钟，喂入带随机网络延迟的 Date 头、
+# 网关消息和自己发出的消息（混入少量离谱的异常样本），检查估算出的偏移误差远小于一秒。
+
+class FakeTimeSource:
+    """假的本机时钟：真实时间 now 加上固定偏差 skew。"""
+
+    def __init__(self, start: float, skew: float):
+        self.now, self.skew = start, skew
+
+    def __call__(self) -> float:
+        return self.now + self.skew
+
+
+def simulate(skew: float, steps: int = 600, seed: int = 1) -> float:
+    """返回估算偏移和真实偏移（-skew）的误差（秒）。"""
+    rng = random.Random(seed)
+    fake = FakeTimeSource(1_700_000_000.0, skew)
+    estimator = OffsetEstimator(time_source=fake)
+    clock = EorzeaClock(0.0, fake)
+    estimator.attach(clock)
+    for step in range(steps):
+        fake.now += rng.uniform(0.5, 3.0)
+        kind = step % 3
+        if kind == 0:
+            # REST 请求：往返 40~400 ms，服务器在中间某一刻生成 Date 头（截断到秒）
+            sent = fake()
+            there, back = rng.uniform(0.02, 0.2), rng.uniform(0.02, 0.2)
+            server_now = fake.now + there
+            fake.now += there + back
+            date_header = time.strftime('%a, %d %b %Y %H:%M:%S GMT', time.gmtime(int(server_now)))
+            estimator.add_http_date(date_header, sent, fake())
+        elif kind == 1:
+            # 网关消息：推送延迟 30~300 ms；偶尔有一条延迟离谱的（例如重连后补发的旧消息）
+            created = fake.now
+            delay = rng.uniform(0.03, 0.3) if rng.random() > 0.05 else rng.uniform(5, 60)
+            fake.now += delay
+            snowflake = (int(created * 1000) - DISCORD_EPOCH_MS) << 22
+            estimator.add_snowflake(snowflake, fake())
+        else:
+            sent = fake()
+            fake.now += rng.uniform(0.02, 0.2)
+            created = fake.now
+            fake.now += rng.uniform(0.02, 0.2)
+            snowflake = (int(created * 1000) - DISCORD_EPOCH_MS) << 22
+            estimator.add_sent_message(snowflake, sent, fake())
+    # 校准后的 clock.now() 应该等于真实时间
+    return abs(clock.now() - fake.now)
+
+
+if __name__ == "__main__":
+    for skew in (-7.5, -2.37, 0.0, 0.8, 3.2, 120.0):
+        error = simulate(skew)
+        print(f"本机时钟偏差 {skew:+8.2f} s -> 校准后误差 {error * 1000:6.1f} ms")
+        assert error < 0.25, skew
+    print("自检通过。")
@@ -0,0 +1,196 @@
+import math
+import time
+from typing import Callable, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy 是可选依赖，没有时批量换算逐个计算
+    np = None
+
+# 现实 175 秒 = 1 个 ET 小时，ET 的流速是现实的 3600 / 175 = 144 / 7 倍。
+# 所有换算都在整数毫秒上完成：ET 毫秒 = 现实毫秒 * 144 // 7，
+# ET 整点精确落在现实 175000 毫秒的整数倍上，不会出现浮点误差导致的“差一分钟”或 00:00 卡死。
+EORZEA_RATE_NUMERATOR = 144
+EORZEA_RATE_DENOMINATOR = 7
+EORZEA_MULTIPLIER = EORZEA_RATE_NUMERATOR / EORZEA_RATE_DENOMINATOR  # 只用于显示，换算请用整数函数
+ET_HOUR_REAL_SECONDS = 175  # 1 个 ET 小时 = 175 现实秒，整点恰好落在 175 的整数倍上
+ET_HOUR_REAL_MS = ET_HOUR_REAL_SECONDS * 1000
+ET_DAY_REAL_SECONDS = 24 * ET_HOUR_REAL_SECONDS
+ET_DAY_REAL_MS = 24 * ET_HOUR_REAL_MS
+ET_MINUTE_MS = 60 * 1000
+ET_MINUTES_PER_DAY = 24 * 60
+NO_SPAWN_HOUR = -1  # 批量接口里表示“没有开始ET”的占位值
+
+
+def to_unix_ms(unix_seconds: float) -> int:
+    """现实时间（秒，可带小数）向下取整到整数毫秒，后续换算全部基于它。"""
+    return math.floor(unix_seconds * 1000)
+
+
+def eorzea_ms(unix_ms: int) -> int:
+    return unix_ms * EORZEA_RATE_NUMERATOR // EORZEA_RATE_DENOMINATOR
+
+
+def et_minute_of_day(unix_seconds: float) -> int:
+    return eorzea_ms(to_unix_ms(unix_seconds)) // ET_MINUTE_MS % ET_MINUTES_PER_DAY
+
+
+def et_hour_minute(unix_seconds: float) -> Tuple[int, int]:
+    return divmod(et_minute_of_day(unix_seconds), 60)
+
+
+def format_et(unix_seconds: float) -> str:
+    hour, minute = et_hour_minute(unix_seconds)
+    return f"{hour:02d}:{minute:02d}"
+
+
+def et_hour_index(unix_seconds: float) -> int:
+    """从 unix 纪元起数的第几个 ET 小时；k % 24 就是 ET 的钟点，k * 175 是这个整点的现实时间。"""
+    return to_unix_ms(unix_seconds) // ET_HOUR_REAL_MS
+
+
+def et_hour(unix_seconds: float) -> int:
+    return et_hour_index(unix_seconds) % 24
+
+
+def next_hour_start(target_et_hour: int, unix_seconds: float) -> Optional[int]:
+    """ET target_et_hour 点在当前 ET 小时之后的下一次开始时间（unix 秒，整数）。
+
+    正处在 target_et_hour 点内（包括恰好在整点上）时返回明天的这个点。
+    """
+    if target_et_hour is None or not (0 <= target_et_hour < 24):
+        return None
+    first = et_hour_index(unix_seconds) + 1
+    return (first + (target_et_hour - first) % 24) * ET_HOUR_REAL_SECONDS
+
+
+# --- 批量换算 ---
+# 有 numpy 时整个数组一次向量运算，没有时逐个元素按同一个整数公式计算，结果完全相同。
+
+def next_hour_starts(target_et_hours, unix_seconds: float):
+    """next_hour_start 的批量版本；NO_SPAWN_HOUR 的位置结果也是 NO_SPAWN_HOUR。"""
+    first = et_hour_index(unix_seconds) + 1
+    if np is not None:
+        hours = np.asarray(target_et_hours, dtype=np.int64)
+        stamps = (first + (hours - first) % 24) * ET_HOUR_REAL_SECONDS
+        return np.where(hours >= 0, stamps, NO_SPAWN_HOUR)
+    return [NO_SPAWN_HOUR if h < 0 else (first + (h - first) % 24) * ET_HOUR_REAL_SECONDS for h in target_et_hours]
+
+
+def et_minutes_of_day(unix_ms_values):
+    """一批整数毫秒时间戳各自对应的 ET 当日分钟数 (0..1439)。"""
+    if np is not None:
+        values = np.asarray(unix_ms_values, dtype=np.int64)
+        return values * EORZEA_RATE_NUMERATOR // EORZEA_RATE_DENOMINATOR // ET_MINUTE_MS % ET_MINUTES_PER_DAY
+    return [eorzea_ms(ms) // ET_MINUTE_MS % ET_MINUTES_PER_DAY for ms in unix_ms_values]
+
+
+class EorzeaClock:
+    """带校准偏移的时钟，进程内所有追踪器共用一个实例。
+
+    offset_seconds 初始为手动设置的值，运行中由 utils.clock_sync.OffsetEstimator 自动更新。
+    time_source 默认是 time.time，模拟或测试时可以换成假的时间源。
+    """
+
+    def __init__(self, offset_seconds: float = 0.0, time_source: Callable[[], float] = time.time):
+        self.offset_seconds = offset_seconds
+        self.time_source = time_source
+
+    def now(self) -> float:
+        return self.time_source() + self.offset_seconds
+
+    def now_ms(self) -> int:
+        return to_unix_ms(self.now())
+
+    def eorzea_time(self) -> str:
+        return format_et(self.now())
+
+    def et_hour(self) -> int:
+        return et_hour(self.now())
+
+    def hour_index(self) -> int:
+        return et_hour_index(self.now())
+
+
+# --- 自检与基准 ---
+# 直接运行本文件：逐毫秒核对一个完整 ET 日内的所有分钟/整点边界，然后和旧的浮点实现比较速度。
+
+def _legacy_format_et(unix_now: float) -> str:
+    eorzea_total_seconds = int(unix_now * (3600 / 175))
+    minute_of_day = eorzea_total_seconds // 60 % (24 * 60)
+    return f"{minute_of_day // 60:02d}:{minute_of_day % 60:02d}"
+
+
+def _legacy_next_occurrence(et_hour_value: int, current_unix_time: float) -> float:
+    current_et_total_minutes = (current_unix_time * (3600 / 175) // 60) % (24 * 60)
+    minute_diff = (et_hour_value * 60 - current_et_total_minutes) % 1440
+    if minute_diff < 1:
+        minute_diff += 1440
+    return current_unix_time + minute_diff * (175 / 60)
+
+
+def check_full_et_day(day_start_ms: Optional[int] = None) -> int:
+    """逐毫秒检查一个 ET 日：分钟只会 +1 递增、每分钟的起点与精确分数一致、整点落在 175000 的倍数上。
+
+    返回检查过的毫秒数，发现问题时抛出 AssertionError。
+    """
+    if day_start_ms is None:
+        day_start_ms = to_unix_ms(time.time()) // ET_DAY_REAL_MS * ET_DAY_REAL_MS
+    assert day_start_ms % ET_DAY_REAL_MS == 0
+    stamps = range(day_start_ms, day_start_ms + ET_DAY_REAL_MS)
+    minutes = et_minutes_of_day(stamps)
+    minutes = minutes.tolist() if np is not None else minutes
+
+    assert minutes[0] == 0, minutes[0]
+    previous = 0
+    starts = [day_start_ms]
+    for offset, minute in enumerate(minutes):
+        if minute != previous:
+            assert minute == previous + 1, (offset, previous, minute)
+            starts.append(day_start_ms + offset)
+            previous = minute
+    assert previous == ET_MINUTES_PER_DAY - 1, previous
+    assert len(starts) == ET_MINUTES_PER_DAY
+
+    for minute, start_ms in enumerate(starts):
+        # 第 m 分钟的精确起点是 m * 60000 * 7 / 144 毫秒，向上取整后就是第一个落在该分钟内的整数毫秒
+        exact = -(-minute * ET_MINUTE_MS * EORZEA_RATE_DENOMINATOR // EORZEA_RATE_NUMERATOR)
+        assert start_ms - day_start_ms == exact, (minute, start_ms - day_start_ms, exact)
+        if minute % 60 == 0:
+            assert (start_ms - day_start_ms) == minute // 60 * ET_HOUR_REAL_MS, minute
+            seconds = start_ms / 1000
+            assert et_hour(seconds) == minute // 60
+            assert et_hour((start_ms - 1) / 1000) == (minute // 60 - 1) % 24
+            # 恰好在整点上：同一个钟点的下一次是明天，下一个钟点是 175 秒后
+            assert next_hour_start(minute // 60, seconds) == start_ms // 1000 + ET_DAY_REAL_SECONDS
+            assert next_hour_start((minute // 60 + 1) % 24, seconds) == start_ms // 1000 + ET_HOUR_REAL_SECONDS
+    return len(minutes)
+
+
+def run_benchmark(rounds: int = 200000):
+    import timeit
+
+    now = time.time()
+    hours = [h % 24 for h in range(772)]
+    cases = [
+        ("format_et (整数)", lambda: format_et(now)),
+        ("format_et (旧浮点)", lambda: _legacy_format_et(now)),
+        ("next_hour_start (整数)", lambda: next_hour_start(13, now)),
+        ("next_occurrence (旧浮点)", lambda: _legacy_next_occurrence(13, now)),
+    ]
+    for name, func in cases:
+        elapsed = timeit.timeit(func, number=rounds)
+        print(f"{name:<28} {elapsed / rounds * 1e9:8.1f} ns/次")
+
+    batch_rounds = max(1, rounds // 200)
+    elapsed = timeit.timeit(lambda: next_hour_starts(hours, now), number=batch_rounds)
+    print(f"{'next_hour_starts x772':<28} {elapsed / batch_rounds * 1e6:8.1f} µs/批 (numpy: {np is not None})")
+    elapsed = timeit.timeit(lambda: [_legacy_next_occurrence(h, now) for h in hours], number=batch_rounds)
+    print(f"{'旧浮点逐个 x772':<28} {elapsed / batch_rounds * 1e6:8.1f} µs/批")
+
+
+if __name__ == "__main__":
+    started = time.perf_counter()
+    checked = check_full_et_day()
+    print(f"✅ 一个完整 ET 日共 {checked} 毫秒逐一核对通过，用时 {time.perf_counter() - started:.2f} 秒")
+    run_benchmark()
@@ -11,6 +11,11 @@ from typing import List, Dict, Optional
 from collections import defaultdict
 import asyncio
 
+try:
+    from utils.eorzea_clock import et_minute_of_day, format_et, next_hour_start
+except ImportError:  # 直接在 utils 目录下运行本脚本时
+    from eorzea_clock import et_minute_of_day, format_et, next_hour_start
+
 # --- 全局配置与状态变量 ---
 # !!! 在这里填入你的机器人TOKEN !!!
 BOT_TOKEN = "YOUR_BOT_TOKEN_HERE"
@@ -19,6 +24,7 @@ CSV_FILENAME = '../data/nodes.csv'
 
 # --- 常量定义 ---
 # 手动时间校准（秒）。如果你的脚本比游戏慢2秒，就设置为2.0
+# （机器人里的追踪器已经会自动校准，见 utils/clock_sync.py；这个独立脚本仍然只用手动值）
 MANUAL_TIME_OFFSET_SECONDS = 0.0
 # 刷新逻辑
 NORMAL_REFRESH_INTERVAL = 60
@@ -26,8 +32,6 @@ MEDIUM_THRESHOLD_SECONDS = 30
 MEDIUM_REFRESH_INTERVAL = 5
 URGENT_THRESHOLD_SECONDS = 10
 URGENT_REFRESH_INTERVAL = 1
-# 艾欧泽亚时间计算
-EORZEA_MULTIPLIER = 3600 / 175
 LOOP_INTERVAL = 1.0  # 内部高精度循环检测间隔
 
 # --- Bot 设置 ---
@@ -60,24 +64,15 @@ def format_time_delta(seconds: float) -> str:
 
 
 def get_current_eorzea_time(offset: float) -> str:
-    unix_now = time.time() + offset
-    eorzea_total_seconds = int(unix_now * EORZEA_MULTIPLIER)
-    total_eorzea_minutes = eorzea_total_seconds // 60
-    minute_of_day = total_eorzea_minutes % (24 * 60)
-    hour = minute_of_day // 60
-    minute = minute_of_day % 60
-    return f"{hour:02d}:{minute:02d}"
+    return format_et(time.time() + offset)
 
 
 def get_next_occurrence_timestamp(et_hour: int, current_unix_time: float) -> Optional[float]:
-    if not (0 <= et_hour < 24): return None
-    target_et_total_minutes = et_hour * 60
-    eorzea_total_seconds = current_unix_time * EORZEA_MULTIPLIER
-    current_et_total_minutes = (eorzea_total_seconds // 60) % (24 * 60)
-    minute_diff = target_et_total_minutes - current_et_total_minutes
-    if minute_diff < 0: minute_diff += 24 * 60
-    seconds_to_wait = minute_diff * (175 / 60)
-    return current_unix_time + seconds_to_wait
+    # 与 Bot 共用 eorzea_clock 的整数换算。保持这个脚本原来的行为：
+    # 还在目标整点的第一个 ET 分钟内时返回“现在”（提醒已经到点），过了这一分钟才算明天的这个点
+    if et_hour is not None and 0 <= et_hour < 24 and et_minute_of_day(current_unix_time) == et_hour * 60:
+        return current_unix_time
+    return next_hour_start(et_hour, current_unix_time)
 
 
 def load_nodes_from_csv(filename: str) -> List[Dict]:
@@ -0,0 +1,49 @@
+from typing import Dict, Iterable, List
+
+
+def iter_bits(mask: int) -> Iterable[int]:
+    """位集中为 1 的位序号，从低到高。"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class ItemBitmaps:
+    """材料名的稠密整数 ID 和按 ET 整点预计算的刷新位集。
+
+    每个材料名CN 按排序后的位置得到一个 ID，关注列表就是一个整数位集（第 i 位表示第 i 个材料）；
+    spawn_masks[h] 是在 ET h 点开始刷新的所有材料。“这一组刷新和某个用户/频道有没有关系”只要一次 AND。
+    nodes.csv 热更新时传入旧版本 previous：旧材料保留原来的 ID，新材料接在后面，已算好的位集不需要换算。
+    """
+
+    def __init__(self, catalogue, previous: 'ItemBitmaps' = None):
+        inherited = previous.names if previous is not None else []
+        known = set(inherited)
+        self.names: List[str] = inherited + sorted(name for name in catalogue.item_names if name not in known)
+        self.ids: Dict[str, int] = {name: item_id for item_id, name in enumerate(self.names)}
+        # 节点 ID -> 该节点材料的位
+        self.node_masks: Dict[int, int] = {}
+        self.spawn_masks = [0] * 24
+        for record in catalogue:
+            item_id = self.ids.get(record.name_cn)
+            if item_id is None:
+                continue
+            self.node_masks[record.node_id] = 1 << item_id
+            if record.start_et is not None:
+                self.spawn_masks[record.start_et] |= 1 << item_id
+
+    def __len__(self):
+        return len(self.names)
+
+    def mask_of(self, names: Iterable[str]) -> int:
+        """材料名 -> 位集；目录里没有的名字忽略。"""
+        mask = 0
+        for name in names:
+            item_id = self.ids.get(name)
+            if item_id is not None:
+                mask |= 1 << item_id
+        return mask
+
+    def names_of(self, mask: int) -> List[str]:
+        return [self.names[item_id] for item_id in iter_bits(mask)]
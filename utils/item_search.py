@@ -0,0 +1,118 @@
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 模糊匹配时三元组相似度（Jaccard）的最低分数，低于它的不作为建议
+MIN_FUZZY_SCORE = 0.2
+DEFAULT_SUGGESTIONS = 5
+
+
+def normalize_name(text) -> str:
+    """全角/半角统一、大小写折叠并去掉空白，让“Rose Garnet Ore”“rosegarnetore”“ｒｏｓｅ ｇａｒｎｅｔ ｏｒｅ”都能对上。"""
+    text = unicodedata.normalize('NFKC', text or '').casefold()
+    return ''.join(text.split())
+
+
+def trigrams(normalized: str) -> frozenset:
+    # 首尾补边界符，两三个字的中文名也能切出足够的三元组
+    padded = f"^^{normalized}$"
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class ItemNameIndex:
+    """材料名的内存搜索索引，覆盖 材料名CN / 材料名EN / 材料名JP。
+
+    所有写法都映射回规范名（材料名CN），关注列表里始终只保存规范名：
+    - 精确：归一化后的名字 -> 规范名，一次哈希查找；
+    - 前缀：归一化名字排好序，二分找到前缀区间，可以直接给自动补全用；
+    - 模糊：三元组倒排表，只给共享三元组的候选打分，按 Jaccard 相似度排序。
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, Iterable[str]]]):
+        self.exact: Dict[str, str] = {}
+        self._keys: List[str] = []
+        self._key_trigrams: List[frozenset] = []
+        self._key_canonical: List[str] = []
+        postings = defaultdict(list)
+        for canonical, aliases in entries:
+            for alias in (canonical, *aliases):
+                key = normalize_name(alias)
+                if not key or key in self.exact:
+                    continue
+                self.exact[key] = canonical
+                key_id = len(self._keys)
+                self._keys.append(key)
+                self._key_canonical.append(canonical)
+                grams = trigrams(key)
+                self._key_trigrams.append(grams)
+                for gram in grams:
+                    postings[gram].append(key_id)
+        self._postings = dict(postings)
+        self._sorted_keys = sorted(range(len(self._keys)), key=self._keys.__getitem__)
+        self._sorted_values = [self._keys[i] for i in self._sorted_keys]
+
+    @classmethod
+    def from_catalogue(cls, catalogue) -> 'ItemNameIndex':
+        aliases = {}
+        for record in catalogue:
+            if record.name_cn:
+                aliases.setdefault(record.name_cn, set()).update(n for n in (record.name_en, record.name_jp) if n)
+        return cls(aliases.items())
+
+    def __len__(self):
+        return len(self.exact)
+
+    def resolve(self, name) -> Optional[str]:
+        """任意语言的准确名字 -> 规范名（材料名CN），找不到返回 None。"""
+        return self.exact.get(normalize_name(name))
+
+    def complete(self, prefix, limit: int = DEFAULT_SUGGESTIONS) -> List[str]:
+        """以 prefix 开头的材料，短的（更接近完整输入的）排在前面。"""
+        key = normalize_name(prefix)
+        if not key:
+            return []
+        start = bisect_left(self._sorted_values, key)
+        end = bisect_left(self._sorted_values, key + '\U0010ffff', lo=start)
+        matches = sorted(self._sorted_keys[start:end], key=lambda i: (len(self._keys[i]), self._keys[i]))
+        return self._unique_canonical(matches, limit)
+
+    def suggest(self, query, limit: int = DEFAULT_SUGGESTIONS) -> List[str]:
+        """添加失败时的候选：先给前缀匹配，不够再按三元组相似度补足。"""
+        key = normalize_name(query)
+        if not key:
+            return []
+        result = self.complete(key, limit)
+        if len(result) >= limit:
+            return result
+
+        grams = trigrams(key)
+        shared = defaultdict(int)
+        for gram in grams:
+            for key_id in self._postings.get(gram, ()):
+                shared[key_id] += 1
+        scored = []
+        for key_id, count in shared.items():
+            score = count / (len(grams) + len(self._key_trigrams[key_id]) - count)
+            if key in self._keys[key_id]:
+                # 输入是名字中间的一段（例如“石榴石原”），三元组重合少但很可能就是要找它
+                score += 0.5
+            if score >= MIN_FUZZY_SCORE:
+                scored.append((-score, len(self._keys[key_id]), key_id))
+        scored.sort()
+        for canonical in self._unique_canonical([key_id for _, _, key_id in scored], limit):
+            if canonical not in result:
+                result.append(canonical)
+                if len(result) >= limit:
+                    break
+        return result
+
+    def _unique_canonical(self, key_ids, limit) -> List[str]:
+        result = []
+        for key_id in key_ids:
+            canonical = self._key_canonical[key_id]
+            if canonical not in result:
+                result.append(canonical)
+                if len(result) >= limit:
+                    break
+        return result
@@ -0,0 +1,315 @@
+import asyncio
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+from aiohttp import web
+
+# 默认的耗时分桶（秒）：覆盖从渲染一个 embed 的亚毫秒级，到被 Discord 限流后等上十几秒
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DEFAULT_METRICS_HOST = '127.0.0.1'
+DEFAULT_METRICS_PORT = 9108
+# 外部 API 的主机名 -> 指标里的 service 标签
+HTTP_SERVICES = {
+    'universalis.app': 'universalis',
+    'cafemaker.wakingsands.com': 'cafemaker',
+    'cn.fflogs.com': 'fflogs',
+    'house.ffxiv.cyou': 'housing',
+    'calendar.google.com': 'calendar',
+}
+# 指标名 -> (类型, 说明)；Prometheus 输出的 HELP/TYPE 从这里取
+METRICS = {
+    'tracker_wakeup_lag_seconds': ('histogram', 'SpawnClock woke a tracker this long after its scheduled deadline'),
+    'tracker_tick_seconds': ('histogram', 'Time spent running one batch of due tracker ticks'),
+    'et_rollover_delay_seconds': ('histogram', 'Delay between an ET hour boundary and the shared clock rolling over, '
+                                  'recorded only when a tracker timer was due at that boundary'),
+    'tracker_render_seconds': ('histogram', 'Time to build one tracker panel embed'),
+    'discord_request_seconds': ('histogram', 'Latency of Discord REST calls made by trackers'),
+    'discord_request_errors_total': ('counter', 'Discord REST calls that raised, by HTTP status'),
+    'discord_rate_limited_total': ('counter', '429 responses reported by discord.py (scope=route|global)'),
+    'outbox_wait_seconds': ('histogram', 'Time a queued Discord job waited for the outbox rate budget'),
+    'http_client_request_seconds': ('histogram', 'Latency of outgoing HTTP API requests'),
+    'http_client_errors_total': ('counter', 'Outgoing HTTP API requests that failed or returned >= 400'),
+    'tracker_lag_seconds': ('gauge', 'Most recent wakeup lag of each running tracker'),
+    'tracker_max_lag_seconds': ('gauge', 'Worst wakeup lag of each running tracker since it started'),
+    'trackers_active': ('gauge', 'Running channel trackers'),
+    'outbox_queue_depth': ('gauge', 'Discord jobs waiting in the outbox'),
+    'clock_offset_seconds': ('gauge', 'Offset applied to the local clock to match Discord server time'),
+}
+
+
+class Histogram:
+    """固定分桶的直方图，额外记下最大值，!stats 估算分位数时用。"""
+
+    __slots__ = ('buckets', 'counts', 'count', 'sum', 'max')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """按分桶上界估算分位数；落在最后一个桶时返回观测到的最大值。"""
+        if not self.count:
+            return 0.0
+        target, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+
+class MetricsRegistry:
+    """进程内的指标登记处：各个 Cog 调用 observe/inc 记录，导出时渲染成 Prometheus 文本格式。
+
+    模块级的 REGISTRY 在 !reload 之后依然是同一个对象，累计的数据不会因为重载模块清零。
+    运行中追踪器数量这类“现在的状态”不逐次记录，而是注册回调，在抓取时现算。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[Tuple, Histogram]] = {}
+        self._counters: Dict[str, Dict[Tuple, float]] = {}
+        self._gauge_callbacks: Dict[str, Callable[[], Dict[Tuple, float]]] = {}
+        self.started_at = time.time()
+
+    def observe(self, name, value: float, **labels):
+        key = _key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, name, amount: float = 1, **labels):
+        key = _key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def register_gauge(self, name, callback: Callable[[], Dict[Tuple, float]]):
+        """callback 返回 {标签元组: 数值}；同名再次注册（例如重载模块后）会替换旧的回调。"""
+        self._gauge_callbacks[name] = callback
+
+    def histogram(self, name, **labels) -> Optional[Histogram]:
+        return self._histograms.get(name, {}).get(_key(labels))
+
+    def histograms(self, name) -> Dict[Tuple, Histogram]:
+        return dict(self._histograms.get(name, {}))
+
+    def counters(self, name) -> Dict[Tuple, float]:
+        return dict(self._counters.get(name, {}))
+
+    def gauges(self, name) -> Dict[Tuple, float]:
+        callback = self._gauge_callbacks.get(name)
+        if callback is None:
+            return {}
+        try:
+            return callback()
+        except Exception as e:
+            print(f"读取指标 {name} 失败: {e}")
+            return {}
+
+    def render(self) -> str:
+        """Prometheus 文本格式（version 0.0.4）。"""
+        lines = []
+        with self._lock:
+            histograms = {name: dict(series) for name, series in self._histograms.items()}
+            counters = {name: dict(series) for name, series in self._counters.items()}
+        for name, series in sorted(histograms.items()):
+            _header(lines, name, 'histogram')
+            for key, histogram in sorted(series.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(key + (('le', repr(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_labels(key + (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{name}_sum{_labels(key)} {histogram.sum}")
+                lines.append(f"{name}_count{_labels(key)} {histogram.count}")
+        for name, series in sorted(counters.items()):
+            _header(lines, name, 'counter')
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{_labels(key)} {value}")
+        for name in sorted(self._gauge_callbacks):
+            _header(lines, name, 'gauge')
+            for key, value in sorted(self.gauges(name).items()):
+                lines.append(f"{name}{_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def summary_lines(self) -> List[str]:
+        """!stats 用的人类可读摘要。"""
+        uptime = int(time.time() - self.started_at)
+        lines = [f"⏱️ 已运行 **{uptime // 3600}** 小时 **{uptime % 3600 // 60}** 分钟"]
+        trackers = sum(self.gauges('trackers_active').values())
+        queue = sum(self.gauges('outbox_queue_depth').values())
+        lines.append(f"📡 运行中的追踪器: **{int(trackers)}** | 发送队列: **{int(queue)}**")
+        for title, name in (("时钟唤醒延迟", 'tracker_wakeup_lag_seconds'), ("一批追踪器刷新", 'tracker_tick_seconds'),
+                            ("ET 整点更迭延迟", 'et_rollover_delay_seconds'), ("面板渲染", 'tracker_render_seconds'),
+                            ("发送队列等待", 'outbox_wait_seconds')):
+            histogram = self.histogram(name)
+            if histogram is not None:
+                lines.append(f"{title}: {_describe(histogram)}")
+        for key, histogram in sorted(self.histograms('discord_request_seconds').items()):
+            lines.append(f"Discord {dict(key).get('op', '?')}: {_describe(histogram)}")
+        rate_limited = self.counters('discord_rate_limited_total')
+        errors = self.counters('discord_request_errors_total')
+        lines.append(f"🚦 429 限流: **{int(sum(rate_limited.values()))}** 次 | Discord 请求失败: **{int(sum(errors.values()))}** 次")
+        http_errors = {}
+        for key, value in self.counters('http_client_errors_total').items():
+            service = dict(key).get('service')
+            http_errors[service] = http_errors.get(service, 0) + value
+        for key, histogram in sorted(self.histograms('http_client_request_seconds').items()):
+            service = dict(key).get('service', '?')
+            lines.append(f"🌐 {service}: {_describe(histogram)} | 失败 {int(http_errors.get(service, 0))} 次")
+        lag = self.gauges('tracker_max_lag_seconds')
+        if lag:
+            key, value = max(lag.items(), key=lambda item: item[1])
+            lines.append(f"🐢 最慢的追踪器: 频道 {dict(key).get('channel')}，最大唤醒延迟 {value * 1000:.0f} ms")
+        return lines
+
+
+def _header(lines, name, kind):
+    help_text = METRICS.get(name, (kind, name))[1]
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def _key(labels) -> Tuple:
+    # 标签值统一成字符串，状态码（int）和异常名（str）可以一起排序
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _labels(key) -> str:
+    if not key:
+        return ''
+    escaped = (v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in key)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(key, escaped)) + '}'
+
+
+def _describe(histogram: Histogram) -> str:
+    return (f"{histogram.count} 次, p50 {histogram.quantile(0.5) * 1000:.1f} ms, "
+            f"p95 {histogram.quantile(0.95) * 1000:.1f} ms, 最大 {histogram.max * 1000:.1f} ms")
+
+
+REGISTRY = MetricsRegistry()
+
+
+# --- 外部 HTTP API ---
+def http_trace_config(registry: MetricsRegistry = REGISTRY) -> aiohttp.TraceConfig:
+    """给 aiohttp.ClientSession(trace_configs=[...]) 用：按服务记录每个请求的耗时和失败。"""
+
+    async def on_request_start(session, context, params):
+        context.start = time.perf_counter()
+
+    async def on_request_end(session, context, params):
+        service = _service_of(params.url)
+        registry.observe('http_client_request_seconds', time.perf_counter() - context.start, service=service)
+        if params.response.status >= 400:
+            registry.inc('http_client_errors_total', service=service, status=params.response.status)
+
+    async def on_request_exception(session, context, params):
+        service = _service_of(params.url)
+        registry.observe('http_client_request_seconds', time.perf_counter() - context.start, service=service)
+        registry.inc('http_client_errors_total', service=service, status=type(params.exception).__name__)
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    return trace_config
+
+
+def _service_of(url) -> str:
+    host = urlsplit(str(url)).hostname or '?'
+    return HTTP_SERVICES.get(host, host)
+
+
+# --- discord.py 的 429 ---
+class DiscordRateLimitCounter(logging.Handler):
+    """discord.py 自己处理 429 并重试，只会打 warning 日志；挂在 discord.http 的 logger 上数这些日志。
+
+    每个 429 都会打一条 "We are being rate limited"，全局限流紧接着（同一段同步代码里）再打一条
+    "Global rate limit"。所以前者先记为待定，等事件循环下一轮再算作路由限流；
+    这期间出现的全局限流日志认领一条待定记录，一个全局 429 只会记一次 global。
+    """
+
+    def __init__(self, registry: MetricsRegistry):
+        super().__init__(logging.WARNING)
+        self.registry = registry
+        self._pending_route = 0
+
+    def emit(self, record):
+        message = str(record.msg)
+        if message.startswith('We are being rate limited'):
+            self._pending_route += 1
+            try:
+                asyncio.get_running_loop().call_soon(self._count_route)
+            except RuntimeError:
+                # 不在事件循环里（不会紧接着打全局限流日志），直接算路由限流
+                self._count_route()
+        elif message.startswith('Global rate limit'):
+            if self._pending_route:
+                self._pending_route -= 1
+            self.registry.inc('discord_rate_limited_total', scope='global')
+
+    def _count_route(self):
+        if self._pending_route:
+            self._pending_route -= 1
+            self.registry.inc('discord_rate_limited_total', scope='route')
+
+
+def install_rate_limit_counter(registry: MetricsRegistry = REGISTRY):
+    logger = logging.getLogger('discord.http')
+    if not any(isinstance(h, DiscordRateLimitCounter) for h in logger.handlers):
+        logger.addHandler(DiscordRateLimitCounter(registry))
+
+
+# --- 导出 ---
+class MetricsServer:
+    """在本机端口上提供 GET /metrics，给 Prometheus 抓取。只监听 127.0.0.1，不对外暴露。"""
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY, host=DEFAULT_METRICS_HOST, port=DEFAULT_METRICS_PORT):
+        self.registry = registry
+        self.host, self.port = host, port
+        self._runner = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/metrics', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        print(f"📈 指标已在 http://{self.host}:{self.port}/metrics 导出。")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request):
+        return web.Response(text=self.registry.render(), content_type='text/plain', charset='utf-8',
+                            headers={'X-Content-Type-Options': 'nosniff'})
@@ -0,0 +1,408 @@
+import csv
+import hashlib
+import json
+import marshal
+import os
+import sys
+import zlib
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy 是可选依赖，没有时退回逐个计算
+    np = None
+
+from utils.eorzea_clock import ET_DAY_REAL_SECONDS, NO_SPAWN_HOUR, next_hour_starts
+from utils.item_bits import ItemBitmaps
+from utils.node_query import NodeQueryIndex
+
+# nodes.csv 的列名（中文表头）-> NodeRecord 的字段名
+CSV_COLUMNS = {
+    '版本归属': 'expansion',
+    '职能': 'job',
+    '材料名JP': 'name_jp',
+    '材料名EN': 'name_en',
+    '材料名CN': 'name_cn',
+    '类型': 'node_type',
+    '类型CN': 'node_type_cn',
+    '地区JP': 'region_jp',
+    '地区EN': 'region_en',
+    '地区CN': 'region_cn',
+    '靠近水晶': 'aetheryte',
+    '靠近水晶CN': 'aetheryte_cn',
+    '具体坐标': 'coords',
+    '图片': 'image',
+    'patch': 'patch',
+}
+# 取值种类很少、会被大量重复引用的列，加载时做字符串驻留
+INTERNED_FIELDS = ('expansion', 'job', 'node_type', 'node_type_cn', 'region_jp', 'region_en', 'region_cn',
+                   'aetheryte', 'aetheryte_cn', 'patch')
+# 快照格式版本；NodeRecord 字段有变化时加一，旧快照会被自动丢弃重建
+SNAPSHOT_FORMAT = 1
+
+
+def parse_et_hour(value) -> Optional[int]:
+    value = (value or '').strip()
+    if not value.isdigit():
+        return None
+    hour = int(value)
+    # 结束ET 允许写成 24，表示当天结束
+    return hour if 0 <= hour <= 24 else None
+
+
+def parse_coords(value) -> Tuple[Optional[float], Optional[float]]:
+    cleaned = (value or '').replace('[', '').replace(']', '').strip()
+    if ',' not in cleaned:
+        return None, None
+    try:
+        x_str, y_str = [s.strip() for s in cleaned.split(',', 1)]
+        return float(x_str), float(y_str)
+    except ValueError:
+        return None, None
+
+
+def parse_int(value, default=0) -> int:
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return default
+
+
+def node_key(name_cn, region_cn, start_et) -> Tuple[str, str, Optional[int]]:
+    """节点的身份：同一个材料、同一个地区、同一个开始ET 视为同一个采集点。"""
+    return name_cn, region_cn, start_et
+
+
+class NodeRecord:
+    """nodes.csv 的一行，加载时一次性解析成定型字段。"""
+
+    __slots__ = ('node_id', 'index', 'start_et', 'end_et', 'level', 'x', 'y') + tuple(CSV_COLUMNS.values())
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    @property
+    def key(self):
+        return node_key(self.name_cn, self.region_cn, self.start_et)
+
+    def __repr__(self):
+        return f"NodeRecord({self.node_id}, {self.name_cn!r}, ET {self.start_et}-{self.end_et}, {self.region_cn!r})"
+
+    @classmethod
+    def from_values(cls, values) -> 'NodeRecord':
+        record = cls.__new__(cls)
+        for name, value in zip(cls.__slots__, values):
+            setattr(record, name, value)
+        for name in INTERNED_FIELDS:
+            setattr(record, name, sys.intern(getattr(record, name)))
+        return record
+
+    def values(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    @classmethod
+    def from_row(cls, row: Dict[str, str]) -> 'NodeRecord':
+        fields = {attr: (row.get(column) or '').strip() for column, attr in CSV_COLUMNS.items()}
+        for attr in INTERNED_FIELDS:
+            fields[attr] = sys.intern(fields[attr])
+        start_et = parse_et_hour(row.get('开始ET'))
+        fields['start_et'] = start_et if start_et is not None and start_et < 24 else None
+        fields['end_et'] = parse_et_hour(row.get('结束ET'))
+        fields['level'] = parse_int(row.get('等级'))
+        fields['x'], fields['y'] = parse_coords(fields['coords'])
+        return cls(**fields)
+
+
+class NodeCatalogue:
+    """整个 nodes.csv 的只读目录。
+
+    node_id 由节点身份 (材料名CN, 地区CN, 开始ET) 的 CRC32 得到，CSV 增删行、调整顺序都不会改变
+    其它节点的 ID；追踪器只保存 ID，通过 get() 取回记录。
+    """
+
+    def __init__(self, records: List[NodeRecord], map_ids: Optional[Dict[str, int]] = None, item_names=None):
+        self.nodes = records
+        self.by_id = {}
+        for index, record in enumerate(records):
+            record.index = index
+            # 从快照恢复的记录已经带着 ID，不再重新计算
+            if record.node_id is None:
+                record.node_id = self._assign_id(record)
+            self.by_id[record.node_id] = record
+        if item_names is None:
+            item_names = (r.name_cn for r in records if r.name_cn)
+        self.item_names = frozenset(item_names)
+        self.map_ids = map_ids or {}
+        self._window_index = None
+        self._query_index = None
+        self._item_bits = None
+        self._start_hours = None
+
+    @property
+    def window_index(self) -> 'SpawnWindowIndex':
+        if self._window_index is None:
+            self._window_index = SpawnWindowIndex(self.nodes)
+        return self._window_index
+
+    @property
+    def query_index(self) -> NodeQueryIndex:
+        """!find / !start filter 用的列位图索引，第一次查询时才建立。"""
+        if self._query_index is None:
+            self._query_index = NodeQueryIndex(self)
+        return self._query_index
+
+    @property
+    def item_bits(self) -> ItemBitmaps:
+        """材料名的稠密 ID 和每个 ET 整点的刷新位集，关注列表的匹配都用它。"""
+        if self._item_bits is None:
+            self._item_bits = ItemBitmaps(self)
+        return self._item_bits
+
+    def inherit_item_ids(self, previous: 'NodeCatalogue'):
+        """热更新时沿用旧目录的材料 ID，运行中的追踪器和用户的位集不需要重新编号。"""
+        self._item_bits = ItemBitmaps(self, previous.item_bits)
+
+    def warm_up(self):
+        """提前建好所有懒加载的索引，热更新时在线程里调用，换到事件循环上的只是引用。"""
+        return self.window_index, self.start_hours, self.query_index, self.item_bits
+
+    @property
+    def start_hours(self):
+        """与 nodes 一一对应的开始ET 数组（有 numpy 时是 int8 ndarray），缺失的记为 NO_SPAWN_HOUR。"""
+        if self._start_hours is None:
+            hours = [NO_SPAWN_HOUR if r.start_et is None else r.start_et for r in self.nodes]
+            self._start_hours = np.array(hours, dtype=np.int8) if np is not None else tuple(hours)
+        return self._start_hours
+
+    def _assign_id(self, record: NodeRecord) -> int:
+        node_id = zlib.crc32(repr(record.key).encode('utf-8')) & 0x7fffffff
+        # 极少数哈希碰撞时顺延，按 CSV 顺序保证结果确定
+        while node_id in self.by_id:
+            node_id = (node_id + 1) & 0x7fffffff
+        return node_id
+
+    @classmethod
+    def from_csv(cls, filename, map_ids=None) -> 'NodeCatalogue':
+        # nodes.csv 带 BOM，用 utf-8-sig 才能正确读到第一列“版本归属”
+        with open(filename, mode='r', encoding='utf-8-sig', newline='') as infile:
+            return cls([NodeRecord.from_row(row) for row in csv.DictReader(infile)], map_ids)
+
+    def get(self, node_id) -> Optional[NodeRecord]:
+        return self.by_id.get(node_id)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __iter__(self) -> Iterator[NodeRecord]:
+        return iter(self.nodes)
+
+    def __bool__(self):
+        return bool(self.nodes)
+
+
+class CatalogueDiff(NamedTuple):
+    """两个目录版本之间的节点差异（节点 ID 列表）。"""
+    added: List[int]
+    removed: List[int]
+    changed: List[int]
+
+    @property
+    def empty(self) -> bool:
+        return not (self.added or self.removed or self.changed)
+
+
+def _record_content(record: NodeRecord) -> tuple:
+    # index 只是在 CSV 里的行号，调整行顺序不算变更
+    return tuple(getattr(record, name) for name in NodeRecord.__slots__ if name != 'index')
+
+
+def diff_catalogues(old: NodeCatalogue, new: NodeCatalogue) -> CatalogueDiff:
+    """按 node_id 比较两个目录：新增、删除，以及 ID 相同但字段（时间、坐标、类型等）有变化的节点。"""
+    added = [r.node_id for r in new if old.get(r.node_id) is None]
+    removed = [r.node_id for r in old if new.get(r.node_id) is None]
+    changed = [r.node_id for r in new
+               if old.get(r.node_id) is not None and _record_content(old.get(r.node_id)) != _record_content(r)]
+    return CatalogueDiff(added, removed, changed)
+
+
+def spawn_window(record: NodeRecord) -> Optional[Tuple[int, int]]:
+    """返回节点的 [开始ET, 结束ET) 窗口；跨午夜的窗口结束时间会小于开始时间。缺失结束ET 时按 1 小时算。"""
+    if record.start_et is None:
+        return None
+    end_et = record.end_et if record.end_et is not None else record.start_et + 1
+    return record.start_et, end_et % 24
+
+
+def window_hours(start_et, end_et):
+    """窗口覆盖的 ET 整点，正确处理 22 -> 2 这种跨午夜的窗口；开始等于结束视为全天。"""
+    length = (end_et - start_et) % 24 or 24
+    return [(start_et + i) % 24 for i in range(length)]
+
+
+class SpawnWindowIndex:
+    """按 ET 整点建立的采集窗口区间索引。
+
+    所有窗口的端点都是 ET 整点，所以把一天离散成 24 格：active_at[h] 是在 h 点开放的节点，
+    starting_at[h] 是在 h 点开始开放的节点。“现在开放”是一次查表，复杂度 O(1 + k)；
+    追踪器按 starting_at 逐个整点挑出关注的节点。
+    """
+
+    def __init__(self, records):
+        active_at = [[] for _ in range(24)]
+        starting_at = [[] for _ in range(24)]
+        for record in records:
+            window = spawn_window(record)
+            if window is None:
+                continue
+            starting_at[window[0]].append(record.node_id)
+            for hour in window_hours(*window):
+                active_at[hour].append(record.node_id)
+        self.active_at = [tuple(ids) for ids in active_at]
+        self.starting_at = [tuple(ids) for ids in starting_at]
+
+    def active(self, et_hour: int):
+        """在 ET et_hour 点正在开放的节点 ID。"""
+        return self.active_at[et_hour % 24]
+
+
+# --- 批量刷新时间 ---
+# 整点换算都在 eorzea_clock 里；这里只是把它铺到整个目录和多个 ET 日上。
+
+def next_spawn_matrix(start_hours, now: float, count: int):
+    """每个 ET 整点接下来 count 次刷新时间，第 j 列比第 0 列晚 j 个 ET 日。"""
+    first = next_hour_starts(start_hours, now)
+    if np is not None:
+        offsets = np.arange(count, dtype=np.int64) * ET_DAY_REAL_SECONDS
+        return np.where(first[:, None] >= 0, first[:, None] + offsets, NO_SPAWN_HOUR)
+    return [[NO_SPAWN_HOUR] * count if ts < 0 else [ts + j * ET_DAY_REAL_SECONDS for j in range(count)]
+            for ts in first]
+
+
+def spawn_occurrences(start_hours, now: float, horizon_seconds: float):
+    """now 之后 horizon_seconds 秒内的全部刷新，返回按时间排序的 (下标序列, 时间序列)。"""
+    if horizon_seconds <= 0:
+        return [], []
+    count = int(horizon_seconds // ET_DAY_REAL_SECONDS) + 1
+    stamps = next_spawn_matrix(start_hours, now, count)
+    limit = now + horizon_seconds
+    if np is not None:
+        rows, cols = np.nonzero((stamps >= 0) & (stamps <= limit))
+        values = stamps[rows, cols]
+        # 同一时间按目录顺序排列
+        order = np.lexsort((rows, values))
+        return rows[order], values[order]
+    pairs = sorted((ts, i) for i, row in enumerate(stamps) for ts in row if 0 <= ts <= limit)
+    return [i for _, i in pairs], [ts for ts, _ in pairs]
+
+
+# --- 编译快照 ---
+# nodes.csv + map_id.json 解析后的结果用 marshal 存成一个二进制文件，放在 CSV 旁边。
+# 源文件的 mtime/大小没变就直接信任快照；变了再比对内容哈希，哈希也变了才重新解析 CSV。
+
+def snapshot_path_for(csv_filename) -> str:
+    return os.path.splitext(csv_filename)[0] + '.snapshot'
+
+
+def _file_digest(filename) -> Optional[str]:
+    try:
+        with open(filename, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def _source_stamp(filename, with_digest=True) -> Optional[dict]:
+    try:
+        st = os.stat(filename)
+    except (FileNotFoundError, TypeError):
+        return None
+    return {'mtime_ns': st.st_mtime_ns, 'size': st.st_size,
+            'sha1': _file_digest(filename) if with_digest else None}
+
+
+def _sources_match(saved: dict, filenames) -> Tuple[bool, bool]:
+    """返回 (快照是否有效, 是否只是 mtime 变了需要刷新戳记)。"""
+    touched = False
+    for filename in filenames:
+        if not filename:
+            continue
+        key = os.path.basename(filename)
+        old = saved.get(key)
+        new = _source_stamp(filename, with_digest=False)
+        if old is None or new is None:
+            if old != new:
+                return False, False
+            continue
+        if (old['mtime_ns'], old['size']) == (new['mtime_ns'], new['size']):
+            continue
+        if old['size'] != new['size'] or old['sha1'] != _file_digest(filename):
+            return False, False
+        touched = True
+    return True, touched
+
+
+def _load_map_ids(map_id_filename) -> Dict[str, int]:
+    if not map_id_filename or not os.path.exists(map_id_filename):
+        return {}
+    try:
+        with open(map_id_filename, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"❌ 读取 map_id.json 失败: {e}")
+        return {}
+
+
+def read_snapshot(csv_filename, map_id_filename=None) -> Optional[NodeCatalogue]:
+    snapshot_file = snapshot_path_for(csv_filename)
+    try:
+        with open(snapshot_file, 'rb') as f:
+            payload = marshal.loads(f.read())
+    except (FileNotFoundError, EOFError, ValueError, TypeError):
+        return None
+    if not isinstance(payload, dict) or payload.get('format') != SNAPSHOT_FORMAT \
+            or tuple(payload.get('fields', ())) != NodeRecord.__slots__:
+        return None
+
+    valid, touched = _sources_match(payload.get('sources', {}), (csv_filename, map_id_filename))
+    if not valid:
+        return None
+    catalogue = NodeCatalogue([NodeRecord.from_values(row) for row in payload['rows']], payload['map_ids'],
+                              payload['item_names'])
+    if touched:
+        write_snapshot(catalogue, csv_filename, map_id_filename)
+    return catalogue
+
+
+def write_snapshot(catalogue: NodeCatalogue, csv_filename, map_id_filename=None):
+    sources = {}
+    for filename in (csv_filename, map_id_filename):
+        if filename:
+            sources[os.path.basename(filename)] = _source_stamp(filename)
+    payload = {
+        'format': SNAPSHOT_FORMAT,
+        'fields': NodeRecord.__slots__,
+        'sources': sources,
+        'rows': [record.values() for record in catalogue.nodes],
+        'item_names': sorted(catalogue.item_names),
+        'map_ids': catalogue.map_ids,
+    }
+    snapshot_file = snapshot_path_for(csv_filename)
+    temp_file = f"{snapshot_file}.tmp"
+    try:
+        with open(temp_file, 'wb') as f:
+            f.write(marshal.dumps(payload))
+        os.replace(temp_file, snapshot_file)
+    except Exception as e:
+        print(f"写入节点快照失败: {e}")
+        if os.path.exists(temp_file): os.remove(temp_file)
+
+
+def load_catalogue(csv_filename, map_id_filename=None) -> NodeCatalogue:
+    """优先读取编译快照；快照缺失或过期时解析 CSV 并重写快照。CSV 不存在时抛出 FileNotFoundError。"""
+    catalogue = read_snapshot(csv_filename, map_id_filename)
+    if catalogue is not None:
+        return catalogue
+    catalogue = NodeCatalogue.from_csv(csv_filename, _load_map_ids(map_id_filename))
+    write_snapshot(catalogue, csv_filename, map_id_filename)
+    return catalogue
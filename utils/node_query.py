@@ -0,0 +1,180 @@
+import fnmatch
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Tuple
+
+from utils.item_bits import iter_bits
+
+# 用户输入的职能写法 -> nodes.csv 里的“职能”
+JOB_ALIASES = {
+    '园艺': '园艺', '园艺工': '园艺', 'btn': '园艺', 'botanist': '园艺',
+    '采掘': '采掘', '采矿': '采掘', '采矿工': '采掘', 'min': '采掘', 'miner': '采掘',
+}
+# 查询里的列名写法 -> NodeRecord 字段；et 是按 ET 整点的开放时间
+COLUMN_ALIASES = {
+    '职能': 'job', 'job': 'job',
+    '版本': 'expansion', '版本归属': 'expansion', 'expansion': 'expansion',
+    '类型': 'node_type_cn', 'type': 'node_type_cn',
+    '等级': 'level', 'lv': 'level', 'level': 'level',
+    'patch': 'patch', '补丁': 'patch',
+    '地区': 'region_cn', '地图': 'region_cn', 'region': 'region_cn',
+    'et': 'et',
+}
+# 按取值建位图的列
+CATEGORICAL_FIELDS = ('job', 'expansion', 'region_cn', 'node_type_cn', 'patch')
+# 可以用 > >= < <= 比较大小的列
+ORDERED_FIELDS = ('level', 'patch')
+TERM_PATTERN = re.compile(r'^(?P<column>[^<>=!]+?)(?P<op>>=|<=|!=|=|>|<)(?P<value>.+)$')
+OPERATOR_PATTERN = re.compile(r'\s*(>=|<=|!=|=|>|<)\s*')
+
+
+class NodeQuery(NamedTuple):
+    """编译好的过滤条件：text 用于显示和保存会话，node_ids 是启动时一次性算出的命中节点（按目录顺序）。"""
+    text: str
+    node_ids: Tuple[int, ...]
+
+
+def version_key(value) -> Tuple[int, ...]:
+    """'6.4' -> (6, 4)，无法解析的部分记为 0，用于 patch 的大小比较。"""
+    parts = []
+    for part in str(value).split('.'):
+        parts.append(int(part) if part.isdigit() else 0)
+    return tuple(parts)
+
+
+def normalize_tokens(tokens) -> List[str]:
+    """全角符号转半角，并把“等级 >= 90”这种带空格的写法合成一个条件。"""
+    text = unicodedata.normalize('NFKC', ' '.join(tokens)).replace('≥', '>=').replace('≤', '<=')
+    return OPERATOR_PATTERN.sub(r'\1', text).split()
+
+
+def _compare(op, left, right) -> bool:
+    if op == '>=': return left >= right
+    if op == '<=': return left <= right
+    if op == '>': return left > right
+    if op == '<': return left < right
+    if op == '!=': return left != right
+    return left == right
+
+
+class NodeQueryIndex:
+    """节点目录的列索引，用于 !find 和 !start filter。
+
+    每个节点对应目录里的一个下标，每一列的每个取值都预先算好一个位图（Python 整数，第 i 位表示第 i 个节点）；
+    等级按取值分桶，ET 按 24 个整点各存一个“在这个整点开放”的位图。查询时先在很少的几十个取值里挑出符合条件的，
+    把它们的位图 OR 起来，不同条件之间再 AND，整个过程不需要扫描节点。
+    同一列的多个等值条件是“或”（`园艺 采掘` 表示两种都要），不同列之间、比较和 != 条件之间是“且”。
+    """
+
+    def __init__(self, catalogue):
+        self.catalogue = catalogue
+        self.all_mask = (1 << len(catalogue)) - 1
+        self.columns: Dict[str, Dict[object, int]] = {field: defaultdict(int) for field in CATEGORICAL_FIELDS + ('level',)}
+        for record in catalogue:
+            bit = 1 << record.index
+            for field, bitmaps in self.columns.items():
+                bitmaps[getattr(record, field)] |= bit
+        self.columns = {field: dict(bitmaps) for field, bitmaps in self.columns.items()}
+        self.hour_masks = []
+        for node_ids in catalogue.window_index.active_at:
+            mask = 0
+            for node_id in node_ids:
+                mask |= 1 << catalogue.get(node_id).index
+            self.hour_masks.append(mask)
+
+    def evaluate(self, tokens) -> Tuple[int, List[str]]:
+        """把查询条件求值成位图，返回 (位图, 无法识别的条件)。没有任何条件时命中全部节点。"""
+        any_of = defaultdict(int)  # 同一列的等值条件先 OR 在一起
+        mask, unknown = self.all_mask, []
+        for token in normalize_tokens(tokens):
+            term = TERM_PATTERN.match(token)
+            if term is None:
+                found = self._bare_term(token)
+                if found is None:
+                    unknown.append(token)
+                else:
+                    any_of[found[0]] |= found[1]
+                continue
+            field = COLUMN_ALIASES.get(term['column'].strip().lower())
+            value = term['value'].strip()
+            term_mask = None if field is None else self._term_mask(field, term['op'], value)
+            if term_mask is None:
+                unknown.append(token)
+            elif term['op'] == '=':
+                any_of[field] |= term_mask
+            else:
+                mask &= term_mask
+        for term_mask in any_of.values():
+            mask &= term_mask
+        return mask, unknown
+
+    def compile(self, tokens) -> Tuple[NodeQuery, List[str]]:
+        """求值并固定下来，返回 (NodeQuery, 无法识别的条件)；追踪器启动时调用一次。"""
+        mask, unknown = self.evaluate(tokens)
+        return NodeQuery(' '.join(normalize_tokens(tokens)), tuple(self.node_ids(mask))), unknown
+
+    def node_ids(self, mask) -> List[int]:
+        """位图里的节点 ID，按目录顺序。"""
+        nodes = self.catalogue.nodes
+        return [nodes[index].node_id for index in iter_bits(mask)]
+
+    def _bare_term(self, token):
+        """只写了值的条件：依次试职能写法、版本、地区的准确值，最后按类型的一部分匹配（“传说”包括传说1~3星）。"""
+        job = JOB_ALIASES.get(token.lower())
+        if job is not None:
+            return 'job', self.columns['job'].get(job, 0)
+        for field in ('expansion', 'region_cn'):
+            if token in self.columns[field]:
+                return field, self.columns[field][token]
+        types = [bits for value, bits in self.columns['node_type_cn'].items() if token in value]
+        if types:
+            return 'node_type_cn', self._union(types)
+        return None
+
+    def _term_mask(self, field, op, value):
+        if field == 'et':
+            return self._et_mask(value) if op == '=' else None
+        if field == 'job':
+            value = JOB_ALIASES.get(value.lower(), value)
+        if op in ('=', '!='):
+            matched = self._union(bits for key, bits in self.columns[field].items()
+                                  if self._value_matches(field, value, key))
+            return matched if op == '=' else self.all_mask & ~matched
+        if field not in ORDERED_FIELDS:
+            return None
+        if field == 'level':
+            if not value.isdigit():
+                return None
+            target, key_of = int(value), int
+        else:
+            target, key_of = version_key(value), version_key
+        return self._union(bits for key, bits in self.columns[field].items() if _compare(op, key_of(key), target))
+
+    @staticmethod
+    def _value_matches(field, pattern, value) -> bool:
+        if field == 'level':
+            return pattern.isdigit() and int(pattern) == value
+        if field == 'patch' and pattern.endswith('*') and not any(c in pattern[:-1] for c in '*?['):
+            # patch=7.* 也要包括写成“7”的 7.0 节点
+            prefix = pattern.rstrip('*').rstrip('.')
+            return value == prefix or value.startswith(prefix + '.')
+        if any(c in pattern for c in '*?['):
+            return fnmatch.fnmatchcase(value, pattern)
+        return value == pattern
+
+    def _et_mask(self, value):
+        """ET=3 是 3 点开放的节点；ET=22-2 是 22 点到 2 点之间任意时刻开放过的节点（不含 2 点）。"""
+        start, _, end = value.partition('-')
+        if not start.isdigit() or (end and not end.isdigit()):
+            return None
+        start = int(start) % 24
+        length = ((int(end) - start) % 24 or 24) if end else 1
+        return self._union(self.hour_masks[(start + i) % 24] for i in range(length))
+
+    @staticmethod
+    def _union(masks) -> int:
+        result = 0
+        for bits in masks:
+            result |= bits
+        return result
@@ -0,0 +1,124 @@
+import json
+import os
+import threading
+import time
+
+DEFAULT_FLUSH_DELAY = 2.0  # 第一次标记脏数据后最多等多久落盘（秒）
+
+
+class WriteBehindStore:
+    """所有 data/*.json 的后写式持久化服务。
+
+    各个 Cog 改完内存里的数据后调用 save(文件名, 数据)：在调用方（事件循环）里把数据序列化成文本作为快照，
+    把这个文件标记为脏后立刻返回，之后再改内存里的字典也不会影响这份快照；
+    后台线程只负责在第一次标记后 delay 秒把文本写到临时文件再 os.replace，保证文件要么是旧的要么是新的。
+    同一个文件在 delay 之内被标记多少次都只写一次，例如墨尔本零点一大波 !draw 只会写一次 daily_draw.json。
+    关闭或重载模块前调用 flush() 把还没写的数据全部落盘。
+    """
+
+    def __init__(self, delay: float = DEFAULT_FLUSH_DELAY):
+        self.delay = delay
+        # 文件名 -> [序列化好的文本, 最晚写入时间]
+        self._pending = {}
+        self._writing = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = None
+        self.writes = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    def save(self, filename, data):
+        try:
+            text = json.dumps(data, ensure_ascii=False, indent=4)
+        except (TypeError, ValueError) as e:
+            with self._cond:
+                self.failures += 1
+            print(f"!!!严重错误: {filename} 的数据无法序列化: {e}")
+            return
+        with self._cond:
+            entry = self._pending.get(filename)
+            if entry is None:
+                self._pending[filename] = [text, time.monotonic() + self.delay]
+            else:
+                # 已经在排队：换成最新的快照，写入时间不往后推，持续写入也不会饿死
+                entry[0] = text
+                self.coalesced += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='json-write-behind', daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """立即写出所有待写文件并等待完成；超时返回 False。"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            for entry in self._pending.values():
+                entry[1] = 0
+            self._cond.notify_all()
+            while self._pending or self._writing:
+                if not self._thread or not self._thread.is_alive():
+                    # 线程没在跑（例如已关闭），就在当前线程里写
+                    self._write_due(force=True)
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 10.0):
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        with self._cond:
+            return {'pending': len(self._pending), 'writes': self.writes, 'coalesced': self.coalesced,
+                    'failures': self.failures}
+
+    def _run(self):
+        with self._cond:
+            while not (self._closed and not self._pending):
+                if not self._pending:
+                    self._cond.wait()
+                    continue
+                wait = min(entry[1] for entry in self._pending.values()) - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                self._write_due()
+
+    def _write_due(self, force=False):
+        """在持有锁的情况下调用；真正的文件写入在锁外进行。"""
+        now = time.monotonic()
+        due = [(name, entry[0]) for name, entry in self._pending.items() if force or entry[1] <= now]
+        for name, _ in due:
+            del self._pending[name]
+        self._writing += 1
+        self._cond.release()
+        try:
+            for name, text in due:
+                self._write_file(name, text)
+        finally:
+            self._cond.acquire()
+            self._writing -= 1
+        self._cond.notify_all()
+
+    def _write_file(self, filename, text):
+        directory = os.path.dirname(filename)
+        temp_file = f"{filename}.tmp"
+        try:
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(temp_file, filename)
+            self.writes += 1
+        except Exception as e:
+            self.failures += 1
+            print(f"!!!严重错误: 保存 {filename} 失败: {e}")
+            if os.path.exists(temp_file): os.remove(temp_file)
@@ -0,0 +1,151 @@
+import math
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+from utils.eorzea_clock import ET_HOUR_REAL_SECONDS, et_hour_index
+from utils.node_catalog import NodeCatalogue, NodeRecord
+
+# --- 路线估算用的时间成本（现实秒）---
+# 1 个 ET 小时只有 175 秒，这些数值决定了一个小时里能跑几个点；按常见的坐骑 + 传送节奏估算
+TELEPORT_SECONDS = 12  # 咏唱 + 读图
+AETHERYTE_NEAR_SECONDS = 10  # 标注了“靠近水晶”的点，传送落地后很快能到
+AETHERYTE_FAR_SECONDS = 25  # 没有水晶提示时，按落地后飞半张地图估算
+SECONDS_PER_MAP_UNIT = 1.5  # 同一张地图内按坐标直线距离飞行
+GATHER_SECONDS = 15
+COLLECTABLE_GATHER_SECONDS = 30  # 收藏品要多轮采集，耗时更长
+# 每个 ET 小时结束时保留的候选方案数量
+BEAM_WIDTH = 8
+
+
+class RouteStop(NamedTuple):
+    arrive_ts: float  # 预计到达并开始采集的现实时间
+    node_id: int
+    teleport: bool
+
+
+class RoutePlan(NamedTuple):
+    stops: List[RouteStop]
+    collected: FrozenSet[str]
+    missed: List[str]  # 有限时采集点、但这一轮排不进路线的材料
+    untimed: List[str]  # 目录里没有带开始ET 的采集点的材料
+    total_seconds: float  # 路线上花在传送、赶路和采集上的总时间
+
+
+class _State(NamedTuple):
+    collected: FrozenSet[str]
+    position: Optional[NodeRecord]
+    stops: Tuple[RouteStop, ...]
+    cost: float
+
+
+def gather_seconds(record: NodeRecord) -> float:
+    return COLLECTABLE_GATHER_SECONDS if '收藏' in record.node_type_cn else GATHER_SECONDS
+
+
+class RoutePlanner:
+    """在一个 ET 日（24 个 ET 小时，约 70 分钟现实时间）内安排采集顺序，让能采到的关注材料尽量多。
+
+    这是带时间窗的选点排程问题，精确求解是指数级的，这里按 ET 小时做集束 DP：
+    每个 ET 小时里从各个状态出发，分别以“先去某一张地图”开局，再按“之后没机会了的材料优先、路近的优先”
+    贪心地把点塞进这个小时的 175 秒里；小时结束时按 (采到的材料数, 花费时间) 保留最好的 BEAM_WIDTH 个状态。
+    采集必须在该小时内完成，跨小时的窗口会在后续小时里再次成为候选。
+    """
+
+    def __init__(self, catalogue: NodeCatalogue, map_ids: Optional[Dict[str, int]] = None):
+        self.catalogue = catalogue
+        self.map_ids = map_ids if map_ids is not None else catalogue.map_ids
+
+    def zone_of(self, record: NodeRecord):
+        # 同一个地图 ID 的地区视为同一张地图；没有 ID 时退回按地区名
+        return self.map_ids.get(record.region_cn, record.region_cn)
+
+    def travel_seconds(self, src: Optional[NodeRecord], dst: NodeRecord) -> Tuple[float, bool]:
+        """从 src 到 dst 的耗时，以及是否需要传送。src 为 None 表示路线起点。"""
+        if src is not None and self.zone_of(src) == self.zone_of(dst):
+            if None in (src.x, src.y, dst.x, dst.y):
+                return AETHERYTE_FAR_SECONDS, False
+            return math.hypot(src.x - dst.x, src.y - dst.y) * SECONDS_PER_MAP_UNIT, False
+        landing = AETHERYTE_NEAR_SECONDS if dst.aetheryte else AETHERYTE_FAR_SECONDS
+        return TELEPORT_SECONDS + landing, True
+
+    def plan(self, items: Iterable[str], now: float) -> RoutePlan:
+        watched = list(dict.fromkeys(items))
+        watched_set = frozenset(watched)
+        first_hour = et_hour_index(now)
+        window_index = self.catalogue.window_index
+
+        # 每个 ET 小时可去的关注节点
+        slots = []
+        for slot in range(24):
+            ids = window_index.active((first_hour + slot) % 24)
+            slots.append([r for r in map(self.catalogue.get, ids) if r.name_cn in watched_set])
+        # chances[slot][材料] = 这个小时之后还有几个小时能采到它，越少越该优先
+        chances = [dict() for _ in range(24)]
+        seen = {}
+        for slot in range(23, -1, -1):
+            chances[slot] = dict(seen)
+            for name in {r.name_cn for r in slots[slot]}:
+                seen[name] = seen.get(name, 0) + 1
+
+        states = [_State(frozenset(), None, (), 0.0)]
+        for slot in range(24):
+            hour_start = (first_hour + slot) * ET_HOUR_REAL_SECONDS
+            hour_end = hour_start + ET_HOUR_REAL_SECONDS
+            slot_start = max(now, hour_start)
+            best = {}
+            for state in states:
+                self._keep(best, state)
+                options = [r for r in slots[slot] if r.name_cn not in state.collected]
+                if not options:
+                    continue
+                openings = [None] + list(dict.fromkeys(self.zone_of(r) for r in options))
+                for opening in openings:
+                    child = self._fill_hour(state, options, opening, slot_start, hour_end, chances[slot])
+                    if child is not state:
+                        self._keep(best, child)
+            states = sorted(best.values(), key=lambda s: (-len(s.collected), s.cost))[:BEAM_WIDTH]
+
+        result = states[0]
+        timed = {name for slot_nodes in slots for name in (r.name_cn for r in slot_nodes)}
+        return RoutePlan(
+            stops=list(result.stops),
+            collected=result.collected,
+            missed=[name for name in watched if name in timed and name not in result.collected],
+            untimed=[name for name in watched if name not in timed],
+            total_seconds=result.cost,
+        )
+
+    @staticmethod
+    def _keep(best, state: _State):
+        key = (state.collected, state.position.node_id if state.position else None)
+        current = best.get(key)
+        if current is None or state.cost < current.cost:
+            best[key] = state
+
+    def _fill_hour(self, state: _State, options, opening, start_ts, end_ts, chances) -> _State:
+        position, clock, cost = state.position, start_ts, state.cost
+        collected, stops = set(state.collected), list(state.stops)
+        remaining = list(options)
+        while remaining:
+            choice = None
+            for record in remaining:
+                if opening is not None and not stops[len(state.stops):] and self.zone_of(record) != opening:
+                    continue
+                travel, teleport = self.travel_seconds(position, record)
+                spent = travel + gather_seconds(record)
+                if clock + spent > end_ts:
+                    continue
+                rank = (chances.get(record.name_cn, 0), travel)
+                if choice is None or rank < choice[0]:
+                    choice = (rank, record, travel, teleport, spent)
+            if choice is None:
+                break
+            _, record, travel, teleport, spent = choice
+            stops.append(RouteStop(clock + travel, record.node_id, teleport))
+            clock += spent
+            cost += spent
+            position = record
+            collected.add(record.name_cn)
+            remaining = [r for r in remaining if r.name_cn not in collected]
+        if len(stops) == len(state.stops):
+            return state
+        return _State(frozenset(collected), position, tuple(stops), cost)
@@ -0,0 +1,89 @@
+from bisect import bisect_right
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from utils.eorzea_clock import ET_DAY_REAL_SECONDS, ET_HOUR_REAL_SECONDS, et_hour_index
+from utils.node_catalog import NodeCatalogue, spawn_occurrences
+
+# 物化的时间表最远覆盖多少现实秒；!timeline 能查询的上限由调用方自己限制在这之内
+TIMELINE_HORIZON_SECONDS = 24 * 3600
+# 过滤条件 -> 命中节点集合 的缓存上限，超过后整体清空重算
+MAX_CACHED_FILTERS = 256
+
+
+class NodeFilter(NamedTuple):
+    """时间表的过滤条件，None 表示该维度不过滤。items 是材料名CN，jobs 是“职能”，expansions 是“版本归属”。"""
+    items: Optional[FrozenSet[str]] = None
+    jobs: Optional[FrozenSet[str]] = None
+    expansions: Optional[FrozenSet[str]] = None
+
+    def matches(self, record) -> bool:
+        return ((self.items is None or record.name_cn in self.items)
+                and (self.jobs is None or record.job in self.jobs)
+                and (self.expansions is None or record.expansion in self.expansions))
+
+
+class SpawnTimeline:
+    """按 ET 周期物化的刷新时间表，所有用户的预报都从这里切片。
+
+    一个 ET 日是 70 分钟现实时间，整个刷新时间表是周期性的：每进入一个新的 ET 日，
+    用 node_catalog.spawn_occurrences 一次性算出从这个 ET 日开始、覆盖 horizon 的全部刷新，
+    按时间排好序存成两列。查询时二分切出时间范围，再用缓存好的过滤结果挑出命中的节点。
+    """
+
+    def __init__(self, catalogue: NodeCatalogue, horizon_seconds: int = TIMELINE_HORIZON_SECONDS):
+        self.catalogue = catalogue
+        self.horizon_seconds = horizon_seconds
+        self.cycle = None
+        self.stamps: List[int] = []
+        self.node_ids: List[int] = []
+        self._filter_cache: Dict[NodeFilter, FrozenSet[int]] = {}
+
+    def _ensure_built(self, now: float):
+        cycle = et_hour_index(now) // 24
+        if cycle == self.cycle:
+            return
+        cycle_start = cycle * ET_DAY_REAL_SECONDS
+        # spawn_occurrences 只取基准所在整点之后的刷新，往前退 1 秒让 ET 日的 00:00 也包含在内；
+        # 再多覆盖一个 ET 日，保证这个周期内任何时刻往后查 horizon 都不会越界
+        indices, stamps = spawn_occurrences(self.catalogue.start_hours, cycle_start - 1,
+                                            self.horizon_seconds + ET_DAY_REAL_SECONDS + 1)
+        nodes = self.catalogue.nodes
+        self.stamps = [int(ts) for ts in stamps]
+        self.node_ids = [nodes[int(i)].node_id for i in indices]
+        self.cycle = cycle
+
+    def matching_ids(self, node_filter: Optional[NodeFilter]) -> Optional[FrozenSet[int]]:
+        if node_filter is None or node_filter == NodeFilter():
+            return None
+        ids = self._filter_cache.get(node_filter)
+        if ids is None:
+            if len(self._filter_cache) >= MAX_CACHED_FILTERS:
+                self._filter_cache.clear()
+            ids = frozenset(r.node_id for r in self.catalogue if node_filter.matches(r))
+            self._filter_cache[node_filter] = ids
+        return ids
+
+    def window(self, now: float, seconds: float) -> Tuple[int, int]:
+        """时间表中 (now, now + seconds] 这一段的下标范围。"""
+        self._ensure_built(now)
+        seconds = min(seconds, self.horizon_seconds)
+        return bisect_right(self.stamps, now), bisect_right(self.stamps, now + seconds)
+
+    def forecast(self, now: float, seconds: float, node_filter: Optional[NodeFilter] = None) \
+            -> List[Tuple[int, List[int]]]:
+        """接下来 seconds 秒内的刷新，按现实时间分组：[(unix_ts, [node_id, ...]), ...]。"""
+        start, end = self.window(now, seconds)
+        wanted = self.matching_ids(node_filter)
+        groups = []
+        for ts, node_id in zip(self.stamps[start:end], self.node_ids[start:end]):
+            if wanted is not None and node_id not in wanted:
+                continue
+            if groups and groups[-1][0] == ts:
+                groups[-1][1].append(node_id)
+            else:
+                groups.append((ts, [node_id]))
+        return groups
+
+    @staticmethod
+    def et_hour_of(ts: int) -> int:
+        return ts // ET_HOUR_REAL_SECONDS % 24
@@ -0,0 +1,283 @@
+"""追踪器的虚拟时间模拟：不需要 Discord token，也不用真的等时间过去。
+
+假的 bot / 频道 / 消息记录下每一次 send、edit、delete，事件循环的时间换成虚拟时钟：
+循环没有事可做时不去睡觉，而是把虚拟时间直接拨到下一个定时器，几个 ET 日几秒钟就能跑完。
+同时跑 N 个频道追踪器、M 个带提醒的用户，结束后报告：
+- 每个追踪器的 CPU 时间、每组刷新的 REST 调用数；
+- 漏发 / 重复的 @ 提醒，以及提醒比预定时间晚了多少；
+- 面板渲染耗时的分位数（真实 CPU 时间，不是虚拟时间）。
+
+用法（在项目根目录）: python -m utils.tracker_sim --trackers 20 --users 200 --days 3
+改动调度或渲染后跑一遍，和改动前的数字对比即可。
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import re
+import selectors
+import time
+from collections import Counter
+
+from cogs.tracker_cog import DiscordOutbox, PingIndex, SessionOwner, SpawnClock, TrackerInstance
+from utils.eorzea_clock import ET_DAY_REAL_SECONDS, ET_HOUR_REAL_SECONDS, EorzeaClock
+from utils.metrics import REGISTRY
+from utils.node_catalog import NodeCatalogue
+
+DEFAULT_CSV = 'data/nodes.csv'
+# 模拟开始的现实时间：固定值让同一个种子每次跑出同样的刷新序列
+SIM_START_UNIX = 1_700_000_000.0
+# 用户可选的提醒提前量；都小于一个 ET 小时，正常情况下不应该有漏发
+PING_LEADS = (30, 60, 90, 120)
+# 假 REST 请求的往返耗时范围（虚拟秒）
+REST_LATENCY = (0.05, 0.25)
+PING_PATTERN = re.compile(r'\*\*(\d+)\*\* 秒后刷新')
+MENTION_PATTERN = re.compile(r'<@(\d+)>')
+
+
+class VirtualClock:
+    """虚拟时间：monotonic 给事件循环和令牌桶用，wall() 是对应的现实 unix 时间。"""
+
+    def __init__(self, start_unix: float = SIM_START_UNIX):
+        self.start_unix = start_unix
+        self.monotonic = 0.0
+
+    def wall(self) -> float:
+        return self.start_unix + self.monotonic
+
+    def advance(self, seconds: float):
+        self.monotonic += seconds
+
+
+class VirtualSelector(selectors.DefaultSelector):
+    """不阻塞的选择器：有真实 IO（例如线程池回调）就立即处理，否则把虚拟时间拨过本该睡眠的时长。"""
+
+    def __init__(self, clock: VirtualClock):
+        super().__init__()
+        self.clock = clock
+
+    def select(self, timeout=None):
+        events = super().select(0)
+        if events:
+            return events
+        if timeout is None:
+            # 没有任何定时器，只可能在等线程池，真的等一下
+            return super().select(None)
+        self.clock.advance(timeout)
+        return []
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    def __init__(self, clock: VirtualClock):
+        self.clock = clock
+        super().__init__(VirtualSelector(clock))
+
+    def time(self):
+        return self.clock.monotonic
+
+
+class FakeBot:
+    def __init__(self, loop):
+        self.loop = loop
+
+    async def wait_until_ready(self):
+        pass
+
+    def is_closed(self):
+        return False
+
+
+class FakeMessage:
+    def __init__(self, channel, message_id, content=None):
+        self.channel, self.id, self.content = channel, message_id, content
+
+    async def edit(self, **kwargs):
+        await self.channel.rest('edit')
+
+    async def delete(self):
+        await self.channel.rest('delete')
+
+
+class FakeChannel:
+    """记录所有请求的频道。@ 提醒按消息内容解析出 (发送时间, 提前秒数, 被 @ 的用户)。"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, channel_id, sim):
+        self.id, self.sim = channel_id, sim
+        self.calls = Counter()
+        self.pings = []
+
+    async def rest(self, op):
+        self.calls[op] += 1
+        await asyncio.sleep(self.sim.rng.uniform(*REST_LATENCY))
+
+    async def send(self, content=None, *, embed=None, view=None, delete_after=None):
+        await self.rest('send')
+        message = FakeMessage(self, next(self._ids), content)
+        if content and content.startswith('⏰'):
+            lead = int(PING_PATTERN.search(content).group(1))
+            self.pings.append((self.sim.clock.wall(), lead, [int(u) for u in MENTION_PATTERN.findall(content)]))
+        if delete_after is not None:
+            self.sim.loop.call_later(delete_after, lambda: self.sim.loop.create_task(message.delete()))
+        return message
+
+
+class MeasuredTracker(TrackerInstance):
+    """记录每个追踪器自己的 CPU 时间和每一次渲染的耗时。"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cpu_seconds = 0.0
+        self.render_seconds = []
+
+    async def on_clock_tick(self, now):
+        started = time.process_time()
+        try:
+            return await super().on_clock_tick(now)
+        finally:
+            self.cpu_seconds += time.process_time() - started
+
+    def _render(self, time_remaining):
+        started = time.perf_counter()
+        try:
+            return super()._render(time_remaining)
+        finally:
+            self.render_seconds.append(time.perf_counter() - started)
+
+
+class Simulation:
+    def __init__(self, catalogue, trackers=20, users=200, items_per_user=8, track_all_ratio=0.2,
+                 members_per_tracker=3, seed=1):
+        self.catalogue = catalogue
+        self.rng = random.Random(seed)
+        self.clock = VirtualClock()
+        self.loop = None
+        names = sorted(catalogue.item_names)
+        self.user_watchlists = {str(uid): self.rng.sample(names, min(items_per_user, len(names)))
+                                for uid in range(1, users + 1)}
+        # 大约四分之三的用户设置了提醒
+        self.user_pings = {uid: self.rng.choice(PING_LEADS) for uid in self.user_watchlists if self.rng.random() < 0.75}
+        self.tracker_specs = []
+        for channel_id in range(1, trackers + 1):
+            if self.rng.random() < track_all_ratio:
+                self.tracker_specs.append((channel_id, True, ()))
+            else:
+                members = self.rng.sample(range(1, users + 1), min(members_per_tracker, users))
+                self.tracker_specs.append((channel_id, False, tuple(members)))
+        self.trackers = []
+
+    async def run(self, duration):
+        bot = FakeBot(self.loop)
+        eorzea_clock = EorzeaClock(0.0, self.clock.wall)
+        spawn_clock = SpawnClock(bot, eorzea_clock)
+        outbox = DiscordOutbox(bot, {}, time_source=self.loop.time)
+        ping_index = PingIndex(self.user_watchlists, self.user_pings, self.catalogue.item_bits)
+        for channel_id, track_all, members in self.tracker_specs:
+            owners = [SessionOwner(uid, f"user{uid}") for uid in members] or [SessionOwner(0, 'sim')]
+            watch_mask = None if track_all else ping_index.watch_mask(str(uid) for uid in members)
+            inst = MeasuredTracker(bot, owners[0], FakeChannel(channel_id, self), self.catalogue, spawn_clock,
+                                   watch_mask, track_all, ping_index, outbox, members=owners if len(owners) > 1 else ())
+            if await inst.start():
+                self.trackers.append(inst)
+        self.started_at = self.clock.wall()
+        await asyncio.sleep(duration)
+        self.ended_at = self.clock.wall()
+        for inst in self.trackers:
+            await inst.stop()
+        spawn_clock.shutdown()
+        outbox.close()
+
+    def expected_pings(self, inst):
+        """这个追踪器在模拟期间应该发出的提醒 {(刷新时间, 用户ID): 提前秒数}。"""
+        masks = {int(uid): self.catalogue.item_bits.mask_of(items) for uid, items in self.user_watchlists.items()}
+        expected = {}
+        first = int(self.started_at // ET_HOUR_REAL_SECONDS) + 1
+        # 刷新在结束之后、但提醒时间还在模拟期间内的也算
+        last = int((self.ended_at + max(PING_LEADS)) // ET_HOUR_REAL_SECONDS)
+        for k in range(first, last + 1):
+            spawn_ts, group_mask = k * ET_HOUR_REAL_SECONDS, inst.spawn_masks[k % 24]
+            if not group_mask:
+                continue
+            for uid, lead in self.user_pings.items():
+                # 开始追踪之前、结束之后才到点的提醒不算
+                if not (self.started_at < spawn_ts - lead <= self.ended_at):
+                    continue
+                if masks[int(uid)] & group_mask:
+                    expected[(spawn_ts, int(uid))] = lead
+        return expected
+
+    def report(self, wall_seconds):
+        simulated = self.ended_at - self.started_at
+        missed = duplicated = unexpected = 0
+        delays, calls_per_spawn, cpu_per_day = [], [], []
+        renders = []
+        for inst in self.trackers:
+            expected = self.expected_pings(inst)
+            received = Counter()
+            for sent_at, lead, user_ids in inst.channel.pings:
+                spawn_ts = round((sent_at + lead) / ET_HOUR_REAL_SECONDS) * ET_HOUR_REAL_SECONDS
+                delays.append(sent_at - (spawn_ts - lead))
+                for uid in user_ids:
+                    received[(spawn_ts, uid)] += 1
+            missed += sum(1 for key in expected if not received[key])
+            duplicated += sum(count - 1 for count in received.values() if count > 1)
+            unexpected += sum(1 for key in received if key not in expected)
+            spawns = len({ts for ts, _ in expected}) or max(1, int(simulated // ET_HOUR_REAL_SECONDS))
+            calls_per_spawn.append(sum(inst.channel.calls.values()) / spawns)
+            cpu_per_day.append(inst.cpu_seconds / simulated * ET_DAY_REAL_SECONDS)
+            renders.extend(inst.render_seconds)
+
+        print(f"模拟了 {simulated / ET_DAY_REAL_SECONDS:.1f} 个 ET 日（现实 {simulated / 3600:.1f} 小时），"
+              f"实际耗时 {wall_seconds:.1f} 秒，约 {simulated / max(wall_seconds, 1e-9):.0f} 倍速")
+        print(f"追踪器 {len(self.trackers)} 个，用户 {len(self.user_watchlists)} 个（{len(self.user_pings)} 个设置了提醒）")
+        print(f"每个追踪器 CPU: 平均 {_mean(cpu_per_day) * 1000:.1f} ms / ET 日，最多 {max(cpu_per_day, default=0) * 1000:.1f} ms")
+        print(f"每组刷新的 REST 调用: 平均 {_mean(calls_per_spawn):.1f}，最多 {max(calls_per_spawn, default=0):.1f}")
+        print(f"@ 提醒: 漏发 {missed}，重复 {duplicated}，多余 {unexpected}；"
+              f"延迟 p50 {_percentile(delays, 50):.2f}s p99 {_percentile(delays, 99):.2f}s 最大 {max(delays, default=0):.2f}s")
+        print(f"面板渲染 {len(renders)} 次: p50 {_percentile(renders, 50) * 1e3:.2f} ms  "
+              f"p90 {_percentile(renders, 90) * 1e3:.2f} ms  p99 {_percentile(renders, 99) * 1e3:.2f} ms  "
+              f"最大 {max(renders, default=0) * 1e3:.2f} ms")
+        print(f"时钟唤醒延迟（虚拟时间）最大 {max((inst.max_lag for inst in self.trackers), default=0):.3f}s")
+        return {'missed': missed, 'duplicated': duplicated, 'unexpected': unexpected}
+
+
+def _mean(values):
+    return sum(values) / len(values) if values else 0.0
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="虚拟时间下的追踪器负载模拟")
+    parser.add_argument('--csv', default=DEFAULT_CSV)
+    parser.add_argument('--trackers', type=int, default=20)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--items', type=int, default=8, help="每个用户关注的材料数")
+    parser.add_argument('--days', type=float, default=3, help="模拟多少个 ET 日")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    catalogue = NodeCatalogue.from_csv(args.csv)
+    sim = Simulation(catalogue, args.trackers, args.users, args.items, seed=args.seed)
+    clock_loop = VirtualTimeLoop(sim.clock)
+    sim.loop = clock_loop
+    asyncio.set_event_loop(clock_loop)
+    started = time.perf_counter()
+    try:
+        clock_loop.run_until_complete(sim.run(args.days * ET_DAY_REAL_SECONDS))
+    finally:
+        clock_loop.close()
+    result = sim.report(time.perf_counter() - started)
+    print("\n".join(REGISTRY.summary_lines()))
+    if result['missed'] or result['duplicated'] or result['unexpected']:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+SCHEMA_VERSION = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS watchlist (
+    user_id TEXT NOT NULL,
+    item TEXT NOT NULL,
+    PRIMARY KEY (user_id, item)
+);
+CREATE INDEX IF NOT EXISTS watchlist_by_item ON watchlist (item);
+CREATE TABLE IF NOT EXISTS ping (
+    user_id TEXT PRIMARY KEY,
+    seconds INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tracker_session (
+    channel_id TEXT PRIMARY KEY,
+    owner_id TEXT NOT NULL,
+    owner_name TEXT NOT NULL,
+    track_all INTEGER NOT NULL,
+    message_id TEXT,
+    started_at REAL NOT NULL,
+    query TEXT,
+    members TEXT
+);
+"""
+
+
+class WatchlistStore:
+    """关注列表、提醒设置和运行中追踪器会话的 SQLite 存储（WAL 模式）。
+
+    每条命令只写改动的那几行，写入成本和总用户数无关。user_id 和原来的 JSON 一样按字符串保存，
+    列表顺序按插入顺序（rowid）。
+
+    增量写入不在调用方（事件循环）里执行：参数当场取好快照，放进队列，由唯一的写线程用自己的连接
+    按顺序提交，提交时等 fsync 或 WAL 检查点也不会卡住事件循环。读取前先 flush() 等队列写完，
+    保证读到自己刚写的数据；读取只在启动和恢复会话时发生。
+    """
+
+    def __init__(self, db_filename):
+        directory = os.path.dirname(db_filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db_filename = db_filename
+        self.conn = sqlite3.connect(db_filename)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # WAL 下 NORMAL 已能保证崩溃后数据库一致，只可能丢最后一次提交
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+            self._upgrade_schema()
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)",
+                              (str(SCHEMA_VERSION),))
+        self._writes = queue.Queue()
+        self._writer = threading.Thread(target=self._run_writer, name='watchlist-writer', daemon=True)
+        self._writer.start()
+
+    def _upgrade_schema(self):
+        # 版本 2：tracker_session 增加 query 列（!start filter 的筛选条件）
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(tracker_session)")}
+        if 'query' not in columns:
+            self.conn.execute("ALTER TABLE tracker_session ADD COLUMN query TEXT")
+        # 版本 3：增加 members 列（!start @a @b 合并追踪的成员，JSON 数组）
+        if 'members' not in columns:
+            self.conn.execute("ALTER TABLE tracker_session ADD COLUMN members TEXT")
+
+    def close(self):
+        """等排队的写入全部提交后关闭。"""
+        self._writes.put(None)
+        self._writer.join()
+        self.conn.close()
+
+    def flush(self):
+        """等待已排队的写入全部提交。"""
+        self._writes.join()
+
+    def _run_writer(self):
+        conn = sqlite3.connect(self.db_filename)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            while True:
+                job = self._writes.get()
+                try:
+                    if job is None:
+                        return
+                    with conn:
+                        for sql, rows in job:
+                            conn.executemany(sql, rows)
+                except sqlite3.Error as e:
+                    print(f"!!!严重错误: 写入 {self.db_filename} 失败: {e}")
+                finally:
+                    self._writes.task_done()
+        finally:
+            conn.close()
+
+    def _submit(self, *statements):
+        """把 (sql, [参数行]) 排队交给写线程；同一次调用的几条语句在同一个事务里提交。"""
+        self._writes.put(statements)
+
+    def _get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    # --- 迁移 ---
+    def migrate_from_json(self, watchlist_file, ping_file) -> bool:
+        """第一次启动时把旧的 watchlists.json / pings.json 导入数据库，JSON 文件原样保留作备份。"""
+        if self._get_meta('migrated_from_json'):
+            return False
+        watchlists = _read_json(watchlist_file)
+        pings = _read_json(ping_file)
+        with self.conn:
+            for user_id, items in watchlists.items():
+                self.conn.executemany("INSERT OR IGNORE INTO watchlist (user_id, item) VALUES (?, ?)",
+                                      [(str(user_id), item) for item in items])
+            self.conn.executemany("INSERT OR REPLACE INTO ping (user_id, seconds) VALUES (?, ?)",
+                                  [(str(user_id), int(seconds)) for user_id, seconds in pings.items()])
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_from_json', '1')")
+        print(f"已将 {len(watchlists)} 个关注列表和 {len(pings)} 个提醒设置从 JSON 迁移到 {self.db_filename}。")
+        return True
+
+    # --- 读取 ---
+    def load_watchlists(self) -> Dict[str, List[str]]:
+        self.flush()
+        watchlists = {}
+        for user_id, item in self.conn.execute("SELECT user_id, item FROM watchlist ORDER BY rowid"):
+            watchlists.setdefault(user_id, []).append(item)
+        return watchlists
+
+    def load_pings(self) -> Dict[str, int]:
+        self.flush()
+        return dict(self.conn.execute("SELECT user_id, seconds FROM ping"))
+
+    # --- 增量写入 ---
+    def add_items(self, user_id, items: Iterable[str]):
+        self._submit(("INSERT OR IGNORE INTO watchlist (user_id, item) VALUES (?, ?)",
+                      [(str(user_id), item) for item in items]))
+
+    def remove_items(self, user_id, items: Iterable[str]):
+        self._submit(("DELETE FROM watchlist WHERE user_id = ? AND item = ?",
+                      [(str(user_id), item) for item in items]))
+
+    def replace_items(self, user_id, items: Iterable[str]):
+        self._submit(("DELETE FROM watchlist WHERE user_id = ?", [(str(user_id),)]),
+                     ("INSERT OR IGNORE INTO watchlist (user_id, item) VALUES (?, ?)",
+                      [(str(user_id), item) for item in items]))
+
+    def clear_items(self, user_id):
+        self._submit(("DELETE FROM watchlist WHERE user_id = ?", [(str(user_id),)]))
+
+    def set_ping(self, user_id, seconds: int):
+        self._submit(("INSERT OR REPLACE INTO ping (user_id, seconds) VALUES (?, ?)", [(str(user_id), int(seconds))]))
+
+    def delete_ping(self, user_id):
+        self._submit(("DELETE FROM ping WHERE user_id = ?", [(str(user_id),)]))
+
+    # --- 追踪器会话（重启后恢复面板用）---
+    def save_session(self, session: 'TrackerSession'):
+        self._submit((
+            "INSERT OR REPLACE INTO tracker_session "
+            "(channel_id, owner_id, owner_name, track_all, message_id, started_at, query, members) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(str(session.channel_id), str(session.owner_id), session.owner_name, int(session.track_all),
+              None if session.message_id is None else str(session.message_id), session.started_at,
+              session.query,
+              json.dumps([[str(i), name] for i, name in session.members], ensure_ascii=False)
+              if session.members else None)]))
+
+    def update_session_message(self, channel_id, message_id):
+        self._submit(("UPDATE tracker_session SET message_id = ? WHERE channel_id = ?",
+                      [(None if message_id is None else str(message_id), str(channel_id))]))
+
+    def delete_session(self, channel_id):
+        self._submit(("DELETE FROM tracker_session WHERE channel_id = ?", [(str(channel_id),)]))
+
+    def load_sessions(self) -> List['TrackerSession']:
+        self.flush()
+        rows = self.conn.execute("SELECT channel_id, owner_id, owner_name, track_all, message_id, started_at, "
+                                 "query, members FROM tracker_session ORDER BY started_at")
+        return [TrackerSession(int(channel_id), int(owner_id), owner_name, bool(track_all),
+                               int(message_id) if message_id else None, started_at, query,
+                               tuple((int(i), name) for i, name in json.loads(members)) if members else ())
+                for channel_id, owner_id, owner_name, track_all, message_id, started_at, query, members in rows]
+
+
+class TrackerSession(NamedTuple):
+    channel_id: int
+    owner_id: int
+    owner_name: str
+    track_all: bool
+    message_id: Optional[int]
+    started_at: float
+    query: Optional[str] = None  # !start filter 的筛选条件，普通追踪器为 None
+    members: Tuple[Tuple[int, str], ...] = ()  # !start @a @b 合并追踪的 (用户ID, 显示名)
+
+
+def _read_json(filename) -> dict:
+    if not filename or not os.path.exists(filename):
+        return {}
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (json.JSONDecodeError, OSError) as e:
+        print(f"读取 {filename} 失败，跳过迁移: {e}")
+        return {}